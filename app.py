@@ -1,13 +1,17 @@
 import sys
 import os
 import json
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import tempfile
-import boto3
-from aws_textract_project.textract_for_sagemaker import process_textract, allowed_file
+from concurrent.futures import ThreadPoolExecutor
+from aws_textract_project.textract_for_sagemaker import process_textract, allowed_file, job_key
 from werkzeug.utils import secure_filename
-from aws_sagemaker.predict import get_sagemaker_prediction
+from aws_sagemaker.predict import get_sagemaker_prediction, get_sagemaker_predictions
+from jobs import JobManager, new_job_id, document_job_id, JOB_QUEUED, JOB_SUCCEEDED, JOB_FAILED
+from streaming_upload import MultipartFileStream, UploadError, stream_to_s3
+from metrics import registry, timed, timed_stage, PROMETHEUS_CONTENT_TYPE, OUTCOME_ERROR, OUTCOME_SUCCESS
+from aws_clients import get_client, warm_up, AWS_WARM_UP
 
 app = Flask(__name__)
 CORS(app)
@@ -17,29 +21,69 @@ S3_BUCKET = 'w2-datasets'
 S3_REGION = 'us-east-1'  # Replace with your AWS region
 
 # Initialize AWS S3 client
-s3_client = boto3.client('s3', region_name=S3_REGION)
-
-def upload_file_to_s3(file, filename):
+s3_client = get_client('s3', S3_REGION)
+
+# Open connections to the services every upload uses before the first request arrives
+if AWS_WARM_UP:
+    warm_up(('s3', 'textract', 'sagemaker-runtime'), S3_REGION, background=True)
+
+# Results are written per job under 'output/result/<job_id>/'
+RESULT_FILENAME = 'result.json'
+
+# Worker pool running the Textract and SageMaker stages of uploaded documents
+MAX_JOB_WORKERS = int(os.environ.get('MAX_JOB_WORKERS', '8'))
+job_manager = JobManager(max_workers=MAX_JOB_WORKERS)
+
+# Textract calls fanned out by batch jobs; kept separate from the job pool so batches can't starve it
+MAX_BATCH_FILES = int(os.environ.get('MAX_BATCH_FILES', '50'))
+TEXTRACT_MAX_WORKERS = int(os.environ.get('TEXTRACT_MAX_WORKERS', '4'))
+textract_executor = ThreadPoolExecutor(max_workers=TEXTRACT_MAX_WORKERS, thread_name_prefix='textract')
+
+@timed('upload')
+def upload_file_to_s3(chunks, filename, job_id=None):
+    """
+    Streams an uploaded file into S3 as it is read from the request.
+
+    :param chunks: Iterable of the file's bytes
+    :param filename: Secure filename of the upload
+    :param job_id: Optional job ID the file is stored under
+    :return: Tuple of (pre-signed URL, SHA-256 of the file, upload metrics)
+    """
+    key = job_key('input/raw_file', filename, job_id)
     try:
-        s3_client.upload_fileobj(file, S3_BUCKET, f'input/raw_file/{filename}')
+        doc_hash, upload_metrics = stream_to_s3(chunks, s3_client, S3_BUCKET, key)
         # Generate a pre-signed URL valid for 1 hour
         file_url = s3_client.generate_presigned_url(
             'get_object',
-            Params={'Bucket': S3_BUCKET, 'Key': f'input/raw_file/{filename}'},
+            Params={'Bucket': S3_BUCKET, 'Key': key},
             ExpiresIn=3600  # URL valid for 1 hour
         )
-        return file_url
+        return file_url, doc_hash, upload_metrics
     except Exception as e:
         app.logger.error(f"Failed to upload file to S3: {e}")
         raise e
 
-def get_prediction_result_from_s3(result_filename):
+def delete_uploaded_files(documents):
+    """
+    Removes the files of a batch that was rejected part way through its upload.
+
+    :param documents: Batch documents collected so far; those rejected by type were never uploaded
+    """
+    keys = [{'Key': job_key('input/raw_file', doc['filename'], doc['job_id'])} for doc in documents if 'file_url' in doc]
+    if not keys:
+        return
+    try:
+        s3_client.delete_objects(Bucket=S3_BUCKET, Delete={'Objects': keys, 'Quiet': True})
+    except Exception as e:
+        app.logger.error(f"Failed to delete uploaded files from S3: {e}")
+
+def get_prediction_result_from_s3(result_filename, job_id=None):
     try:
         # Download the result file from S3
         with tempfile.NamedTemporaryFile(mode='w+b', delete=False) as temp_result_file:
             s3_client.download_fileobj(
                 S3_BUCKET,
-                f'output/result/{result_filename}',
+                job_key('output/result', result_filename, job_id),
                 temp_result_file
             )
             temp_result_file_path = temp_result_file.name
@@ -57,89 +101,216 @@ def get_prediction_result_from_s3(result_filename):
         app.logger.error(f"Failed to read prediction result from S3: {e}")
         return None
 
-def clear_input_folder():
+@timed('result_write')
+def save_prediction_result_to_s3(result_data, job_id):
+    result_key = job_key('output/result', RESULT_FILENAME, job_id)
     try:
-        # List all objects in the 'input/raw_file/' folder
-        response = s3_client.list_objects_v2(Bucket=S3_BUCKET, Prefix='input/raw_file/')
-        
-        if 'Contents' in response:
-            for obj in response['Contents']:
-                # Delete each object
-                s3_client.delete_object(Bucket=S3_BUCKET, Key=obj['Key'])
-        app.logger.info("Input folder cleared successfully.")
+        s3_client.put_object(
+            Bucket=S3_BUCKET,
+            Key=result_key,
+            Body=json.dumps(result_data).encode('utf-8'),
+            ContentType='application/json'
+        )
+        # Generate a pre-signed URL for the result file
+        return s3_client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': S3_BUCKET, 'Key': result_key},
+            ExpiresIn=3600  # URL valid for 1 hour
+        )
     except Exception as e:
-        app.logger.error(f"Failed to clear input folder: {e}")
+        app.logger.error(f"Failed to save prediction result to S3: {e}")
         raise e
 
+def run_textract(filename, job_id=None, doc_hash=None):
+    with timed_stage('textract'):
+        return process_textract(filename, job_id=job_id, doc_hash=doc_hash)
+
+@timed('document_job')
+def run_document_job(job_id, filename, file_url, doc_hash=None):
+    """
+    Runs the Textract and SageMaker stages for an uploaded document on a job worker.
+
+    :param job_id: Job ID the document was uploaded under
+    :param filename: Secure filename of the uploaded document
+    :param file_url: Pre-signed URL of the uploaded document
+    :param doc_hash: SHA-256 of the uploaded bytes, used to reuse earlier Textract results
+    :return: Dictionary with the prediction result
+    """
+    # Process the file with Textract
+    textract_output = run_textract(filename, job_id=job_id, doc_hash=doc_hash)
+
+    # Get SageMaker prediction
+    with timed_stage('prediction'):
+        prediction, confidence = get_sagemaker_prediction(textract_output)
+
+    # Save the prediction result to S3 under the job's folder
+    result_data = {
+        "job_id": job_id,
+        "file_url": file_url,
+        "predicted_label": prediction if prediction else "Unknown",
+        "confidence": confidence if confidence else 0,
+        # Lets the chatbot pipeline reuse answers given for the same document in earlier jobs
+        "doc_hash": doc_hash
+    }
+    result_file_url = save_prediction_result_to_s3(result_data, job_id)
+
+    return dict(result_data, result_file_url=result_file_url)
+
+@timed('batch_job')
+def run_batch_job(job_id, documents):
+    """
+    Runs Textract for every document of a batch in parallel, then classifies them
+    all with a single SageMaker invocation.
+
+    Every document is stored under a document job ID of its own (see document_job_id) and
+    gets its own result file there, like a single-document job, so the Q&A pipeline can
+    answer questions about it. The batch's result file lists all of them.
+
+    :param job_id: ID of the batch job
+    :param documents: List of dictionaries with 'filename', 'job_id', 'file_url' and 'doc_hash',
+                      or 'filename' and 'error' for files rejected at upload
+    :return: Dictionary with one result per document, in upload order
+    """
+    uploaded = [doc for doc in documents if 'error' not in doc]
+    futures = [
+        textract_executor.submit(run_textract, doc['filename'], doc['job_id'], doc['doc_hash'])
+        for doc in uploaded
+    ]
+
+    ocr_outputs = []
+    for doc, future in zip(uploaded, futures):
+        try:
+            ocr_outputs.append(future.result())
+        except Exception as e:
+            app.logger.error(f"Textract failed for {doc['filename']}: {e}")
+            doc['error'] = str(e)
+            ocr_outputs.append(None)
+
+    # Classify every document that made it through Textract in one request
+    processed = [(doc, ocr) for doc, ocr in zip(uploaded, ocr_outputs) if ocr is not None]
+    with timed_stage('prediction_batch'):
+        predictions = get_sagemaker_predictions([ocr for _, ocr in processed])
+    for (doc, _), (prediction, confidence) in zip(processed, predictions):
+        doc['predicted_label'] = prediction if prediction else "Unknown"
+        doc['confidence'] = confidence if confidence else 0
+        # Same result file as a single-document job, read by the Q&A pipeline
+        save_prediction_result_to_s3({
+            "job_id": doc['job_id'],
+            "batch_job_id": job_id,
+            "file_url": doc['file_url'],
+            "predicted_label": doc['predicted_label'],
+            "confidence": doc['confidence'],
+            "doc_hash": doc['doc_hash']
+        }, doc['job_id'])
+
+    result_data = {"job_id": job_id, "results": documents}
+    result_file_url = save_prediction_result_to_s3(result_data, job_id)
+
+    return dict(result_data, result_file_url=result_file_url)
+
+def response_outcome(response):
+    # Views catch their errors and return them as (body, status) tuples
+    status = response[1] if isinstance(response, tuple) else response.status_code
+    return OUTCOME_ERROR if status >= 400 else OUTCOME_SUCCESS
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Per-stage latency histograms in the Prometheus text format
+    return Response(registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
 @app.route('/upload-and-process', methods=['POST'])
+@timed('upload_and_process_request', outcome_of=response_outcome)
 def upload_and_process():
-    if 'file' not in request.files:
-        return jsonify({"error": "No file part in the request"}), 400
+    # Read the multipart body ourselves so the file goes to S3 without being spooled first
+    try:
+        upload = MultipartFileStream(request.stream, request.content_type, field_name='file')
+        client_filename = upload.open_file()
+    except UploadError as e:
+        return jsonify({"error": str(e)}), 400
 
-    file = request.files['file']
+    if client_filename is None:
+        return jsonify({"error": "No file part in the request"}), 400
 
-    if file.filename == '':
+    if client_filename == '':
         return jsonify({"error": "No selected file"}), 400
 
-    if not allowed_file(file.filename):
+    if not allowed_file(client_filename):
         return jsonify({"error": "File type not allowed"}), 400
 
-    filename = secure_filename(file.filename)
+    filename = secure_filename(client_filename)
 
     try:
-        # Clear the input folder in the S3 bucket before uploading a new file
-        clear_input_folder()
-
-        # Upload the file to S3
-        file_url = upload_file_to_s3(file, filename)
+        # Every upload gets its own job folder, so concurrent users never share keys
+        job_id = new_job_id()
 
-        # Process the file with Textract
-        textract_output = process_textract(filename)  # Assumes filename is the key in S3
+        # Stream the file to S3, hashing it on the way so re-uploads hit the Textract cache
+        file_url, doc_hash, upload_metrics = upload_file_to_s3(upload.iter_data(), filename, job_id)
 
-        # Get SageMaker prediction
-        prediction, confidence = get_sagemaker_prediction(textract_output)
+        # Textract, prediction and the result write run on the worker pool
+        job_manager.submit(run_document_job, filename, file_url, doc_hash, job_id=job_id)
 
-        # Save the prediction result to S3
-        result_data = {
+        return jsonify({
+            "job_id": job_id,
+            "status": JOB_QUEUED,
             "file_url": file_url,
-            "predicted_label": prediction if prediction else "Unknown",
-            "confidence": confidence if confidence else 0
-        }
+            "upload": upload_metrics
+        }), 202
 
-        # Use a fixed result filename
-        result_filename = "result.json"
-
-        # Save the result data to a temporary file
-        with tempfile.NamedTemporaryFile(mode='w', delete=False) as temp_result_file:
-            json.dump(result_data, temp_result_file)
-            temp_result_file_path = temp_result_file.name
-
-        # Upload the result file to S3 under 'output/result/'
-        s3_client.upload_file(
-            temp_result_file_path,
-            S3_BUCKET,
-            f'output/result/{result_filename}'
-        )
-
-        # Clean up the temporary file
-        os.remove(temp_result_file_path)
+    except UploadError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Error in upload_and_process: {e}")
+        return jsonify({"error": str(e)}), 500
 
-        # Generate a pre-signed URL for the result file
-        result_file_url = s3_client.generate_presigned_url(
-            'get_object',
-            Params={'Bucket': S3_BUCKET, 'Key': f'output/result/{result_filename}'},
-            ExpiresIn=3600  # URL valid for 1 hour
-        )
+@app.route('/upload-and-process-batch', methods=['POST'])
+@timed('upload_and_process_batch_request', outcome_of=response_outcome)
+def upload_and_process_batch():
+    job_id = new_job_id()
+    documents = []
+    try:
+        upload = MultipartFileStream(request.stream, request.content_type, field_name='files')
+
+        # Files arrive one after another in the body; each is streamed to S3 before the next is read,
+        # so the file count is only known once the limit is crossed and the files so far are removed
+        client_filename = upload.open_file()
+        while client_filename is not None:
+            if len(documents) >= MAX_BATCH_FILES:
+                delete_uploaded_files(documents)
+                return jsonify({"error": f"At most {MAX_BATCH_FILES} files per batch"}), 400
+
+            if client_filename == '' or not allowed_file(client_filename):
+                for _ in upload.iter_data():
+                    pass
+                documents.append({"filename": client_filename, "error": "File type not allowed"})
+            else:
+                # Every document has a job folder of its own, so files with the same name don't share a key
+                document_id = document_job_id(job_id, len(documents))
+                filename = secure_filename(client_filename)
+                file_url, doc_hash, _ = upload_file_to_s3(upload.iter_data(), filename, document_id)
+                documents.append({"filename": filename, "job_id": document_id, "file_url": file_url,
+                                  "doc_hash": doc_hash})
+
+            client_filename = upload.open_file()
+
+        if not documents:
+            return jsonify({"error": "No files in the request"}), 400
+
+        job_manager.submit(run_batch_job, documents, job_id=job_id)
 
         return jsonify({
-            "file_url": file_url,
-            "result_file_url": result_file_url,
-            "predicted_label": prediction if prediction else "Unknown",
-            "confidence": confidence if confidence else 0
-        }), 200
-
+            "job_id": job_id,
+            "status": JOB_QUEUED,
+            "files": [doc['filename'] for doc in documents],
+            # Questions about a document of the batch are asked with its own job ID
+            "documents": [{"filename": doc['filename'], "job_id": doc.get('job_id')} for doc in documents]
+        }), 202
+
+    except UploadError as e:
+        delete_uploaded_files(documents)
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        app.logger.error(f"Error in upload_and_process: {e}")
+        app.logger.error(f"Error in upload_and_process_batch: {e}")
+        delete_uploaded_files(documents)
         return jsonify({"error": str(e)}), 500
 
 # Existing endpoints
@@ -165,14 +336,25 @@ def get_prediction_endpoint():
 
 @app.route('/get-prediction-result', methods=['GET'])
 def get_prediction_result():
-    # Since the result filename is fixed, you can optionally remove the query parameter
-    result_filename = request.args.get('result_filename', 'result.json')
-
-    result_data = get_prediction_result_from_s3(result_filename)
-    if result_data:
-        return jsonify(result_data), 200
-    else:
-        return jsonify({"error": "Failed to retrieve prediction result"}), 500
+    job_id = request.args.get('job_id')
+    if not job_id:
+        return jsonify({"error": "Missing job_id"}), 400
+
+    job = job_manager.get(job_id)
+    if job is None:
+        # Not tracked by this process (e.g. after a restart), fall back to the stored result
+        result_data = get_prediction_result_from_s3(RESULT_FILENAME, job_id)
+        if result_data:
+            return jsonify(dict(result_data, status=JOB_SUCCEEDED)), 200
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+
+    if job['status'] == JOB_SUCCEEDED:
+        return jsonify(dict(job['result'], status=JOB_SUCCEEDED)), 200
+    if job['status'] == JOB_FAILED:
+        return jsonify({"job_id": job_id, "status": JOB_FAILED, "error": job['error']}), 500
+
+    # Still queued or running
+    return jsonify({"job_id": job_id, "status": job['status']}), 202
 
 if __name__ == '__main__':
     app.run(debug=True, port=8080)
@@ -0,0 +1,130 @@
+# File: ./aws_clients.py
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Connections kept open per client; botocore's default of 10 is below the worker pool sizes
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '50'))
+AWS_CONNECT_TIMEOUT = float(os.environ.get('AWS_CONNECT_TIMEOUT', '5'))
+AWS_READ_TIMEOUT = float(os.environ.get('AWS_READ_TIMEOUT', '60'))
+AWS_MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', '5'))
+
+# Services created and connected at startup by warm_up when AWS_WARM_UP=1
+AWS_WARM_UP = os.environ.get('AWS_WARM_UP', '0') == '1'
+
+# Cheap read-only calls that open a pooled connection to a service's endpoint. Errors
+# (e.g. missing permissions) are ignored: the connection stays open either way.
+# Services without an entry only get their client built.
+WARM_UP_CALLS = {
+    's3': ('list_buckets', {}),
+    'polly': ('describe_voices', {'LanguageCode': 'en-US'}),
+    'translate': ('list_languages', {'MaxResults': 1}),
+}
+
+_session = None
+_clients = {}
+_lock = threading.Lock()
+
+
+def client_config(**overrides):
+    """
+    The botocore Config every shared client uses: a connection pool of
+    AWS_MAX_POOL_CONNECTIONS, TCP keep-alive, connect/read timeouts and adaptive retries.
+
+    :param overrides: Config arguments replacing the defaults, e.g. retries
+    """
+    defaults = {
+        'max_pool_connections': AWS_MAX_POOL_CONNECTIONS,
+        'tcp_keepalive': True,
+        'connect_timeout': AWS_CONNECT_TIMEOUT,
+        'read_timeout': AWS_READ_TIMEOUT,
+        'retries': {'mode': 'adaptive', 'max_attempts': AWS_MAX_ATTEMPTS},
+    }
+    defaults.update(overrides)
+    return Config(**defaults)
+
+
+def get_session():
+    """
+    The process-wide boto3 session; credentials are resolved once and shared.
+    """
+    global _session
+    if _session is not None:
+        return _session
+    with _lock:
+        if _session is None:
+            _session = boto3.session.Session()
+        return _session
+
+
+def get_client(service_name, region_name=None, **config_overrides):
+    """
+    Returns the shared client for (service, region), creating it on first use.
+
+    boto3 clients are thread-safe, so every thread and request of the process can
+    use the same one and reuse its pooled, kept-alive connections.
+
+    :param service_name: e.g. 's3', 'textract', 'bedrock-runtime'
+    :param region_name: Defaults to the session's region, resolved by boto3 from the
+        environment, the active profile or ~/.aws/config
+    :param config_overrides: client_config arguments; clients with different overrides are cached apart
+    """
+    session = get_session()
+    key = (service_name, region_name or session.region_name,
+           tuple(sorted((name, repr(value)) for name, value in config_overrides.items())))
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            # Creating clients from one session is not thread-safe, hence the lock
+            client = session.client(service_name, region_name=region_name, config=client_config(**config_overrides))
+            _clients[key] = client
+    return client
+
+
+def _warm_up_client(service_name, region_name):
+    start = time.perf_counter()
+    client = get_client(service_name, region_name)
+    call = WARM_UP_CALLS.get(service_name)
+    if call is not None:
+        operation, params = call
+        try:
+            getattr(client, operation)(**params)
+        except (BotoCoreError, ClientError) as e:
+            logger.debug(f"Warm-up call {service_name}.{operation} failed: {e}")
+    return (time.perf_counter() - start) * 1000
+
+
+def warm_up(services, region_name=None, background=False):
+    """
+    Creates the clients of services and opens a connection to each endpoint, in
+    parallel, so the first real request does not pay for it.
+
+    :param services: Service names, e.g. ('s3', 'textract')
+    :param background: Run on a daemon thread and return immediately
+    :return: {service: milliseconds} when run in the foreground, else the thread
+    """
+    if background:
+        thread = threading.Thread(target=warm_up, args=(services, region_name), daemon=True, name='aws-warm-up')
+        thread.start()
+        return thread
+
+    # Resolve credentials once up front (an instance metadata lookup on EC2) instead of per client
+    get_session().get_credentials()
+    with ThreadPoolExecutor(max_workers=max(1, len(services))) as executor:
+        timings = dict(zip(services, executor.map(lambda service: _warm_up_client(service, region_name), services)))
+    logger.info(f"Warmed up AWS clients: {', '.join(f'{name} {ms:.0f} ms' for name, ms in timings.items())}")
+    return timings
@@ -0,0 +1,109 @@
+# File: ./aws_sagemaker/batching.py
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from metrics import Histogram, registry
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Scraped at /metrics with the stage timings, labelled by batcher name
+batch_size = registry.register(Histogram(
+    'micro_batch_size',
+    'Items sent in one batched backend call.',
+    ('batcher',),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+))
+batch_queue_wait = registry.register(Histogram(
+    'micro_batch_queue_wait_seconds',
+    'Time an item waited for its batch to be dispatched.',
+    ('batcher',),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+))
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-item requests into batches for one backend call.
+
+    A batch is sent once max_batch_size items are waiting or max_wait seconds after
+    its first item arrived, whichever comes first. Up to max_in_flight batches can be
+    invoked at the same time while the next one is being collected.
+    """
+
+    def __init__(self, predict_batch, max_batch_size=32, max_wait=0.01, max_in_flight=4, name='predict'):
+        """
+        :param predict_batch: Callable taking a list of items and returning a list of results in the same order
+        :param max_batch_size: Largest number of items sent in one call
+        :param max_wait: Seconds the first item of a batch waits for others to join
+        :param max_in_flight: Number of batches invoked concurrently
+        :param name: Value of the batcher label of the batch size and queue wait histograms
+        """
+        self.predict_batch = predict_batch
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='predict-batch')
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, item):
+        """
+        Queues one item for the next batch.
+
+        :param item: Item passed to predict_batch
+        :return: Future resolving to this item's result
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future, time.monotonic()))
+        return future
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._collect, name='predict-batcher', daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        while True:
+            first = self._queue.get()
+            batch = [first]
+            deadline = first[2] + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        dispatched_at = time.monotonic()
+        waits = [dispatched_at - enqueued_at for _, _, enqueued_at in batch]
+        batch_size.observe(len(batch), batcher=self.name)
+        for wait in waits:
+            batch_queue_wait.observe(wait, batcher=self.name)
+
+        try:
+            results = self.predict_batch([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"Expected {len(batch)} results, got {len(results)}")
+        except Exception as e:
+            logger.error(f"Batch prediction failed: {e}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        logger.info(f"Dispatched batch of {len(batch)}, max queue wait {max(waits) * 1000:.1f} ms")
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
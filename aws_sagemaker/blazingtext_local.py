@@ -0,0 +1,439 @@
+# File: ./aws_sagemaker/blazingtext_local.py
+
+import argparse
+import json
+import logging
+import os
+import struct
+import sys
+import tarfile
+import tempfile
+import numpy as np
+
+# Run as a script (python aws_sagemaker/blazingtext_local.py), only this directory is on
+# sys.path; aws_clients.py is found from the repository root
+if __name__ == '__main__' and not __package__:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aws_clients import get_client
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# fastText binary format constants
+FASTTEXT_MAGIC = 793712314
+FASTTEXT_VERSION = 12
+EOS = '</s>'
+ENTRY_WORD = 0
+ENTRY_LABEL = 1
+LOSS_SOFTMAX = 3
+LOSS_OVA = 4
+
+MASK64 = (1 << 64) - 1
+NGRAM_HASH_MULTIPLIER = 116049371
+
+# fastText reports exp(log(p + 1e-5)), and so does the BlazingText endpoint
+PROB_EPSILON = 1e-5
+
+# fastText's one-vs-all loss reads sigmoids from a lookup table
+MAX_SIGMOID = 8
+SIGMOID_TABLE_SIZE = 512
+SIGMOID_TABLE = (1.0 / (1.0 + np.exp(
+    -(np.arange(SIGMOID_TABLE_SIZE + 1) * 2.0 * MAX_SIGMOID / SIGMOID_TABLE_SIZE - MAX_SIGMOID)
+))).astype(np.float32)
+
+# Characters fastText splits tokens on
+WHITESPACE = ' \n\r\t\v\f\0'
+
+# Wrapped around a word before its character n-grams are taken
+BOW = b'<'
+EOW = b'>'
+
+
+def fasttext_hash(token):
+    """
+    FNV-1a hash of a token, matching fastText's Dictionary::hash.
+
+    fastText feeds each byte through int8_t, so bytes >= 0x80 are sign extended.
+
+    :param token: Token string, or its UTF-8 bytes
+    :return: Hash as a signed 32-bit integer, as stored in fastText's word_hashes
+    """
+    if isinstance(token, str):
+        token = token.encode('utf-8')
+    h = 2166136261
+    for byte in token:
+        if byte >= 0x80:
+            byte |= 0xFFFFFF00
+        h = ((h ^ byte) * 16777619) & 0xFFFFFFFF
+    return h - (1 << 32) if h >= (1 << 31) else h
+
+
+class _Reader:
+    """Sequential reader over the fastText binary model."""
+
+    def __init__(self, f):
+        self.f = f
+
+    def read(self, fmt):
+        size = struct.calcsize(fmt)
+        return struct.unpack(fmt, self.f.read(size))
+
+    def read_word(self):
+        chars = bytearray()
+        while True:
+            c = self.f.read(1)
+            if not c or c == b'\0':
+                return chars.decode('utf-8', errors='replace')
+            chars += c
+
+
+class BlazingTextModel:
+    """
+    In-process inference for BlazingText supervised models (fastText-compatible model.bin).
+
+    Features are built the way fastText builds them at prediction time: vocabulary
+    word IDs, hashed character n-grams when the model was trained with subwords
+    (maxn > 0) and hashed word n-grams, averaged into the hidden vector. The input
+    matrix is memory mapped, so a model with millions of hash buckets loads quickly
+    and only the rows used by a document are read.
+    """
+
+    def __init__(self, args, words, word_types, nwords, pruneidx, input_matrix, output_matrix):
+        self.args = args
+        self.words = words
+        self.nwords = nwords
+        self.labels = [w for w, t in zip(words, word_types) if t == ENTRY_LABEL]
+        self.word_to_id = {w: i for i, (w, t) in enumerate(zip(words, word_types)) if t == ENTRY_WORD}
+        self.pruneidx = pruneidx
+        self.input_matrix = input_matrix
+        self.output_matrix = np.asarray(output_matrix, dtype=np.float32)
+        self._subwords = {}  # word ID -> the word's ID and character n-gram rows
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a model from a model.bin file or a training job model.tar.gz.
+
+        :param path: Local path or s3:// URI of model.bin or model.tar.gz
+        :return: BlazingTextModel
+        """
+        if path.startswith('s3://'):
+            path = _download_from_s3(path)
+        if path.endswith('.tar.gz'):
+            path = _extract_model_bin(path)
+
+        with open(path, 'rb') as f:
+            reader = _Reader(f)
+            magic, version = reader.read('<ii')
+            if magic != FASTTEXT_MAGIC or version > FASTTEXT_VERSION:
+                raise ValueError(f"{path} is not a supported fastText/BlazingText model")
+
+            (dim, ws, epoch, min_count, neg, word_ngrams, loss, model, bucket,
+             minn, maxn, lr_update_rate) = reader.read('<12i')
+            (t,) = reader.read('<d')
+            args = {
+                'dim': dim, 'word_ngrams': word_ngrams, 'loss': loss, 'model': model,
+                'bucket': bucket, 'minn': minn, 'maxn': maxn,
+            }
+            if loss not in (LOSS_SOFTMAX, LOSS_OVA):
+                raise ValueError(f"Unsupported loss {loss}; only softmax and one-vs-all models can be served locally")
+
+            size, nwords, nlabels = reader.read('<3i')
+            ntokens, pruneidx_size = reader.read('<2q')
+            words = []
+            word_types = []
+            for _ in range(size):
+                words.append(reader.read_word())
+                reader.read('<q')  # count
+                (entry_type,) = reader.read('<b')
+                word_types.append(entry_type)
+            pruneidx = None
+            if pruneidx_size >= 0:
+                pruneidx = dict(reader.read('<2i') for _ in range(pruneidx_size))
+
+            (quant_input,) = reader.read('<?')
+            if quant_input:
+                raise ValueError("Quantized models are not supported")
+            rows, cols = reader.read('<2q')
+            input_offset = f.tell()
+            f.seek(rows * cols * 4, os.SEEK_CUR)
+
+            (quant_output,) = reader.read('<?')
+            if quant_output:
+                raise ValueError("Quantized models are not supported")
+            out_rows, out_cols = reader.read('<2q')
+            output_matrix = np.fromfile(f, dtype='<f4', count=out_rows * out_cols).reshape(out_rows, out_cols)
+
+        input_matrix = np.memmap(path, dtype='<f4', mode='r', offset=input_offset, shape=(rows, cols))
+        logger.info(f"Loaded BlazingText model from {path}: {nwords} words, {nlabels} labels, dim {dim}")
+        return cls(args, words, word_types, nwords, pruneidx, input_matrix, output_matrix)
+
+    def features(self, text):
+        """
+        Returns the input matrix rows fastText averages for a line of text.
+
+        :param text: Input text
+        :return: List of input matrix row indices
+        """
+        ids = []
+        hashes = []
+        subwords = self.args['maxn'] > 0
+        tokens = _tokenize(text)
+        tokens.append(EOS)
+        for token in tokens:
+            if token.startswith('__label__'):
+                continue
+            wid = self.word_to_id.get(token)
+            if not subwords:
+                if wid is not None:
+                    ids.append(wid)
+            elif wid is not None:
+                ids.extend(self.word_subwords(wid))
+            elif token != EOS:
+                # Out-of-vocabulary words are represented by their character n-grams alone
+                self._push_char_ngrams(ids, token)
+            hashes.append(fasttext_hash(token))
+
+        # Word n-grams are hashed over all tokens, including out-of-vocabulary ones
+        n = self.args['word_ngrams']
+        bucket = self.args['bucket']
+        if n > 1 and bucket > 0:
+            for i in range(len(hashes)):
+                h = hashes[i] & MASK64
+                for j in range(i + 1, min(len(hashes), i + n)):
+                    h = (h * NGRAM_HASH_MULTIPLIER + (hashes[j] & MASK64)) & MASK64
+                    self._push_hash(ids, h % bucket)
+        return ids
+
+    def word_subwords(self, wid):
+        """
+        Returns a vocabulary word's input rows: its own ID followed by its character n-grams.
+        """
+        rows = self._subwords.get(wid)
+        if rows is None:
+            rows = [wid]
+            if self.words[wid] != EOS:
+                self._push_char_ngrams(rows, self.words[wid])
+            self._subwords[wid] = rows
+        return rows
+
+    def _push_char_ngrams(self, ids, word):
+        # Dictionary::computeSubwords: n-grams of minn..maxn UTF-8 characters of <word>,
+        # leaving out the single-character n-grams made of just '<' or '>'
+        minn, maxn, bucket = self.args['minn'], self.args['maxn'], self.args['bucket']
+        if bucket <= 0:
+            return
+        chars = BOW + word.encode('utf-8') + EOW
+        size = len(chars)
+        for i in range(size):
+            if chars[i] & 0xC0 == 0x80:
+                continue
+            j = i
+            n = 1
+            while j < size and n <= maxn:
+                j += 1
+                while j < size and chars[j] & 0xC0 == 0x80:
+                    j += 1
+                if n >= minn and not (n == 1 and (i == 0 or j == size)):
+                    self._push_hash(ids, (fasttext_hash(chars[i:j]) & 0xFFFFFFFF) % bucket)
+                n += 1
+
+    def _push_hash(self, ids, bucket_id):
+        if self.pruneidx is not None:
+            if bucket_id not in self.pruneidx:
+                return
+            bucket_id = self.pruneidx[bucket_id]
+        ids.append(self.nwords + bucket_id)
+
+    def predict(self, text, k=1):
+        """
+        Predicts the top k labels of a text.
+
+        :param text: Input text
+        :param k: Number of labels to return
+        :return: Dictionary with 'label' and 'prob' lists, as returned by the endpoint
+        """
+        ids = self.features(text)
+        if not ids:
+            return {'label': [], 'prob': []}
+
+        hidden = np.asarray(self.input_matrix[ids], dtype=np.float32).mean(axis=0)
+        scores = self.output_matrix @ hidden
+        if self.args['loss'] == LOSS_SOFTMAX:
+            scores = np.exp(scores - scores.max())
+            probs = scores / scores.sum()
+        else:
+            probs = _table_sigmoid(scores)
+
+        top = np.argsort(-probs, kind='stable')[:k]
+        return {
+            'label': [self.labels[i] for i in top],
+            'prob': [float(probs[i]) + PROB_EPSILON for i in top]
+        }
+
+
+class LocalPredictor:
+    """
+    Drop-in replacement for the SageMaker Predictor, answering {"instances": [...]}
+    payloads with the in-process model instead of the endpoint.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, payload):
+        k = payload.get('configuration', {}).get('k', 1)
+        return [self.model.predict(text, k=k) for text in payload['instances']]
+
+
+def _table_sigmoid(x):
+    idx = ((np.clip(x, -MAX_SIGMOID, MAX_SIGMOID) + MAX_SIGMOID) * SIGMOID_TABLE_SIZE / MAX_SIGMOID / 2).astype(np.int64)
+    probs = SIGMOID_TABLE[idx]
+    probs[x < -MAX_SIGMOID] = 0.0
+    probs[x > MAX_SIGMOID] = 1.0
+    return probs
+
+
+def _tokenize(text):
+    tokens = []
+    start = None
+    for i, c in enumerate(text):
+        if c in WHITESPACE:
+            if start is not None:
+                tokens.append(text[start:i])
+                start = None
+        elif start is None:
+            start = i
+    if start is not None:
+        tokens.append(text[start:])
+    return tokens
+
+
+def _download_from_s3(uri, s3_client=None):
+    """
+    Downloads an S3 object once per version, keyed on its ETag, so a retrained
+    model uploaded under the same key is fetched again.
+
+    The object is written to a temporary file and renamed into place, so a download
+    cut short never leaves a partial file behind to be loaded later.
+
+    :return: Local path of the downloaded object
+    """
+    s3_client = s3_client or get_client('s3')
+    bucket, key = uri[len('s3://'):].split('/', 1)
+    etag = s3_client.head_object(Bucket=bucket, Key=key)['ETag'].strip('"')
+    local_dir = os.path.join(tempfile.gettempdir(), 'blazingtext', bucket, os.path.dirname(key), etag)
+    local_path = os.path.join(local_dir, os.path.basename(key))
+    if not os.path.exists(local_path):
+        os.makedirs(local_dir, exist_ok=True)
+        logger.info(f"Downloading model artifact {uri} (ETag {etag})")
+        fd, tmp_path = tempfile.mkstemp(dir=local_dir, suffix='.part')
+        os.close(fd)
+        try:
+            # IfMatch fails the download if the object changed after head_object
+            s3_client.download_file(bucket, key, tmp_path, ExtraArgs={'IfMatch': f'"{etag}"'})
+            os.replace(tmp_path, local_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    return local_path
+
+
+def _extract_model_bin(archive_path):
+    # Extract next to the archive once; later loads reuse the extracted file
+    target = archive_path[:-len('.tar.gz')] + '_model.bin'
+    if not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(archive_path):
+        with tarfile.open(archive_path, 'r:gz') as tar:
+            member = next((m for m in tar.getmembers() if os.path.basename(m.name) == 'model.bin'), None)
+            if member is None:
+                raise ValueError(f"No model.bin in {archive_path}")
+            with tar.extractfile(member) as src, open(target + '.tmp', 'wb') as dst:
+                while True:
+                    chunk = src.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+        os.replace(target + '.tmp', target)
+    return target
+
+
+def check_parity(model, recorded, tolerance=1e-4):
+    """
+    Compares local predictions with recorded endpoint responses.
+
+    :param model: BlazingTextModel
+    :param recorded: List of {"instance": text, "response": {"label": [...], "prob": [...]}}
+    :param tolerance: Largest allowed probability difference
+    :return: List of mismatch descriptions, empty when all predictions agree
+    """
+    mismatches = []
+    for i, record in enumerate(recorded):
+        expected = record['response']
+        actual = model.predict(record['instance'], k=len(expected['label']) or 1)
+        if actual['label'] != expected['label']:
+            mismatches.append(f"#{i}: labels {actual['label']} != {expected['label']}")
+            continue
+        for p_actual, p_expected in zip(actual['prob'], expected['prob']):
+            if abs(p_actual - p_expected) > tolerance:
+                mismatches.append(f"#{i}: prob {p_actual} != {p_expected}")
+                break
+    return mismatches
+
+
+def record_endpoint_responses(endpoint_name, texts, k=1):
+    """
+    Invokes the endpoint with each text and records its responses for check_parity.
+
+    :param endpoint_name: SageMaker endpoint name
+    :param texts: List of input texts
+    :param k: Number of labels to request
+    :return: List of {"instance": text, "response": {...}}
+    """
+    runtime = get_client('sagemaker-runtime')
+    recorded = []
+    for text in texts:
+        response = runtime.invoke_endpoint(
+            EndpointName=endpoint_name,
+            ContentType='application/json',
+            Body=json.dumps({'instances': [text], 'configuration': {'k': k}})
+        )
+        recorded.append({'instance': text, 'response': json.loads(response['Body'].read())[0]})
+    return recorded
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run or verify the local BlazingText model.")
+    parser.add_argument('--model', type=str, help='Path or s3:// URI of model.tar.gz or model.bin')
+    parser.add_argument('--parity', type=str, help='JSON file of recorded endpoint responses to compare against')
+    parser.add_argument('--record', type=str, help='Text file (one document per line) to record endpoint responses for')
+    parser.add_argument('--endpoint-name', type=str, help='Endpoint used with --record')
+    parser.add_argument('--output', type=str, default='recorded_responses.json', help='Where --record writes responses')
+    parser.add_argument('--text', type=str, help='Text to classify')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.record:
+        with open(args.record, 'r', encoding='utf-8') as f:
+            texts = [line.rstrip('\n') for line in f if line.strip()]
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(record_endpoint_responses(args.endpoint_name, texts), f, indent=4)
+        print(f"Recorded {len(texts)} endpoint responses to {args.output}")
+        sys.exit(0)
+
+    if not args.model:
+        parser.error('--model is required unless --record is given')
+    bt_model = BlazingTextModel.load(args.model)
+
+    if args.parity:
+        with open(args.parity, 'r', encoding='utf-8') as f:
+            recorded = json.load(f)
+        mismatches = check_parity(bt_model, recorded)
+        for mismatch in mismatches:
+            print(mismatch)
+        print(f"{len(recorded) - len(mismatches)}/{len(recorded)} predictions match the endpoint")
+        sys.exit(1 if mismatches else 0)
+
+    if args.text:
+        print(bt_model.predict(args.text))
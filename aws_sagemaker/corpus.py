@@ -0,0 +1,218 @@
+# File: ./aws_sagemaker/corpus.py
+
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from corpus_store import CorpusStore
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_WORKERS = int(os.environ.get('CORPUS_DOWNLOAD_WORKERS', '32'))
+PARSE_WORKERS = int(os.environ.get('CORPUS_PARSE_WORKERS', str(os.cpu_count() or 1)))
+PARSE_CHUNKSIZE = 64
+
+
+def list_datasets(s3_client, bucket, prefix='datasets'):
+    """
+    Lists the dataset folders directly under prefix with a delimiter listing,
+    so only the folder names are returned instead of every object below them.
+
+    :return: Sorted list of dataset names
+    """
+    paginator = s3_client.get_paginator('list_objects_v2')
+    names = []
+    for page in paginator.paginate(Bucket=bucket, Prefix=f'{prefix}/', Delimiter='/'):
+        for common_prefix in page.get('CommonPrefixes', []):
+            names.append(common_prefix['Prefix'][len(prefix) + 1:].rstrip('/'))
+    return sorted(names)
+
+
+def list_ocr_objects(s3_client, bucket, prefix, dataset_name):
+    """
+    Lists the OCR JSON objects of one dataset, in key order.
+
+    :return: List of (key, ETag) tuples
+    """
+    paginator = s3_client.get_paginator('list_objects_v2')
+    objects = []
+    for page in paginator.paginate(Bucket=bucket, Prefix=f'{prefix}/{dataset_name}/ocr_output/'):
+        for obj in page.get('Contents', []):
+            if obj['Key'].endswith('.json'):
+                objects.append((obj['Key'], obj['ETag']))
+    return objects
+
+
+def list_ocr_keys(s3_client, bucket, prefix, dataset_name):
+    """
+    Lists the OCR JSON keys of one dataset, in key order.
+    """
+    return [key for key, _ in list_ocr_objects(s3_client, bucket, prefix, dataset_name)]
+
+
+def parse_ocr_file(path):
+    """
+    Reads an OCR JSON file and joins its words into one string.
+    Runs in the parse worker processes.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return ' '.join([word['Text'] for word in data.get('Words', [])])
+
+
+def _fork_context():
+    # The training scripts run at module level without a __main__ guard, so start
+    # methods that re-import the main module (spawn, forkserver) would re-run them
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+
+def local_ocr_path(local_data_dir, dataset_name, key):
+    return os.path.join(local_data_dir, dataset_name, os.path.basename(key))
+
+
+def fetch_texts(s3_client, bucket, items, local_data_dir, refresh=(),
+                download_workers=DOWNLOAD_WORKERS, parse_workers=PARSE_WORKERS):
+    """
+    Downloads OCR files on a thread pool and parses them in a process pool as their
+    downloads finish. Files already present locally are not downloaded again
+    unless their key is in refresh.
+
+    :param items: List of (dataset_name, key)
+    :param refresh: Keys whose local copy is outdated
+    :return: List of texts, in the order of items
+    """
+    refresh = set(refresh)
+    parse_pool = None
+    if parse_workers > 1 and len(items) > 1:
+        parse_pool = ProcessPoolExecutor(max_workers=parse_workers, mp_context=_fork_context())
+        # Start the workers now, before any download thread exists, so forking is safe
+        parse_pool.submit(os.getpid).result()
+
+    def download(item):
+        dataset_name, key = item
+        local_path = local_ocr_path(local_data_dir, dataset_name, key)
+        if key in refresh or not os.path.exists(local_path):
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            # Download under a temporary name so an interrupted run never leaves a partial file
+            s3_client.download_file(bucket, key, local_path + '.part')
+            os.replace(local_path + '.part', local_path)
+        return local_path
+
+    with ThreadPoolExecutor(max_workers=download_workers) as download_pool:
+        # map yields in submission order; the parse pool picks each file up once it is downloaded
+        local_paths = download_pool.map(download, items)
+        if parse_pool is not None:
+            with parse_pool:
+                return list(parse_pool.map(parse_ocr_file, local_paths, chunksize=PARSE_CHUNKSIZE))
+        return [parse_ocr_file(path) for path in local_paths]
+
+
+def list_corpus_objects(s3_client, bucket, prefix, dataset_names, download_workers=DOWNLOAD_WORKERS):
+    """
+    Lists every dataset's OCR objects in parallel.
+
+    :return: List of (dataset_name, key, ETag), ordered by dataset, then key
+    """
+    with ThreadPoolExecutor(max_workers=download_workers) as pool:
+        object_lists = pool.map(
+            lambda dataset_name: list_ocr_objects(s3_client, bucket, prefix, dataset_name), dataset_names
+        )
+        return [
+            (dataset_name, key, etag)
+            for dataset_name, objects in zip(dataset_names, object_lists)
+            for key, etag in objects
+        ]
+
+
+def build_corpus(s3_client, bucket, prefix='datasets', dataset_names=None, local_data_dir='data',
+                 label_fn=None, download_workers=DOWNLOAD_WORKERS, parse_workers=PARSE_WORKERS):
+    """
+    Downloads and parses the OCR output of every dataset into (text, label) records.
+
+    Keys are listed per dataset and downloaded on a thread pool, skipping files
+    already present locally. Files are parsed in a process pool as their downloads
+    finish. Records come back ordered by dataset, then key, whatever order the
+    downloads complete in.
+
+    :param s3_client: boto3 S3 client
+    :param bucket: Bucket holding the datasets
+    :param prefix: Folder containing one sub-folder per dataset
+    :param dataset_names: Datasets to include; discovered with list_datasets when None
+    :param local_data_dir: Directory the OCR files are cached in, one sub-folder per dataset
+    :param label_fn: Maps a dataset name to its label; defaults to the dataset name
+    :return: List of (text, label) tuples
+    """
+    if dataset_names is None:
+        dataset_names = list_datasets(s3_client, bucket, prefix)
+    logger.info(f"Datasets: {dataset_names}")
+    label_fn = label_fn or (lambda dataset_name: dataset_name)
+
+    items = [(dataset_name, key) for dataset_name, key, _ in
+             list_corpus_objects(s3_client, bucket, prefix, dataset_names, download_workers)]
+    logger.info(f"Found {len(items)} OCR files")
+    texts = fetch_texts(s3_client, bucket, items, local_data_dir,
+                        download_workers=download_workers, parse_workers=parse_workers)
+    return [(text, label_fn(dataset_name)) for text, (dataset_name, _) in zip(texts, items)]
+
+
+def update_corpus_store(s3_client, bucket, prefix='datasets', dataset_names=None, local_data_dir='data',
+                        store_path=None, label_fn=None, download_workers=DOWNLOAD_WORKERS,
+                        parse_workers=PARSE_WORKERS):
+    """
+    Like build_corpus, but keeps the parsed corpus in a memory-mapped CorpusStore.
+
+    Only documents that are new or whose ETag changed since the last run are
+    downloaded and parsed; on a rerun with no changes this is a listing plus
+    opening the store.
+
+    :param store_path: Store directory; defaults to <local_data_dir>/corpus
+    :return: The up to date CorpusStore
+    """
+    if dataset_names is None:
+        dataset_names = list_datasets(s3_client, bucket, prefix)
+    logger.info(f"Datasets: {dataset_names}")
+    label_fn = label_fn or (lambda dataset_name: dataset_name)
+    store_path = store_path or os.path.join(local_data_dir, 'corpus')
+
+    objects = list_corpus_objects(s3_client, bucket, prefix, dataset_names, download_workers)
+    dataset_of = {key: dataset_name for dataset_name, key, _ in objects}
+    entries = [(key, etag, label_fn(dataset_name)) for dataset_name, key, etag in objects]
+
+    def load_texts(keys):
+        # Anything being (re)loaded is new or changed, so local copies can't be trusted
+        return fetch_texts(s3_client, bucket, [(dataset_of[key], key) for key in keys], local_data_dir,
+                           refresh=keys, download_workers=download_workers, parse_workers=parse_workers)
+
+    return CorpusStore.update(store_path, entries, load_texts)
+
+
+def update_corpus_store_from_local(local_data_dir='data', store_path=None, label_fn=None,
+                                   parse_workers=PARSE_WORKERS):
+    """
+    Builds or refreshes a CorpusStore from OCR files already on disk, laid out as
+    <local_data_dir>/<dataset>/*.json, using file mtime and size to detect changes.
+    """
+    label_fn = label_fn or (lambda dataset_name: dataset_name)
+    store_path = store_path or os.path.join(local_data_dir, 'corpus')
+    entries = []
+    for dataset_name in sorted(os.listdir(local_data_dir)):
+        dataset_dir = os.path.join(local_data_dir, dataset_name)
+        if not os.path.isdir(dataset_dir) or os.path.abspath(dataset_dir) == os.path.abspath(store_path):
+            continue
+        for name in sorted(os.listdir(dataset_dir)):
+            if name.endswith('.json'):
+                path = os.path.join(dataset_dir, name)
+                stat = os.stat(path)
+                entries.append((path, f'{stat.st_mtime_ns}:{stat.st_size}', label_fn(dataset_name)))
+
+    def load_texts(paths):
+        if parse_workers > 1 and len(paths) > 1:
+            with ProcessPoolExecutor(max_workers=parse_workers, mp_context=_fork_context()) as pool:
+                return list(pool.map(parse_ocr_file, paths, chunksize=PARSE_CHUNKSIZE))
+        return [parse_ocr_file(path) for path in paths]
+
+    return CorpusStore.update(store_path, entries, load_texts)
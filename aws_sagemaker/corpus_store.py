@@ -0,0 +1,234 @@
+# File: ./aws_sagemaker/corpus_store.py
+
+import json
+import logging
+import mmap
+import os
+import sys
+import zlib
+from array import array
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+META_FILE = 'meta.json'
+BLAZINGTEXT_CHUNK_SIZE = 1024 * 1024
+
+
+def _map_file(path):
+    """
+    Memory-maps a file read-only; empty files (an empty corpus) map to b''.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _write_array(path, typecode, values):
+    data = array(typecode, values)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    with open(path, 'wb') as f:
+        data.tofile(f)
+
+
+def gzip_chunks(chunks, level=6):
+    """
+    Compresses a stream of byte chunks into gzip format as it goes.
+
+    :param chunks: Iterable of bytes
+    :param level: zlib compression level
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class CorpusStore:
+    """
+    Preprocessed training corpus on disk, opened with memory mapping.
+
+    A store is a directory holding, for generation g:
+      texts.g.bin    UTF-8 document texts, back to back
+      offsets.g.bin  count + 1 little-endian uint64 offsets into texts
+      labels.g.bin   count little-endian uint16 indices into the label names
+      sources.g.json [source, signature] per document (key and ETag, or path and mtime)
+    and meta.json naming the current generation. Updates write a new generation and
+    then replace meta.json, so readers never see a half-written store.
+
+    Opening only reads meta.json and maps the arrays, so it takes milliseconds
+    regardless of corpus size; texts are decoded on access.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        if meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported corpus store version: {meta.get('version')}")
+        self.generation = meta['generation']
+        self.label_names = meta['labels']
+        self._count = meta['count']
+        self._texts = _map_file(self._file('texts', 'bin'))
+        self._offsets = self._array(self._file('offsets', 'bin'), 'Q')
+        self._labels = self._array(self._file('labels', 'bin'), 'H')
+        self._sources = None
+
+    @classmethod
+    def open(cls, path):
+        """
+        Opens the store at path, or returns None if there is none yet.
+        """
+        if not os.path.exists(os.path.join(path, META_FILE)):
+            return None
+        return cls(path)
+
+    def _file(self, name, extension, generation=None):
+        generation = self.generation if generation is None else generation
+        return os.path.join(self.path, f'{name}.{generation}.{extension}')
+
+    @staticmethod
+    def _array(path, typecode):
+        data = _map_file(path)
+        if sys.byteorder != 'little':
+            # Rare enough to not be worth mapping; copy and swap instead
+            values = array(typecode, bytes(data))
+            values.byteswap()
+            return values
+        return memoryview(data).cast(typecode)
+
+    def __len__(self):
+        return self._count
+
+    def text_bytes(self, i):
+        return self._texts[self._offsets[i]:self._offsets[i + 1]]
+
+    def text(self, i):
+        return self.text_bytes(i).decode('utf-8')
+
+    def label_id(self, i):
+        return self._labels[i]
+
+    def label(self, i):
+        return self.label_names[self._labels[i]]
+
+    def labels(self):
+        return [self.label_names[label_id] for label_id in self._labels]
+
+    def sources(self):
+        """
+        Returns [source, signature] for every document; loaded on first use.
+        """
+        if self._sources is None:
+            with open(self._file('sources', 'json')) as f:
+                self._sources = json.load(f)
+        return self._sources
+
+    def iter_blazingtext(self, rows, label_ids, chunk_size=BLAZINGTEXT_CHUNK_SIZE):
+        """
+        Yields '__label__<id> <text>' lines for the given rows as byte chunks of about
+        chunk_size, copied straight from the mapped blob without decoding the texts.
+        Memory use is bounded by chunk_size however large the corpus is.
+
+        :param rows: Row numbers to write, in order
+        :param label_ids: Output label index for each entry of label_names
+        :param chunk_size: Approximate number of bytes per yielded chunk
+        """
+        prefixes = [f'__label__{label_id} '.encode('utf-8') for label_id in label_ids]
+        texts, offsets, labels = self._texts, self._offsets, self._labels
+        chunk = bytearray()
+        for i in rows:
+            chunk += prefixes[labels[i]]
+            chunk += texts[offsets[i]:offsets[i + 1]]
+            chunk += b'\n'
+            if len(chunk) >= chunk_size:
+                yield bytes(chunk)
+                chunk.clear()
+        if chunk:
+            yield bytes(chunk)
+
+    def write_blazingtext(self, path, rows, label_ids):
+        """
+        Writes '__label__<id> <text>' lines for the given rows to a local file.
+        """
+        with open(path, 'wb') as f:
+            for chunk in self.iter_blazingtext(rows, label_ids):
+                f.write(chunk)
+
+    def close(self):
+        for data in (self._offsets, self._labels):
+            if isinstance(data, memoryview):
+                data.release()
+        for data in (self._texts,):
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+    @classmethod
+    def update(cls, path, entries, load_texts):
+        """
+        Brings the store at path up to date with entries, reusing the stored text of
+        every entry whose source and signature are unchanged.
+
+        :param path: Store directory; created if missing
+        :param entries: List of (source, signature, label) in corpus order
+        :param load_texts: Callable taking a list of sources and returning their texts in order
+        :return: The opened, updated CorpusStore
+        """
+        os.makedirs(path, exist_ok=True)
+        old = cls.open(path)
+        reusable = {}
+        if old is not None:
+            for i, (source, signature) in enumerate(old.sources()):
+                reusable[source] = (signature, i)
+
+        stale = [source for source, signature, _ in entries
+                 if reusable.get(source, (None,))[0] != signature]
+        # Order and labels must match too, e.g. train_model and train_model2 label the same files differently
+        if (old is not None and not stale and len(entries) == len(old)
+                and all(source == old_source and label == old.label(i)
+                        for i, ((source, _, label), (old_source, _)) in enumerate(zip(entries, old.sources())))):
+            logger.info(f"Corpus store is up to date ({len(old)} documents)")
+            return old
+
+        logger.info(f"Updating corpus store: {len(entries) - len(stale)} documents reused, {len(stale)} to load")
+        fresh = dict(zip(stale, load_texts(stale))) if stale else {}
+
+        generation = old.generation + 1 if old is not None else 1
+        label_names = sorted({label for _, _, label in entries})
+        label_to_id = {label: label_id for label_id, label in enumerate(label_names)}
+
+        offsets = [0]
+        with open(os.path.join(path, f'texts.{generation}.bin'), 'wb') as f:
+            for source, signature, _ in entries:
+                if source in fresh:
+                    data = fresh[source].encode('utf-8')
+                else:
+                    data = old.text_bytes(reusable[source][1])
+                f.write(data)
+                offsets.append(offsets[-1] + len(data))
+        _write_array(os.path.join(path, f'offsets.{generation}.bin'), 'Q', offsets)
+        _write_array(os.path.join(path, f'labels.{generation}.bin'), 'H',
+                     [label_to_id[label] for _, _, label in entries])
+        with open(os.path.join(path, f'sources.{generation}.json'), 'w') as f:
+            json.dump([[source, signature] for source, signature, _ in entries], f)
+
+        # Switching meta.json publishes the new generation atomically
+        meta_tmp = os.path.join(path, META_FILE + '.tmp')
+        with open(meta_tmp, 'w') as f:
+            json.dump({'version': FORMAT_VERSION, 'generation': generation,
+                       'count': len(entries), 'labels': label_names}, f)
+        os.replace(meta_tmp, os.path.join(path, META_FILE))
+
+        if old is not None:
+            old.close()
+            for name, extension in (('texts', 'bin'), ('offsets', 'bin'), ('labels', 'bin'), ('sources', 'json')):
+                try:
+                    os.remove(old._file(name, extension))
+                except OSError as e:
+                    logger.warning(f"Could not remove old corpus file: {e}")
+        return cls(path)
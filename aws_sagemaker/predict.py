@@ -1,52 +1,149 @@
 # File: ./aws_sagemaker/predict.py
 
-import boto3
 import json
 import argparse
 import os
 import logging
-from sagemaker.predictor import Predictor
-from sagemaker.serializers import JSONSerializer
-from sagemaker.deserializers import JSONDeserializer
+import sys
+import threading
+
+# Run as a script (python aws_sagemaker/predict.py), only this directory is on sys.path;
+# the aws_sagemaker package and aws_clients.py are found from the repository root
+if __name__ == '__main__' and not __package__:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aws_sagemaker.batching import MicroBatcher
+from aws_clients import get_client
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load endpoint name
-ENDPOINT_NAME_FILE = 'endpoint_name.txt'
-if not os.path.exists(ENDPOINT_NAME_FILE):
-    logger.error(f"Endpoint name file '{ENDPOINT_NAME_FILE}' not found.")
-    exit(1)
-with open(ENDPOINT_NAME_FILE, 'r') as f:
-    endpoint_name = f.read().strip()
-
-# Load label mapping
-LABEL_MAPPING_FILE = 'label_mapping.json'
-if not os.path.exists(LABEL_MAPPING_FILE):
-    logger.error(f"Label mapping file '{LABEL_MAPPING_FILE}' not found.")
-    exit(1)
-with open(LABEL_MAPPING_FILE, 'r') as f:
-    idx_to_label = json.load(f)
-    # Convert keys to integers
-    idx_to_label = {int(k): v for k, v in idx_to_label.items()}
-# Initialize predictor with JSONSerializer
-try:
-    predictor = Predictor(
-        endpoint_name=endpoint_name,
-        serializer=JSONSerializer(),        # Send payload as JSON
-        deserializer=JSONDeserializer()     # Receive response as JSON
-    )
-    logger.info(f"SageMaker Predictor initialized for endpoint '{endpoint_name}'.")
-except Exception as e:
-    logger.error(f"Failed to initialize Predictor: {e}")
-    exit(1)
+# Configuration comes from the environment, falling back to files next to this module,
+# so the predictor works no matter which directory the app is started from
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+ENDPOINT_NAME_FILE = os.environ.get('ENDPOINT_NAME_FILE', os.path.join(PACKAGE_DIR, 'endpoint_name.txt'))
+LABEL_MAPPING_FILE = os.environ.get('LABEL_MAPPING_FILE', os.path.join(PACKAGE_DIR, 'label_mapping.json'))
+SAGEMAKER_REGION = os.environ.get('SAGEMAKER_REGION', 'us-east-1')
+
+# Prediction backend: 'endpoint' calls the SageMaker endpoint, 'local' runs the
+# trained model in-process from BLAZINGTEXT_MODEL_PATH (model.tar.gz, local or s3://)
+PREDICT_BACKEND = os.environ.get('PREDICT_BACKEND', 'endpoint')
+BLAZINGTEXT_MODEL_PATH = os.environ.get('BLAZINGTEXT_MODEL_PATH')
+
+# Built on first use by get_predictor / get_idx_to_label
+_predictor = None
+_idx_to_label = None
+_init_lock = threading.Lock()
+
+
+class EndpointPredictor:
+    """
+    Minimal JSON client for the SageMaker endpoint using the sagemaker-runtime API,
+    so serving does not need the full sagemaker SDK.
+    """
+
+    def __init__(self, endpoint_name, region_name=SAGEMAKER_REGION):
+        self.endpoint_name = endpoint_name
+        self.runtime = get_client('sagemaker-runtime', region_name)
+
+    def predict(self, payload):
+        response = self.runtime.invoke_endpoint(
+            EndpointName=self.endpoint_name,
+            ContentType='application/json',
+            Accept='application/json',
+            Body=json.dumps(payload)
+        )
+        return json.loads(response['Body'].read())
+
+
+def load_endpoint_name():
+    endpoint_name = os.environ.get('SAGEMAKER_ENDPOINT_NAME')
+    if endpoint_name:
+        return endpoint_name
+    if not os.path.exists(ENDPOINT_NAME_FILE):
+        raise RuntimeError(f"Endpoint name file '{ENDPOINT_NAME_FILE}' not found.")
+    with open(ENDPOINT_NAME_FILE, 'r') as f:
+        return f.read().strip()
+
+
+def get_idx_to_label():
+    """
+    Returns the label mapping, loading it on first use.
+    """
+    global _idx_to_label
+    if _idx_to_label is None:
+        with _init_lock:
+            if _idx_to_label is None:
+                if not os.path.exists(LABEL_MAPPING_FILE):
+                    raise RuntimeError(f"Label mapping file '{LABEL_MAPPING_FILE}' not found.")
+                with open(LABEL_MAPPING_FILE, 'r') as f:
+                    idx_to_label = json.load(f)
+                # Convert keys to integers
+                _idx_to_label = {int(k): v for k, v in idx_to_label.items()}
+    return _idx_to_label
+
+
+def get_predictor():
+    """
+    Returns the prediction client, building it on first use.
+    """
+    global _predictor
+    if _predictor is None:
+        with _init_lock:
+            if _predictor is None:
+                if PREDICT_BACKEND == 'local':
+                    # Imported here so endpoint deployments don't pay for NumPy at startup
+                    from aws_sagemaker.blazingtext_local import BlazingTextModel, LocalPredictor
+                    _predictor = LocalPredictor(BlazingTextModel.load(BLAZINGTEXT_MODEL_PATH))
+                    logger.info(f"Local BlazingText predictor initialized from '{BLAZINGTEXT_MODEL_PATH}'.")
+                else:
+                    endpoint_name = load_endpoint_name()
+                    _predictor = EndpointPredictor(endpoint_name)
+                    logger.info(f"SageMaker runtime client initialized for endpoint '{endpoint_name}'.")
+    return _predictor
+
+def extract_text(ocr_json):
+    """
+    Joins the OCR words of a document into the text sent to the model.
+
+    :param ocr_json: Dictionary containing OCR data
+    :return: Space separated words
+    """
+    words = ocr_json.get('Words', [])
+    return ' '.join([word['Text'] for word in words])
+
+
+def parse_prediction(prediction_result, idx_to_label):
+    """
+    Converts one BlazingText prediction into a label and confidence.
+
+    :param prediction_result: Dictionary with 'label' and 'prob' lists
+    :param idx_to_label: Dictionary mapping label indices to labels
+    :return: Tuple of (predicted_label, confidence) or (None, None)
+    """
+    labels = prediction_result.get('label', [])
+    probabilities = prediction_result.get('prob', [])
+    logger.info(f"Labels: {labels}, Probabilities: {probabilities}")
+
+    if labels and probabilities:
+        label_idx_str = labels[0].replace('__label__', '')
+        try:
+            label_idx = int(label_idx_str)
+            confidence = probabilities[0]
+            predicted_label = idx_to_label.get(label_idx, "Unknown")
+            logger.info(f"Predicted Label: {predicted_label}, Confidence: {confidence}")
+            return predicted_label, confidence
+        except ValueError:
+            logger.error(f"Invalid label format: {labels[0]}")
+    return None, None
+
 
 def predict_text(predictor, ocr_json, idx_to_label, threshold=0.5):
     """
     Predict the document type using SageMaker.
 
-    :param predictor: SageMaker Predictor object
+    :param predictor: Object with a predict(payload) method, e.g. EndpointPredictor
     :param ocr_json: Dictionary containing OCR data
     :param idx_to_label: Dictionary mapping label indices to labels
     :param threshold: Confidence threshold for predictions
@@ -57,8 +154,7 @@ def predict_text(predictor, ocr_json, idx_to_label, threshold=0.5):
         return None, None
 
     # Extract text from OCR JSON
-    words = ocr_json.get('Words', [])
-    text = ' '.join([word['Text'] for word in words])
+    text = extract_text(ocr_json)
 
     if not text.strip():
         logger.warning("No text extracted from OCR JSON.")
@@ -73,22 +169,7 @@ def predict_text(predictor, ocr_json, idx_to_label, threshold=0.5):
         logger.info(f"SageMaker response: {response}")
 
         if response and isinstance(response, list):
-            prediction_result = response[0]
-            labels = prediction_result.get('label', [])
-            probabilities = prediction_result.get('prob', [])
-            logger.info(f"Labels: {labels}, Probabilities: {probabilities}")
-
-            if labels and probabilities:
-                label_idx_str = labels[0].replace('__label__', '')
-                try:
-                    label_idx = int(label_idx_str)
-                    confidence = probabilities[0]
-                    predicted_label = idx_to_label.get(label_idx, "Unknown")
-                    logger.info(f"Predicted Label: {predicted_label}, Confidence: {confidence}")
-                    return predicted_label, confidence
-                except ValueError:
-                    logger.error(f"Invalid label format: {labels[0]}")
-                    return None, None
+            return parse_prediction(response[0], idx_to_label)
         else:
             logger.error("Invalid response format from SageMaker.")
             return None, None
@@ -97,7 +178,62 @@ def predict_text(predictor, ocr_json, idx_to_label, threshold=0.5):
         logger.error(f"Error during prediction: {e}")
         return None, None
 
-    return None, None
+
+def predict_texts(predictor, ocr_jsons, idx_to_label, threshold=0.5):
+    """
+    Predict the document types of many documents with a single SageMaker invocation.
+
+    :param predictor: Object with a predict(payload) method, e.g. EndpointPredictor
+    :param ocr_jsons: List of dictionaries containing OCR data
+    :param idx_to_label: Dictionary mapping label indices to labels
+    :param threshold: Confidence threshold for predictions
+    :return: List of (predicted_label, confidence) tuples, (None, None) where prediction failed
+    """
+    results = [(None, None)] * len(ocr_jsons)
+    if not predictor:
+        logger.error("Predictor is not initialized.")
+        return results
+
+    # Documents without any text are left out of the payload
+    texts = [extract_text(ocr_json) for ocr_json in ocr_jsons]
+    indices = [i for i, text in enumerate(texts) if text.strip()]
+    if not indices:
+        logger.warning("No text extracted from any OCR JSON.")
+        return results
+
+    # Prepare payload
+    payload = {"instances": [texts[i] for i in indices]}
+
+    # Send JSON payload to SageMaker
+    try:
+        response = predictor.predict(payload)
+        logger.info(f"SageMaker response: {response}")
+
+        if not isinstance(response, list) or len(response) != len(indices):
+            logger.error("Invalid response format from SageMaker.")
+            return results
+
+        for i, prediction_result in zip(indices, response):
+            results[i] = parse_prediction(prediction_result, idx_to_label)
+
+    except Exception as e:
+        logger.error(f"Error during prediction: {e}")
+
+    return results
+
+
+# Concurrent single-document predictions are merged into one endpoint invocation.
+# Set PREDICT_BATCH_WINDOW_MS=0 to send every document on its own; the local
+# backend has no round trip to save and never batches.
+PREDICT_BATCH_WINDOW_MS = float(os.environ.get('PREDICT_BATCH_WINDOW_MS', '10'))
+PREDICT_MAX_BATCH_SIZE = int(os.environ.get('PREDICT_MAX_BATCH_SIZE', '32'))
+prediction_batcher = None
+if PREDICT_BATCH_WINDOW_MS > 0 and PREDICT_BACKEND != 'local':
+    prediction_batcher = MicroBatcher(
+        lambda ocr_jsons: predict_texts(get_predictor(), ocr_jsons, get_idx_to_label()),
+        max_batch_size=PREDICT_MAX_BATCH_SIZE,
+        max_wait=PREDICT_BATCH_WINDOW_MS / 1000.0
+    )
 
 
 def get_sagemaker_prediction(data, threshold=0.05):
@@ -109,7 +245,20 @@ def get_sagemaker_prediction(data, threshold=0.05):
     :return: Predicted label and confidence
     """
     ocr_json = data
-    return predict_text(predictor, ocr_json, idx_to_label, threshold)
+    if prediction_batcher:
+        return prediction_batcher.submit(ocr_json).result()
+    return predict_text(get_predictor(), ocr_json, get_idx_to_label(), threshold)
+
+
+def get_sagemaker_predictions(data_list, threshold=0.05):
+    """
+    Wrapper function to get predictions for many documents from SageMaker in one call.
+
+    :param data_list: List of dictionaries containing OCR data
+    :param threshold: Confidence threshold
+    :return: List of (predicted_label, confidence) tuples
+    """
+    return predict_texts(get_predictor(), data_list, get_idx_to_label(), threshold)
 
 if __name__ == '__main__':
     # Parse command-line arguments
@@ -128,7 +277,7 @@ if __name__ == '__main__':
 
     # Predict form type
     predicted_label, confidence = predict_text(
-        predictor, ocr_json, idx_to_label, threshold=args.threshold
+        get_predictor(), ocr_json, get_idx_to_label(), threshold=args.threshold
     )
 
     if predicted_label:
@@ -5,11 +5,20 @@ import os
 from sagemaker import get_execution_role
 from sklearn.model_selection import train_test_split
 import argparse
+from corpus import update_corpus_store, list_datasets
+from corpus_store import gzip_chunks
+import sys
+
+# streaming_upload lives at the repository root, next to app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from streaming_upload import stream_to_s3
 
 # Parse command-line arguments
 parser = argparse.ArgumentParser()
 parser.add_argument('--bucket-name', type=str, required=True, help='S3 bucket name containing the datasets')
 parser.add_argument('--prefix', type=str, default='datasets', help='Prefix for your datasets in S3')
+parser.add_argument('--compress-data', action='store_true',
+                    help='Upload gzip-compressed training data (the channels then use Pipe mode, which decompresses it)')
 args = parser.parse_args()
 
 # Initialize SageMaker session and role
@@ -22,15 +31,8 @@ prefix = args.prefix
 s3 = boto3.resource('s3')
 bucket = s3.Bucket(bucket_name)
 
-# Collect dataset names
-dataset_names = []
-
-for obj in bucket.objects.filter(Prefix=f'{prefix}/'):
-    parts = obj.key.split('/')
-    if len(parts) > 2 and parts[0] == 'datasets':
-        dataset_name = parts[1]
-        if dataset_name not in dataset_names:
-            dataset_names.append(dataset_name)
+# Collect dataset names (one delimiter listing instead of listing every object)
+dataset_names = list_datasets(s3.meta.client, bucket_name, prefix)
 
 print("Datasets found:", dataset_names)
 
@@ -38,53 +40,21 @@ print("Datasets found:", dataset_names)
 local_data_dir = 'data'
 os.makedirs(local_data_dir, exist_ok=True)
 
-texts = []
-labels = []
-
-download_all = False  # Set this to False since you don't want to download again
 print("Checking OCR output files...")
+# Parsed texts live in a memory-mapped store under data/corpus; only new or changed
+# OCR files (by ETag) are downloaded and parsed again
+store = update_corpus_store(
+    s3.meta.client, bucket_name, prefix, dataset_names, local_data_dir,
+    # Assign labels
+    label_fn=lambda dataset_name: 'w2' if dataset_name.lower() == 'w2' else 'non-w2'
+)
 
-for dataset_name in dataset_names:
-    ocr_output_prefix = f'{prefix}/{dataset_name}/ocr_output/'
-    for obj in bucket.objects.filter(Prefix=ocr_output_prefix):
-        if obj.key.endswith('.json'):
-            local_file_path = os.path.join(local_data_dir, os.path.basename(obj.key))
-            
-            # Check if the file already exists locally
-            if os.path.exists(local_file_path):
-                print(f"File already exists, skipping download: {local_file_path}")
-            else:
-                print(f"Downloading: {obj.key}")
-                bucket.download_file(obj.key, local_file_path)
-                
-            # Read the JSON file (whether it was downloaded or already exists)
-            print(f"Reading: {local_file_path}")
-            with open(local_file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                words = data.get('Words', [])
-                # Combine words into a single string
-                text = ' '.join([word['Text'] for word in words])
-                texts.append(text)
-                
-                # Assign labels
-                if dataset_name.lower() == 'w2':
-                    labels.append('w2')
-                else:
-                    labels.append('non-w2')
-
-
-
-
-
-print("Number of documents:", len(texts))
+print("Number of documents:", len(store))
 # Create label encoding
 # Create explicit label encoding
 label_to_idx = {'w2': 0, 'non-w2': 1}
 idx_to_label = {0: 'w2', 1: 'non-w2'}
 
-# Convert labels to indices
-label_indices = [label_to_idx[label] for label in labels]
-
 print("Label mapping:", label_to_idx)
 
 # Save label mapping for later use
@@ -94,57 +64,38 @@ with open('label_mapping.json', 'w') as f:
 
 print("Converting labels to indices...")
 # Convert labels to indices
-label_indices = [label_to_idx[label] for label in labels]
+label_indices = [label_to_idx[label] for label in store.labels()]
 print("Label indices:", label_indices)
 
 print("Splitting data into training and validation sets...")
-# Split Data into Training and Validation Sets
-X_train, X_val, y_train, y_val = train_test_split(
-    texts, label_indices, test_size=0.2, random_state=42
+# Split Data into Training and Validation Sets (row numbers; the texts stay in the store)
+train_rows, val_rows = train_test_split(
+    range(len(store)), test_size=0.2, random_state=42
 )
 
-print("Training samples:", len(X_train))
+print("Training samples:", len(train_rows))
 # Prepare Data for BlazingText
 print("Preparing data for BlazingText...")
-def prepare_blazingtext_data(texts, labels):
-    data = []
-    for text, label_idx in zip(texts, labels):
-        label_str = f'__label__{label_idx}'
-        data.append(f'{label_str} {text}')
-    return data
-
-train_data = prepare_blazingtext_data(X_train, y_train)
-val_data = prepare_blazingtext_data(X_val, y_val)
-
-print("Training data sample:", train_data[0])
-# Save and Upload Data to S3
-# Save data locally
-print("Saving data locally...")
-train_data_file = os.path.join(local_data_dir, 'train.txt')
-val_data_file = os.path.join(local_data_dir, 'validation.txt')
-
-print("Saving training data...")
-with open(train_data_file, 'w', encoding='utf-8') as f:  # Specify UTF-8 encoding
-    for line in train_data:
-        f.write(f'{line}\n')
-
-with open(val_data_file, 'w', encoding='utf-8') as f:  # Specify UTF-8 encoding
-    for line in val_data:
-        f.write(f'{line}\n')
-
-print("Data saved successfully.")
+# Output label index for each label name in the store
+store_label_ids = [label_to_idx[label] for label in store.label_names]
 
+print("Training data sample:", f'__label__{label_indices[train_rows[0]]} {store.text(train_rows[0])}')
+# Stream the labeled lines straight into S3 multipart uploads; parts are uploaded
+# in parallel while the next ones are formatted, and nothing is written locally
 print("Uploading data to S3...")
-# Upload data to S3
-s3_train_prefix = 'blazingtext_data/train'
-s3_val_prefix = 'blazingtext_data/validation'
+suffix = '.gz' if args.compress_data else ''
+s3_train_key = f'blazingtext_data/train/train.txt{suffix}'
+s3_val_key = f'blazingtext_data/validation/validation.txt{suffix}'
 
-s3_train_path = sagemaker_session.upload_data(
-    path=train_data_file, bucket=bucket_name, key_prefix=s3_train_prefix
-)
-s3_val_path = sagemaker_session.upload_data(
-    path=val_data_file, bucket=bucket_name, key_prefix=s3_val_prefix
-)
+for key, rows in ((s3_train_key, train_rows), (s3_val_key, val_rows)):
+    chunks = store.iter_blazingtext(rows, store_label_ids)
+    if args.compress_data:
+        chunks = gzip_chunks(chunks)
+    _, upload_metrics = stream_to_s3(chunks, s3.meta.client, bucket_name, key)
+    print(f"Uploaded s3://{bucket_name}/{key}:", upload_metrics)
+
+s3_train_path = f's3://{bucket_name}/{s3_train_key}'
+s3_val_path = f's3://{bucket_name}/{s3_val_key}'
 
 print("Training data uploaded to:", s3_train_path)
 # Set Up the BlazingText Estimator
@@ -162,7 +113,8 @@ bt_estimator = sagemaker.estimator.Estimator(
     instance_type='ml.m5.large',
     volume_size=5,
     max_run=360000,
-    input_mode='File',
+    # SageMaker only decompresses channel data in Pipe mode
+    input_mode='Pipe' if args.compress_data else 'File',
     output_path=f's3://{bucket_name}/blazingtext_output',
     sagemaker_session=sagemaker_session
 )
@@ -183,10 +135,12 @@ bt_estimator.set_hyperparameters(
 print("Data Channels:", s3_train_path, s3_val_path)
 # Define Data Channels and Start Training
 train_data_channel = sagemaker.inputs.TrainingInput(
-    s3_train_path, distribution='FullyReplicated', content_type='text/plain'
+    s3_train_path, distribution='FullyReplicated', content_type='text/plain',
+    compression='Gzip' if args.compress_data else None
 )
 val_data_channel = sagemaker.inputs.TrainingInput(
-    s3_val_path, distribution='FullyReplicated', content_type='text/plain'
+    s3_val_path, distribution='FullyReplicated', content_type='text/plain',
+    compression='Gzip' if args.compress_data else None
 )
 print("Data Channels:", train_data_channel, val_data_channel)
 data_channels = {'train': train_data_channel, 'validation': val_data_channel}
@@ -0,0 +1,150 @@
+# File: ./aws_textract_project/answer_cache.py
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# Entries older than this are treated as misses in both tiers
+ANSWER_CACHE_TTL_SECONDS = float(os.environ.get('ANSWER_CACHE_TTL_SECONDS', str(24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get('ANSWER_CACHE_MAX_ENTRIES', '256'))
+
+# Bump when the prompt or the models change so earlier answers stop matching
+ANSWER_CACHE_VERSION = 1
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+# Transcripts of the same question differ in the final punctuation mark
+TRAILING_PUNCTUATION = '.?!¿¡。？！ '
+
+
+def normalize_question(question):
+    """
+    Folds case and whitespace so repeated transcripts of a question compare equal.
+    The question stays in the user's language.
+    """
+    question = unicodedata.normalize('NFKC', question).casefold()
+    question = WHITESPACE_PATTERN.sub(' ', question).strip()
+    return question.strip(TRAILING_PUNCTUATION)
+
+
+def answer_cache_key(doc_key, language, question):
+    """
+    :param doc_key: SHA-256 of the document, or another stable document identifier
+    :param language: User's two-letter language code
+    :param question: User question as transcribed, in the user's language
+    :return: Hex digest identifying the answer
+    """
+    parts = [ANSWER_CACHE_VERSION, doc_key, language, normalize_question(question)]
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class AnswerCache:
+    """
+    Cache of chatbot answers (translated text plus the S3 key of its narration).
+
+    Lookups go through an in-memory LRU tier and then, if an S3 client is given, a
+    persistent tier of JSON entries under s3_prefix that outlives the process. Entries
+    expire ttl seconds after they were written; the narration MP3s are stored next to
+    the entries (see audio_key) and are best cleaned up with a lifecycle rule on s3_prefix.
+    """
+
+    def __init__(self, s3_client=None, bucket=None, s3_prefix='cache/answers',
+                 max_entries=ANSWER_CACHE_MAX_ENTRIES, ttl=ANSWER_CACHE_TTL_SECONDS):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.s3_prefix = s3_prefix.rstrip('/')
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def audio_key(self, key):
+        return f'{self.s3_prefix}/{key}.mp3'
+
+    def get(self, key):
+        """
+        :return: The entry stored under key, or None if it is missing or expired
+        """
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                if self._expired(entry):
+                    del self._local[key]
+                    entry = None
+                else:
+                    self._local.move_to_end(key)
+        if entry is not None:
+            print(f"Answer cache hit (memory): {key}")
+            return entry
+
+        entry = self._s3_get(key)
+        if entry is None or self._expired(entry):
+            print(f"Answer cache miss: {key}")
+            return None
+        print(f"Answer cache hit (S3): {key}")
+        with self._lock:
+            self._local_put(key, entry)
+        return entry
+
+    def put(self, key, answer, audio_key):
+        """
+        Stores an answer and the S3 key of its narration.
+
+        :return: The stored entry
+        """
+        entry = {'answer': answer, 'audio_key': audio_key, 'created': time.time()}
+        with self._lock:
+            self._local_put(key, entry)
+        self._s3_put(key, entry)
+        return entry
+
+    def _expired(self, entry):
+        return time.time() - entry['created'] > self.ttl
+
+    def _local_put(self, key, entry):
+        self._local[key] = entry
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    def _s3_key(self, key):
+        return f'{self.s3_prefix}/{key}.json'
+
+    def _s3_get(self, key):
+        if self.s3_client is None:
+            return None
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self._s3_key(key))
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        except Exception as e:
+            # A broken cache tier should never fail the request
+            print(f"Error reading answer cache from S3: {e}")
+            return None
+        try:
+            return json.loads(response['Body'].read())
+        except Exception as e:
+            # A truncated or corrupt entry is a miss; drop it so the next put starts clean
+            print(f"Discarding unreadable answer cache entry {key}: {e}")
+            try:
+                self.s3_client.delete_object(Bucket=self.bucket, Key=self._s3_key(key))
+            except Exception as e:
+                print(f"Error deleting answer cache entry from S3: {e}")
+            return None
+
+    def _s3_put(self, key, entry):
+        if self.s3_client is None:
+            return
+        try:
+            self.s3_client.put_object(
+                Bucket=self.bucket,
+                Key=self._s3_key(key),
+                Body=json.dumps(entry, ensure_ascii=False).encode('utf-8'),
+                ContentType='application/json'
+            )
+        except Exception as e:
+            print(f"Error writing answer cache to S3: {e}")
@@ -0,0 +1,167 @@
+# File: ./aws_textract_project/audio_cache.py
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# metrics.py lives at the repository root; pipeline.py puts it on sys.path
+from metrics import Counter, registry
+
+TIER_MEMORY = 'memory'
+TIER_S3 = 's3'
+TIER_MISS = 'miss'
+
+# Lookups by the tier that answered them, and the audio bytes each tier returned
+audio_cache_lookups = registry.register(Counter(
+    'polly_cache_lookups_total',
+    'Polly audio cache lookups by the tier that answered them (miss = synthesized).',
+    ('tier',)
+))
+audio_cache_bytes = registry.register(Counter(
+    'polly_cache_bytes_total',
+    'Bytes of audio returned by the Polly audio cache, by tier (miss = synthesized).',
+    ('tier',)
+))
+
+
+def audio_cache_key(text, voice_id, output_format):
+    """
+    :return: Hex digest identifying the audio for text spoken by voice_id in output_format
+    """
+    return hashlib.sha256(json.dumps([text, voice_id, output_format], ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class AudioCache:
+    """
+    Content-addressed cache of synthesized speech.
+
+    Lookups go through an in-memory LRU tier bounded by max_memory_bytes and then, if
+    an S3 client is given, an S3 tier of audio objects under s3_prefix. Entries never
+    go stale (the same text, voice and format always sound the same), so the S3 tier
+    is best bounded with a lifecycle rule on s3_prefix. Concurrent lookups of the same
+    audio are merged so only one of them calls compute.
+    """
+
+    def __init__(self, s3_client=None, bucket=None, s3_prefix='cache/polly', max_memory_bytes=64 * 1024 ** 2):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.s3_prefix = s3_prefix.rstrip('/')
+        self.max_memory_bytes = max_memory_bytes
+        self._local = OrderedDict()
+        self._local_bytes = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._lookups = {TIER_MEMORY: 0, TIER_S3: 0, TIER_MISS: 0}
+        self._bytes = {TIER_MEMORY: 0, TIER_S3: 0, TIER_MISS: 0}
+
+    def get_or_compute(self, text, voice_id, output_format, compute):
+        """
+        Returns the cached audio, calling compute() when neither tier has it.
+
+        :param compute: Callable returning the audio bytes
+        """
+        key = audio_cache_key(text, voice_id, output_format)
+        with self._lock:
+            audio = self._local.get(key)
+            if audio is not None:
+                self._local.move_to_end(key)
+            else:
+                call = self._inflight.get(key)
+                leader = call is None
+                if leader:
+                    call = self._inflight[key] = Future()
+
+        if audio is not None:
+            self._record(TIER_MEMORY, len(audio))
+            return audio
+        if not leader:
+            # The same sentence is already being fetched, e.g. repeated within one answer
+            audio = call.result()
+            self._record(TIER_MEMORY, len(audio))
+            return audio
+
+        try:
+            audio = self._s3_get(key)
+            tier = TIER_S3
+            if audio is None:
+                audio = compute()
+                tier = TIER_MISS
+                self._s3_put(key, audio, output_format)
+            with self._lock:
+                self._local_put(key, audio)
+            call.set_result(audio)
+        except Exception as e:
+            call.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        self._record(tier, len(audio))
+        return audio
+
+    def stats(self):
+        """
+        :return: Dictionary with lookups and bytes per tier and the overall hit ratio
+        """
+        with self._lock:
+            lookups = dict(self._lookups)
+            served = dict(self._bytes)
+            memory_bytes = self._local_bytes
+        total = sum(lookups.values())
+        return {
+            'lookups': lookups,
+            'bytes': served,
+            'hit_ratio': (total - lookups[TIER_MISS]) / total if total else 0.0,
+            'bytes_from_cache': served[TIER_MEMORY] + served[TIER_S3],
+            'memory_bytes': memory_bytes,
+        }
+
+    def _record(self, tier, size):
+        with self._lock:
+            self._lookups[tier] += 1
+            self._bytes[tier] += size
+        audio_cache_lookups.inc(tier=tier)
+        audio_cache_bytes.inc(size, tier=tier)
+
+    def _local_put(self, key, audio):
+        if len(audio) > self.max_memory_bytes:
+            return
+        previous = self._local.pop(key, None)
+        if previous is not None:
+            self._local_bytes -= len(previous)
+        self._local[key] = audio
+        self._local_bytes += len(audio)
+        while self._local_bytes > self.max_memory_bytes:
+            _, evicted = self._local.popitem(last=False)
+            self._local_bytes -= len(evicted)
+
+    def _s3_key(self, key):
+        return f'{self.s3_prefix}/{key}'
+
+    def _s3_get(self, key):
+        if self.s3_client is None:
+            return None
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self._s3_key(key))
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        except Exception as e:
+            # A broken cache tier should never fail the narration
+            print(f"Error reading Polly audio cache from S3: {e}")
+            return None
+        return response['Body'].read()
+
+    def _s3_put(self, key, audio, output_format):
+        if self.s3_client is None:
+            return
+        try:
+            self.s3_client.put_object(
+                Bucket=self.bucket,
+                Key=self._s3_key(key),
+                Body=audio,
+                ContentType='audio/mpeg' if output_format == 'mp3' else 'application/octet-stream'
+            )
+        except Exception as e:
+            print(f"Error writing Polly audio cache to S3: {e}")
@@ -1,22 +1,59 @@
-import boto3
+import json
+import time
+from prompt_retrieval import compact_context
+from aws_clients import get_client
 
 # Uses the Minstral mistral.mixtral-8x7b-instruct-v0:1 model on AWS Bedrock to generate answers to prompts as a chatbot
 # Prompts are engineered to be accurate to the text of the form, while still allowing for general-knowledge contextual searches
 
+MODEL_ID = 'mistral.mixtral-8x7b-instruct-v0:1'
+INFERENCE_CONFIG = {"maxTokens": 512, "temperature": 0.2, "topP": 0.9}
+
 def user_prompting_bedrock(user_question, kvs_string, predicted_form_type, form_type_confidence) -> str:
-    model_id = 'mistral.mixtral-8x7b-instruct-v0:1'
+    model_id = MODEL_ID
     response_body = generate_bedrock_response_text(model_id, kvs_string, user_question, predicted_form_type, form_type_confidence)
     return response_body['text']
 
-def generate_bedrock_response_text(model_id, kvs_string, user_question, predicted_form_type, form_type_confidence):
-    bedrock = boto3.client(service_name='bedrock-runtime')
+def user_prompting_bedrock_stream(user_question, kvs_string, predicted_form_type, form_type_confidence, bedrock=None):
+    """
+    Streaming form of user_prompting_bedrock: yields the answer in pieces as the model generates them.
 
-    accept = "application/json"
-    content_type = "application/json"
+    :param bedrock: Optional bedrock-runtime client
+    """
+    bedrock = bedrock or get_client('bedrock-runtime')
+    conversation, report = build_conversation(kvs_string, user_question, predicted_form_type, form_type_confidence)
+
+    start = time.perf_counter()
+    response = bedrock.converse_stream(
+        modelId=MODEL_ID,
+        messages=conversation,
+        inferenceConfig=INFERENCE_CONFIG,
+    )
+    usage = {}
+    for event in response['stream']:
+        if 'contentBlockDelta' in event:
+            text = event['contentBlockDelta']['delta'].get('text')
+            if text:
+                if 'bedrock_first_token_ms' not in report:
+                    report['bedrock_first_token_ms'] = (time.perf_counter() - start) * 1000
+                yield text
+        elif 'metadata' in event:
+            usage = event['metadata'].get('usage', {})
+
+    report['bedrock_ms'] = (time.perf_counter() - start) * 1000
+    report['input_tokens'] = usage.get('inputTokens')
+    report['output_tokens'] = usage.get('outputTokens')
+    print("Prompt report:", json.dumps(report))
 
+def build_conversation(kvs_string, user_question, predicted_form_type, form_type_confidence):
+    """
+    :return: Tuple of (Converse API messages, prompt report dictionary)
+    """
     prompt = 'Instructions: Be specific but casual in your answer. Answer only from the provided data exactly if the question is about the contents of the form. If the question is more contextual, you are allowed to base your answer off of your knowledge base (use your best judgement to determine if this is a form or context question). Do not make baseless assumptions. Ask yourself if your first response is the correct answer, with text and contextual evidence, and then only answer if it is correct (if it is not, rewrite your answer). It is better to admit you do not know something and reprompt the user than to make it up or falsely answer. In your response, be succinct and answer specifically what the user wants (ie do not give the employers name AND address when the user is just asking for the address). Cite where you sourced your answer from in the input file/text'
     prompt = f"The form type is predicted to be {predicted_form_type} with a confidence of {form_type_confidence}" + "\n"
-    prompt += 'data:\n' + kvs_string
+    # Only the fragments of the form relevant to the question go into the prompt
+    context, report = compact_context(kvs_string, user_question)
+    prompt += 'data:\n' + context
     prompt += '\n Answer this User Question: ' + user_question + 'And cite where you got it from in the text'
 
     conversation = [
@@ -25,12 +62,28 @@ def generate_bedrock_response_text(model_id, kvs_string, user_question, predicte
             "content": [{"text": prompt}],
         }
     ]
+    return conversation, report
 
+def generate_bedrock_response_text(model_id, kvs_string, user_question, predicted_form_type, form_type_confidence):
+    bedrock = get_client('bedrock-runtime')
+
+    accept = "application/json"
+    content_type = "application/json"
+
+    conversation, report = build_conversation(kvs_string, user_question, predicted_form_type, form_type_confidence)
+
+    start = time.perf_counter()
     response = bedrock.converse(
         modelId=model_id,
         messages=conversation,
-        inferenceConfig={"maxTokens": 512, "temperature": 0.2, "topP": 0.9},
+        inferenceConfig=INFERENCE_CONFIG,
     )
     response_body = response["output"]["message"]["content"][0]
 
-    return response_body
\ No newline at end of file
+    # Per-question report of the prompt compaction and what the model call cost
+    report['bedrock_ms'] = (time.perf_counter() - start) * 1000
+    report['input_tokens'] = response.get('usage', {}).get('inputTokens')
+    report['output_tokens'] = response.get('usage', {}).get('outputTokens')
+    print("Prompt report:", json.dumps(report))
+
+    return response_body
@@ -0,0 +1,262 @@
+# File: ./aws_textract_project/bulk_ocr.py
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Error codes AWS uses when a caller exceeds its request rate
+THROTTLING_ERROR_CODES = {
+    'ThrottlingException',
+    'ProvisionedThroughputExceededException',
+    'LimitExceededException',
+    'TooManyRequestsException',
+    'RequestLimitExceeded',
+    'SlowDown',
+}
+
+DOCUMENT_SUFFIXES = ('.jpg', '.jpeg', '.png', '.pdf')
+
+
+def is_throttling_error(error):
+    code = getattr(error, 'response', {}).get('Error', {}).get('Code')
+    return code in THROTTLING_ERROR_CODES
+
+
+def iter_object_keys(s3_client, bucket, prefix='', suffixes=DOCUMENT_SUFFIXES):
+    """
+    Yields object keys of a bucket page by page, so work can start before the listing ends.
+
+    :param suffixes: Only keys ending in one of these (case-insensitive) are yielded
+    """
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            key = obj['Key']
+            if not key.endswith('/') and key.lower().endswith(suffixes):
+                yield key
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that adapts to throttling (additive increase, multiplicative decrease).
+
+    Every throttled call halves the limit; every limit successful calls in a row
+    raise it by one, up to maximum.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=32):
+        self.limit = max(minimum, min(initial, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self._active = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self._active >= self.limit:
+                self._condition.wait()
+            self._active += 1
+
+    def release(self, throttled=False):
+        with self._condition:
+            self._active -= 1
+            if throttled:
+                self._successes = 0
+                self.limit = max(self.minimum, self.limit // 2)
+                logger.warning(f"Throttled, concurrency lowered to {self.limit}")
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.maximum:
+                    self._successes = 0
+                    self.limit += 1
+            self._condition.notify_all()
+
+
+class Checkpoint:
+    """
+    Append-only manifest of processed keys, one JSON line per key.
+
+    Keys recorded as done are skipped when a run is restarted with the same manifest;
+    failed keys are retried.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A run killed mid-write can leave a truncated last line
+                        continue
+                    if entry.get('status') == 'done':
+                        self.done.add(entry['key'])
+
+        self._file = open(path, 'a')
+
+    def record(self, key, status, error=None):
+        entry = {'key': key, 'status': status, 'time': time.time()}
+        if error:
+            entry['error'] = error
+        with self._lock:
+            self._file.write(json.dumps(entry) + '\n')
+            self._file.flush()
+            if status == 'done':
+                self.done.add(key)
+
+    def close(self):
+        self._file.close()
+
+
+class BulkRunner:
+    """
+    Runs process(key) over a stream of keys on a worker pool, with the number of
+    concurrent calls bounded by an AdaptiveLimiter.
+
+    Throttled keys are retried with backoff; progress (docs/s, error rate) is
+    logged every report_interval seconds.
+
+    Workers take a limiter slot for each attempt themselves. Keys are handed to the
+    pool only while it has an idle thread, so every key waiting for a slot is already
+    on a thread and a slot freed by one worker always goes to another.
+    """
+
+    def __init__(self, process, checkpoint, limiter=None, max_retries=5, report_interval=30.0, backoff=1.0):
+        """
+        :param backoff: Seconds before the first retry of a throttled key; doubled on every retry
+        """
+        self.process = process
+        self.checkpoint = checkpoint
+        self.limiter = limiter or AdaptiveLimiter()
+        self.max_retries = max_retries
+        self.report_interval = report_interval
+        self.backoff = backoff
+        self._lock = threading.Lock()
+        self._stats = {'processed': 0, 'failed': 0, 'skipped': 0, 'throttled': 0}
+        self._started = None
+        self._last_report = None
+
+    def run(self, keys):
+        """
+        Processes every key not already in the checkpoint.
+
+        :param keys: Iterable of keys, e.g. iter_object_keys(...)
+        :return: Dictionary with the run statistics
+        """
+        self._started = self._last_report = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=self.limiter.maximum, thread_name_prefix='bulk-ocr')
+        idle_threads = threading.BoundedSemaphore(self.limiter.maximum)
+        try:
+            for key in keys:
+                if key in self.checkpoint.done:
+                    with self._lock:
+                        self._stats['skipped'] += 1
+                    continue
+                # Blocks while every thread is busy, so keys are only listed as fast as they are processed
+                idle_threads.acquire()
+                executor.submit(self._run_one, key, idle_threads)
+        finally:
+            executor.shutdown(wait=True)
+        stats = self.stats()
+        logger.info(f"Bulk run finished: {json.dumps(stats)}")
+        return stats
+
+    def _run_one(self, key, idle_threads):
+        try:
+            self._attempt(key)
+        finally:
+            idle_threads.release()
+
+    def _attempt(self, key):
+        # Every attempt holds one limiter slot; the backoff sleep holds none
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                self.process(key)
+            except Exception as e:
+                throttled = is_throttling_error(e)
+                self.limiter.release(throttled=throttled)
+                if throttled and attempt < self.max_retries:
+                    with self._lock:
+                        self._stats['throttled'] += 1
+                    time.sleep(min(30.0, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0))
+                    continue
+                logger.error(f"Error processing {key}: {e}")
+                self.checkpoint.record(key, 'failed', str(e))
+                self._count('failed')
+                return
+            self.limiter.release()
+            self.checkpoint.record(key, 'done')
+            self._count('processed')
+            return
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+            report = time.monotonic() - self._last_report >= self.report_interval
+            if report:
+                self._last_report = time.monotonic()
+        if report:
+            logger.info(f"Progress: {json.dumps(self.stats())}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        seconds = time.monotonic() - self._started if self._started else 0.0
+        attempted = stats['processed'] + stats['failed']
+        stats['seconds'] = round(seconds, 3)
+        stats['docs_per_second'] = round(stats['processed'] / seconds, 3) if seconds > 0 else 0.0
+        stats['error_rate'] = round(stats['failed'] / attempted, 4) if attempted else 0.0
+        stats['concurrency'] = self.limiter.limit
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs Textract OCR over every document in a bucket.")
+    parser.add_argument('--bucket', default='w2-datasets', help="S3 bucket to process")
+    parser.add_argument('--prefix', default='', help="Only process keys under this prefix")
+    parser.add_argument('--manifest', default='bulk_ocr_manifest.jsonl', help="Checkpoint manifest path")
+    parser.add_argument('--concurrency', type=int, default=4, help="Initial number of concurrent documents")
+    parser.add_argument('--max-concurrency', type=int, default=32, help="Upper bound for the adaptive concurrency")
+    parser.add_argument('--report-interval', type=float, default=30.0, help="Seconds between progress reports")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from textract_ocr import process_file
+    from aws_clients import get_client
+
+    # Let throttling surface quickly so the limiter, not the SDK, backs off
+    textract = get_client('textract', 'us-east-1', retries={'mode': 'standard', 'max_attempts': 2})
+    s3 = get_client('s3')
+
+    checkpoint = Checkpoint(args.manifest)
+    runner = BulkRunner(
+        lambda key: process_file(key, args.bucket, textract, s3),
+        checkpoint,
+        AdaptiveLimiter(initial=args.concurrency, maximum=args.max_concurrency),
+        report_interval=args.report_interval
+    )
+    try:
+        stats = runner.run(iter_object_keys(s3, args.bucket, args.prefix))
+    finally:
+        checkpoint.close()
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == '__main__':
+    # aws_clients.py lives at the repository root, next to app.py
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    main()
@@ -1,73 +1,249 @@
+import os
+import sys
+
+# Entry point of the Q&A pipeline. metrics.py, streaming_upload.py and aws_clients.py live at
+# the repository root, next to app.py; it is appended so this directory keeps precedence
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+
 from textract_ocr_better import get_kv_map, get_kv_relationship, text_kvs
 from textract_ocr_line import get_line_ocr_data
-from bedrock_chatbot import user_prompting_bedrock
-from polly import get_polly_mp3_narration
-from translate import translate_from_english, translate_to_english
+from bedrock_chatbot import user_prompting_bedrock, user_prompting_bedrock_stream
+from polly import audio_cache, iter_speech_chunks
+from translate import translate_segments, translate_to_english
+from answer_cache import AnswerCache, answer_cache_key
+from speech_stream import narrate_sentences, sentence_spans, stream_sentences
 
-import boto3
 import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
-def main():
-    s3 = boto3.client("s3")
+from metrics import registry, stage_duration, timed_stage
+from streaming_upload import stream_to_s3
+from aws_clients import get_client
 
-    # get form type 
-    s3_bucket_name_input_photo = 'w2-datasets'
-    object_prefix_input_photo = 'input/raw_file'
-    file_key = s3.list_objects_v2(Bucket=s3_bucket_name_input_photo, Prefix=object_prefix_input_photo)['Contents'][0]['Key']
-    input_file_name = file_key[len(object_prefix_input_photo) + 1:]
-    print(input_file_name)
-    s3.download_file(s3_bucket_name_input_photo, file_key, input_file_name)
+# When set, stage timings are written here in the Prometheus text format at the end of a run
+# (e.g. for node_exporter's textfile collector)
+PIPELINE_METRICS_FILE = os.environ.get('PIPELINE_METRICS_FILE')
+
+# Streams the Bedrock answer and translates and voices it sentence by sentence; each sentence's
+# audio is published to S3 as soon as it is ready, long before the whole answer is (see stream_narration)
+PIPELINE_STREAMING = os.environ.get('PIPELINE_STREAMING', '0') == '1'
+
+# Where the transcription of the user's question and its language are read from; the CLI
+# uses the fixed keys, the resident worker (pipeline_worker.py) passes per-session ones
+TRANSCRIBE_BUCKET = 'polly-wav'
+DEFAULT_TRANSCRIPT_KEY = 'TranscriptionJob.json'
+DEFAULT_LANGUAGE_KEY = 'language.json'
+
+# Answers are kept in memory and, unless disabled, in S3 so they outlive a single run
+ANSWER_CACHE_PERSISTENT = os.environ.get('ANSWER_CACHE_PERSISTENT', '1') == '1'
+answer_cache = AnswerCache(
+    s3_client=get_client('s3') if ANSWER_CACHE_PERSISTENT else None,
+    bucket='w2-datasets'
+)
+
+# A session's inputs are small independent objects fetched at the same time; the pool is
+# shared by every session of a resident worker
+PIPELINE_FETCH_WORKERS = int(os.environ.get('PIPELINE_FETCH_WORKERS', '16'))
+fetch_executor = ThreadPoolExecutor(max_workers=PIPELINE_FETCH_WORKERS)
+
+def get_saved_textract_response(s3, bucket, job_id, input_file_name):
+    # Raw response saved by the upload-time analysis (process_textract), if any
+    response_key = f'output/textract/{job_id}/{os.path.splitext(input_file_name)[0]}.json'
+    try:
+        response = s3.get_object(Bucket=bucket, Key=response_key)
+    except s3.exceptions.NoSuchKey:
+        print(f"No saved Textract response at {response_key}, analyzing the document again")
+        return None
+    return json.loads(response['Body'].read())
+
+def narration_manifest_key(key):
+    # Manifest of the per-sentence segments of the narration at key, e.g.
+    # output/mp3/<job_id>/<session_id>/manifest.json for output/mp3/<job_id>/<session_id>.mp3
+    return f'{os.path.splitext(key)[0]}/manifest.json'
+
+def write_narration_manifest(s3, bucket, key, segment_keys, complete):
+    s3.put_object(
+        Bucket=bucket,
+        Key=narration_manifest_key(key),
+        Body=json.dumps({'segments': segment_keys, 'complete': complete, 'audio_key': key}).encode('utf-8'),
+        ContentType='application/json',
+        CacheControl='no-cache'
+    )
+
+def stream_narration(english_question, ocr_data_payload, form_type_predicted, form_type_prediction_confidence, user_language, s3, bucket, key):
+    # Publishes every mp3 segment under a key of its own as soon as it and the segments before it are
+    # voiced, and lists the published segments in the manifest next to key, so a player polling the
+    # manifest starts after the first sentence. The whole narration is written to key at the end, for
+    # the answer cache and for clients that wait for it. Returns the translated answer.
+    start = time.perf_counter()
+    answer = []
+    segment_keys = []
+    audio = []
+    pieces = user_prompting_bedrock_stream(english_question, ocr_data_payload, form_type_predicted, form_type_prediction_confidence)
+
+    for text, mp3 in narrate_sentences(stream_sentences(pieces), user_language):
+        segment_key = f'{os.path.splitext(key)[0]}/{len(segment_keys):04d}.mp3'
+        s3.put_object(Bucket=bucket, Key=segment_key, Body=mp3, ContentType='audio/mpeg')
+        segment_keys.append(segment_key)
+        write_narration_manifest(s3, bucket, key, segment_keys, complete=False)
+        if len(segment_keys) == 1:
+            # the first segment can be fetched from S3 from here on
+            stage_duration.observe(time.perf_counter() - start, stage='first_audio', outcome='success')
+            print(f"First audio available after {(time.perf_counter() - start) * 1000:.0f} ms")
+        answer.append(text)
+        audio.append(mp3)
+
+    stream_to_s3(audio, s3, bucket, key, content_type='audio/mpeg')
+    write_narration_manifest(s3, bucket, key, segment_keys, complete=True)
+    return ' '.join(answer)
+
+def translate_answer(answer, user_language):
+    # Sentence by sentence in merged requests, split as stream_narration splits them: sentences
+    # seen in earlier answers, streamed or not, come from the translation cache and only the new
+    # ones are sent (and billed). The text between sentences (spaces, list and paragraph breaks,
+    # nothing after CJK full stops) is kept as it was.
+    spans = sentence_spans(answer)
+    translated = iter(translate_segments([sentence for _, sentence, _ in spans if sentence], 'en', user_language))
+    return ''.join(lead + (next(translated) if sentence else '') + separator for lead, sentence, separator in spans)
+
+def read_json(s3, bucket, key):
+    # Small JSON documents are parsed in memory, so sessions never share local files
+    return json.loads(s3.get_object(Bucket=bucket, Key=key)['Body'].read())
+
+def load_document(s3, bucket, job_id):
+    # The document uploaded under the job's folder, as (file name, saved Textract response, document bytes);
+    # the bytes are only fetched when there is no saved response to reuse
+    file_key = s3.list_objects_v2(Bucket=bucket, Prefix=f'input/raw_file/{job_id}/')['Contents'][0]['Key']
+    input_file_name = os.path.basename(file_key)
+    textract_response = get_saved_textract_response(s3, bucket, job_id, input_file_name)
+    document_bytes = None
+    if textract_response is None:
+        document_bytes = s3.get_object(Bucket=bucket, Key=file_key)['Body'].read()
+    return input_file_name, textract_response, document_bytes
+
+def fetch_session_inputs(s3, job_id, transcript_key, language_key):
+    # Starts every fetch the answer cache lookup needs at once and returns their futures,
+    # so the stage takes about as long as the slowest fetch rather than the sum of them.
+    # The document itself is only loaded after a cache miss.
+    return {
+        'result': fetch_executor.submit(read_json, s3, 'w2-datasets', f'output/result/{job_id}/result.json'),
+        'transcript': fetch_executor.submit(read_json, s3, TRANSCRIBE_BUCKET, transcript_key),
+        'language': fetch_executor.submit(read_json, s3, TRANSCRIBE_BUCKET, language_key),
+    }
+
+def answer_question(s3, job_id, session_id=None, transcript_key=DEFAULT_TRANSCRIPT_KEY, language_key=DEFAULT_LANGUAGE_KEY):
+    # Answers one user question about the job's document and narrates it to a key of its own.
+    # Safe to run for many sessions at once: every key it reads or writes is per job or per session,
+    # and nothing is written to fixed local files.
+    session_id = session_id or uuid.uuid4().hex
+
+    # the form type, question and language are fetched together
+    inputs = fetch_session_inputs(s3, job_id, transcript_key, language_key)
 
     # get form type 
-    s3_bucket_name_sagemaker = 'w2-datasets'
-    object_prefix_sagemaker = 'output/result/result.json'
+    with timed_stage('pipeline_fetch'):
+        data = inputs['result'].result()
+    if 'results' in data:
+        # batch results only list their documents, each answered under its own job ID
+        document_ids = ', '.join(doc['job_id'] for doc in data['results'] if doc.get('job_id'))
+        raise ValueError(f"Job {job_id} is a batch; ask about one of its documents: {document_ids}")
+    form_type_predicted = data.get("predicted_label")
+    form_type_prediction_confidence = data.get("confidence")
+    # results saved before doc_hash was recorded only share answers within their job
+    doc_key = data.get("doc_hash") or f'job:{job_id}'
+
+    # get user's question transcription and language
+    with timed_stage('pipeline_fetch'):
+        data = inputs['transcript'].result()
+    user_question = data.get("results").get("transcripts")[0].get("transcript")
+    print(user_question)
+    with timed_stage('pipeline_fetch'):
+        data = inputs['language'].result()
+    user_language = data.get("LanguageCode")[:2]
+    print(user_language)
 
-    form_type_predicted = ''
-    form_type_prediction_confidence = -1
-    s3.download_file(s3_bucket_name_sagemaker, object_prefix_sagemaker, 'form_type.json')
-    with open('form_type.json', 'r') as file:
-        data = json.load(file)
-        form_type_predicted = data.get("predicted_label")
-        form_type_prediction_confidence = data.get("confidence")
+    s3_bucket_name_output = 'w2-datasets'
+    object_prefix_output = f'output/mp3/{job_id}/{session_id}.mp3'
+    print(f"Narration: s3://{s3_bucket_name_output}/{object_prefix_output}")
+    result = {
+        'job_id': job_id,
+        'session_id': session_id,
+        'question': user_question,
+        'language': user_language,
+        'audio_key': object_prefix_output,
+    }
+
+    # a repeated question about the same document skips Textract, Translate, Bedrock and Polly
+    cache_key = answer_cache_key(doc_key, user_language, user_question)
+    cached = answer_cache.get(cache_key)
+    if cached is not None:
+        try:
+            with timed_stage('pipeline_upload_audio'):
+                s3.copy_object(
+                    Bucket=s3_bucket_name_output,
+                    Key=object_prefix_output,
+                    CopySource={'Bucket': s3_bucket_name_output, 'Key': cached['audio_key']}
+                )
+            print(f"Output text: {cached['answer']}")
+            return dict(result, answer=cached['answer'], cached=True)
+        except s3.exceptions.NoSuchKey:
+            print("Cached narration has expired, answering the question again")
+
+    # reuse the Textract analysis made at upload time; without one the document bytes go straight to Textract
+    with timed_stage('pipeline_load_document'):
+        input_file_name, textract_response, document_bytes = load_document(s3, 'w2-datasets', job_id)
+    print(input_file_name)
 
     ocr_data_payload = ''
-    if form_type_predicted == 'w2': 
-        key_map, value_map, block_map = get_kv_map(input_file_name)
-
-        # Get Key Value relationship
-        kvs = get_kv_relationship(key_map, value_map, block_map)
-        print("\n\n== FOUND KEY : VALUE pairs ===\n")
-        # print_kvs(kvs)    
-        ocr_data_payload = text_kvs(kvs)
+    with timed_stage('pipeline_ocr'):
+        if form_type_predicted == 'w2': 
+            key_map, value_map, block_map = get_kv_map(input_file_name, textract_response, document_bytes)
+
+            # Get Key Value relationship
+            kvs = get_kv_relationship(key_map, value_map, block_map)
+            print("\n\n== FOUND KEY : VALUE pairs ===\n")
+            # print_kvs(kvs)    
+            ocr_data_payload = text_kvs(kvs)
+        else:
+            ocr_data_payload = get_line_ocr_data(input_file_name, textract_response, document_bytes)
+
+    with timed_stage('translate'):
+        english_question = translate_to_english(user_question, user_language)
+    if PIPELINE_STREAMING:
+        result['audio_manifest_key'] = narration_manifest_key(object_prefix_output)
+        with timed_stage('answer_stream'):
+            response = stream_narration(english_question, ocr_data_payload, form_type_predicted, form_type_prediction_confidence, user_language,
+                                        s3, s3_bucket_name_output, object_prefix_output)
     else:
-        ocr_data_payload = get_line_ocr_data(input_file_name)
+        with timed_stage('bedrock'):
+            response = user_prompting_bedrock(english_question, ocr_data_payload, form_type_predicted, form_type_prediction_confidence)
+        with timed_stage('translate'):
+            response = translate_answer(response, user_language)
+        # long answers are synthesized in parallel chunks and joined in memory on their way to S3
+        with timed_stage('polly'):
+            stream_to_s3(iter_speech_chunks(response, user_language), s3, s3_bucket_name_output, object_prefix_output,
+                         content_type='audio/mpeg')
+    print(f"Output text: {response}")
+    if audio_cache is not None:
+        print("Polly cache:", json.dumps(audio_cache.stats()))
 
-    # get user's question transcription and language
-    s3_bucket_name_transcribe = 'polly-wav'
-    object_prefix_transcribe = 'TranscriptionJob.json'
-
-    user_question = ''
-    user_language = 'en'
-    s3.download_file(s3_bucket_name_transcribe, object_prefix_transcribe, 'user_question_transcription.json')
-    with open('user_question_transcription.json', 'r') as file:
-        data = json.load(file)
-        user_question = data.get("results").get("transcripts")[0].get("transcript")
-        print(user_question)
-    object_prefix_language = 'language.json'
-    s3.download_file(s3_bucket_name_transcribe, object_prefix_language, 'user_language.json')
-    with open('user_language.json', 'r') as file:
-        data = json.load(file)
-        user_language = data.get("LanguageCode")[:2]
-        print(user_language)
-    
-        response = user_prompting_bedrock(translate_to_english(user_question, user_language), ocr_data_payload, form_type_predicted, form_type_prediction_confidence)
-        response = translate_from_english(response, user_language)
-        print(f"Output text: {response}")
-        get_polly_mp3_narration(response, user_language)
+    # keep a copy of the narration next to the cache entry, which outlives the session's key
+    audio_key = answer_cache.audio_key(cache_key)
+    s3.copy_object(
+        Bucket=s3_bucket_name_output,
+        Key=audio_key,
+        CopySource={'Bucket': s3_bucket_name_output, 'Key': object_prefix_output}
+    )
+    answer_cache.put(cache_key, response, audio_key)
+    return dict(result, answer=response, cached=False)
 
-    s3_bucket_name_output = 'w2-datasets'
-    object_prefix_output = 'output/mp3/translated_output.mp3'
-    s3.upload_file('translated_output.mp3', s3_bucket_name_output, object_prefix_output)
+def main(job_id, session_id=None):
+    s3 = get_client('s3')
+    return answer_question(s3, job_id, session_id)
 
     # # Start searching a key value
     # while input('\n Do you want to search a value for a key? (enter "n" for exit) ') != 'n':
@@ -76,4 +252,12 @@ def main():
 
 if __name__ == "__main__":
     # file_name = '../WhatsApp Image 2024-09-16 at 16.36.51_27ca8f15.jpg'
-    main()
\ No newline at end of file
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python pipeline.py <job_id> [session_id]")
+        sys.exit(1)
+    try:
+        main(*sys.argv[1:])
+    finally:
+        if PIPELINE_METRICS_FILE:
+            with open(PIPELINE_METRICS_FILE, 'w') as f:
+                f.write(registry.render())
\ No newline at end of file
@@ -0,0 +1,376 @@
+# File: ./aws_textract_project/pipeline_worker.py
+
+import argparse
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# pipeline adds the repository root, where metrics.py and aws_clients.py live, to sys.path
+from pipeline import DEFAULT_LANGUAGE_KEY, DEFAULT_TRANSCRIPT_KEY, PIPELINE_METRICS_FILE, answer_question
+from metrics import registry, timed_stage
+from aws_clients import AWS_WARM_UP, get_client, warm_up
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Sessions answered at the same time; each one mostly waits on Bedrock, Translate and Polly
+PIPELINE_WORKER_SESSIONS = int(os.environ.get('PIPELINE_WORKER_SESSIONS', '8'))
+# Seconds a claimed SQLite session may stay running before another worker may claim it again,
+# so the sessions of a worker that crashed or was killed are not stuck in 'running' forever
+PIPELINE_SESSION_VISIBILITY_TIMEOUT = int(os.environ.get('PIPELINE_SESSION_VISIBILITY_TIMEOUT', '900'))
+# Seconds between rewrites of PIPELINE_METRICS_FILE while the worker runs
+PIPELINE_METRICS_INTERVAL = float(os.environ.get('PIPELINE_METRICS_INTERVAL', '15'))
+
+SESSION_QUEUED = 'queued'
+SESSION_RUNNING = 'running'
+SESSION_SUCCEEDED = 'succeeded'
+SESSION_FAILED = 'failed'
+
+
+def new_session(job_id, session_id=None, transcript_key=DEFAULT_TRANSCRIPT_KEY, language_key=DEFAULT_LANGUAGE_KEY):
+    """
+    Builds a session job: one user question about the document of job_id.
+
+    :param transcript_key: Key of the question's Transcribe output in the transcription bucket
+    :param language_key: Key of the question's language document in the transcription bucket
+    """
+    return {
+        'job_id': job_id,
+        'session_id': session_id or uuid.uuid4().hex,
+        'transcript_key': transcript_key,
+        'language_key': language_key,
+    }
+
+
+class MemoryQueue:
+    """
+    In-process session queue, for tests and for running the worker inside another service.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self.results = {}
+        self.errors = {}
+
+    def put(self, session):
+        self._queue.put(session)
+        return session['session_id']
+
+    def get(self, timeout=None):
+        """
+        :return: Tuple of (receipt, session), or None if nothing arrived within timeout
+        """
+        try:
+            session = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        return session['session_id'], session
+
+    def ack(self, receipt, result):
+        self.results[receipt] = result
+
+    def fail(self, receipt, error):
+        self.errors[receipt] = error
+
+
+class SQLiteQueue:
+    """
+    Session queue in a SQLite file, usable by several worker processes on one host.
+
+    Sessions are claimed inside an immediate transaction, so each one is handed to
+    exactly one worker; results and errors stay in the table for inspection. Like an
+    SQS message, a session still running visibility_timeout seconds after it was claimed
+    is handed out again, and only the latest claim can record its outcome.
+    """
+
+    def __init__(self, path, poll_interval=0.2, visibility_timeout=PIPELINE_SESSION_VISIBILITY_TIMEOUT):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self._lock = threading.Lock()
+        # Autocommit mode; claims open their own IMMEDIATE transaction
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, body TEXT NOT NULL, "
+            "status TEXT NOT NULL, result TEXT, error TEXT, "
+            "enqueued_at REAL, started_at REAL, finished_at REAL)"
+        )
+
+    def put(self, session):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sessions (session_id, body, status, enqueued_at) VALUES (?, ?, ?, ?)",
+                (session['session_id'], json.dumps(session), SESSION_QUEUED, time.time())
+            )
+        return session['session_id']
+
+    def get(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            claimed = self._claim()
+            if claimed is not None:
+                return claimed
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def _claim(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                started_at = time.time()
+                row = self._conn.execute(
+                    "SELECT id, body, status FROM sessions "
+                    "WHERE status = ? OR (status = ? AND started_at < ?) ORDER BY id LIMIT 1",
+                    (SESSION_QUEUED, SESSION_RUNNING, started_at - self.visibility_timeout)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE sessions SET status = ?, started_at = ? WHERE id = ?",
+                        (SESSION_RUNNING, started_at, row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        session = json.loads(row[1])
+        if row[2] == SESSION_RUNNING:
+            logger.warning(f"Session {session['session_id']} timed out while running, claiming it again")
+        # The claim time identifies this claim, so a worker whose claim timed out cannot finish the session
+        return (row[0], started_at), session
+
+    def ack(self, receipt, result):
+        self._finish(receipt, SESSION_SUCCEEDED, result=json.dumps(result))
+
+    def fail(self, receipt, error):
+        self._finish(receipt, SESSION_FAILED, error=str(error))
+
+    def _finish(self, receipt, status, result=None, error=None):
+        row_id, started_at = receipt
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE sessions SET status = ?, result = ?, error = ?, finished_at = ? "
+                "WHERE id = ? AND status = ? AND started_at = ?",
+                (status, result, error, time.time(), row_id, SESSION_RUNNING, started_at)
+            ).rowcount
+        if not updated:
+            logger.warning(f"Session row {row_id} was claimed again after its visibility timeout, "
+                           f"dropping this outcome")
+
+    def status(self, session_id):
+        """
+        :return: Dictionary with the session's status, result and error, or None if unknown
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, result, error FROM sessions WHERE session_id = ? ORDER BY id DESC LIMIT 1",
+                (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'status': row[0], 'result': json.loads(row[1]) if row[1] else None, 'error': row[2]}
+
+
+class SQSQueue:
+    """
+    Session queue on Amazon SQS for production deployments.
+
+    A failed session is made visible again right away; configure a redrive policy on
+    the queue so a session that keeps failing ends up in a dead-letter queue.
+    """
+
+    def __init__(self, queue_url, sqs_client=None):
+        self.queue_url = queue_url
+        self.sqs_client = sqs_client or get_client('sqs')
+
+    def put(self, session):
+        self.sqs_client.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps(session))
+        return session['session_id']
+
+    def get(self, timeout=None):
+        response = self.sqs_client.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=1,
+            # Long polling; SQS waits at most 20 seconds per call
+            WaitTimeSeconds=int(min(timeout if timeout is not None else 20, 20))
+        )
+        messages = response.get('Messages', [])
+        if not messages:
+            return None
+        return messages[0]['ReceiptHandle'], json.loads(messages[0]['Body'])
+
+    def ack(self, receipt, result):
+        self.sqs_client.delete_message(QueueUrl=self.queue_url, ReceiptHandle=receipt)
+
+    def fail(self, receipt, error):
+        self.sqs_client.change_message_visibility(QueueUrl=self.queue_url, ReceiptHandle=receipt, VisibilityTimeout=0)
+
+
+class PipelineWorker:
+    """
+    Resident Q&A worker: takes session jobs from a queue and answers up to
+    max_sessions of them at once on a thread pool.
+
+    Staying resident keeps the boto3 clients and the in-memory tiers of the answer,
+    Polly and translation caches warm across sessions.
+    """
+
+    def __init__(self, session_queue, handler=answer_question, s3_client=None,
+                 max_sessions=PIPELINE_WORKER_SESSIONS):
+        self.session_queue = session_queue
+        self.handler = handler
+        # boto3 clients are thread-safe, so all sessions share one
+        self.s3_client = s3_client or get_client('s3')
+        self.max_sessions = max_sessions
+        self._executor = ThreadPoolExecutor(max_workers=max_sessions, thread_name_prefix='session')
+        self._slots = threading.Semaphore(max_sessions)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._succeeded = 0
+        self._failed = 0
+
+    def run(self, poll_timeout=1.0, drain=False):
+        """
+        Processes sessions until stop() is called.
+
+        :param poll_timeout: Seconds to wait for a session before checking for stop again
+        :param drain: Return once the queue is empty and every session has finished
+        """
+        logger.info(f"Pipeline worker started with {self.max_sessions} concurrent sessions")
+        stopped = threading.Event()
+        if PIPELINE_METRICS_FILE:
+            # Written on a timer rather than per session, so finishing a session never waits on file I/O
+            metrics_writer = threading.Thread(target=self._write_metrics_until, args=(stopped,), daemon=True)
+            metrics_writer.start()
+        try:
+            while not self._stop.is_set():
+                if not self._slots.acquire(timeout=poll_timeout):
+                    continue
+                claimed = self.session_queue.get(timeout=poll_timeout)
+                if claimed is None:
+                    self._slots.release()
+                    with self._lock:
+                        idle = self._in_flight == 0
+                    if drain and idle:
+                        break
+                    continue
+                with self._lock:
+                    self._in_flight += 1
+                self._executor.submit(self._process, *claimed)
+        finally:
+            self._executor.shutdown(wait=True)
+            stopped.set()
+            if PIPELINE_METRICS_FILE:
+                metrics_writer.join()
+        logger.info(f"Pipeline worker stopped: {json.dumps(self.stats())}")
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            return {'in_flight': self._in_flight, 'succeeded': self._succeeded, 'failed': self._failed}
+
+    def _process(self, receipt, session):
+        try:
+            with timed_stage('pipeline_session'):
+                result = self.handler(
+                    self.s3_client,
+                    session['job_id'],
+                    session['session_id'],
+                    transcript_key=session.get('transcript_key', DEFAULT_TRANSCRIPT_KEY),
+                    language_key=session.get('language_key', DEFAULT_LANGUAGE_KEY)
+                )
+            self.session_queue.ack(receipt, result)
+            succeeded = True
+        except Exception as e:
+            logger.error(f"Session {session.get('session_id')} failed: {e}")
+            try:
+                self.session_queue.fail(receipt, e)
+            except Exception as queue_error:
+                logger.error(f"Could not record the failure of session {session.get('session_id')}: {queue_error}")
+            succeeded = False
+        finally:
+            self._slots.release()
+        with self._lock:
+            self._in_flight -= 1
+            if succeeded:
+                self._succeeded += 1
+            else:
+                self._failed += 1
+
+    def _write_metrics_until(self, stopped):
+        while not stopped.wait(PIPELINE_METRICS_INTERVAL):
+            self._write_metrics()
+        # A last write once every session has finished
+        self._write_metrics()
+
+    def _write_metrics(self):
+        try:
+            with open(PIPELINE_METRICS_FILE + '.tmp', 'w') as f:
+                f.write(registry.render())
+            os.replace(PIPELINE_METRICS_FILE + '.tmp', PIPELINE_METRICS_FILE)
+        except OSError as e:
+            logger.error(f"Could not write the metrics file {PIPELINE_METRICS_FILE}: {e}")
+
+
+def open_queue(args):
+    if args.sqs_url:
+        return SQSQueue(args.sqs_url)
+    return SQLiteQueue(args.sqlite_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident worker answering chatbot questions from a session queue.")
+    parser.add_argument('--sqlite-path', default='pipeline_sessions.db', help="SQLite session queue file")
+    parser.add_argument('--sqs-url', help="SQS queue URL; used instead of the SQLite queue when given")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="Answer sessions until interrupted")
+    run_parser.add_argument('--sessions', type=int, default=PIPELINE_WORKER_SESSIONS,
+                            help="Sessions answered at the same time")
+    run_parser.add_argument('--drain', action='store_true', help="Exit once the queue is empty")
+
+    enqueue_parser = commands.add_parser('enqueue', help="Queue a question about a job's document")
+    enqueue_parser.add_argument('job_id')
+    enqueue_parser.add_argument('--session-id')
+    enqueue_parser.add_argument('--transcript-key', default=DEFAULT_TRANSCRIPT_KEY)
+    enqueue_parser.add_argument('--language-key', default=DEFAULT_LANGUAGE_KEY)
+
+    status_parser = commands.add_parser('status', help="Show a session's status (SQLite queue only)")
+    status_parser.add_argument('session_id')
+    args = parser.parse_args()
+    if args.command == 'status' and args.sqs_url:
+        parser.error("status reads the SQLite queue and cannot be used with --sqs-url")
+
+    logging.basicConfig(level=logging.INFO)
+    session_queue = open_queue(args)
+    if args.command == 'enqueue':
+        session = new_session(args.job_id, args.session_id, args.transcript_key, args.language_key)
+        session_queue.put(session)
+        print(json.dumps(session))
+    elif args.command == 'status':
+        print(json.dumps(session_queue.status(args.session_id), indent=2))
+    else:
+        if AWS_WARM_UP:
+            warm_up(('s3', 'translate', 'polly', 'bedrock-runtime', 'textract'))
+        worker = PipelineWorker(session_queue, max_sessions=args.sessions)
+        try:
+            worker.run(drain=args.drain)
+        except KeyboardInterrupt:
+            worker.stop()
+
+
+if __name__ == '__main__':
+    main()
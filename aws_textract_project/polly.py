@@ -1,7 +1,10 @@
 
-import boto3
 import json
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from audio_cache import AudioCache
+from aws_clients import get_client
 # from pygame import mixer
 
 
@@ -9,7 +12,31 @@ import os
 
 #need to pip install pygame
 
-polly_client = boto3.client('polly')
+polly_client = get_client('polly')
+
+# SynthesizeSpeech rejects text over 3000 billed characters; longer answers are split into chunks
+POLLY_MAX_CHARS = 3000
+POLLY_WORKERS = int(os.environ.get('POLLY_WORKERS', '4'))
+
+# End of a sentence: terminator and closing quote/bracket followed by whitespace, a CJK
+# terminator, or a line break. "12345.00" has no whitespace after the dot, so it is not split.
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+|[。！？]+|\n+')
+
+polly_executor = ThreadPoolExecutor(max_workers=POLLY_WORKERS)
+
+POLLY_OUTPUT_FORMAT = 'mp3'
+
+# Narrated sentences repeat across users ("I don't know..."), so audio is cached per sentence
+# in memory and, unless disabled, in S3; POLLY_CACHE=0 turns the cache off altogether
+POLLY_CACHE = os.environ.get('POLLY_CACHE', '1') == '1'
+POLLY_CACHE_PERSISTENT = os.environ.get('POLLY_CACHE_PERSISTENT', '1') == '1'
+POLLY_CACHE_MEMORY_MB = int(os.environ.get('POLLY_CACHE_MEMORY_MB', '64'))
+
+audio_cache = AudioCache(
+    s3_client=get_client('s3') if POLLY_CACHE_PERSISTENT else None,
+    bucket='w2-datasets',
+    max_memory_bytes=POLLY_CACHE_MEMORY_MB * 1024 * 1024
+) if POLLY_CACHE else None
 
 LANGAUGE_TO_VOICE = {
 
@@ -19,19 +46,83 @@ LANGAUGE_TO_VOICE = {
 
 }
 
-def text_to_speech(text, output_filename, language):
+def synthesize_speech(text, language):
 
     voice_id = LANGAUGE_TO_VOICE.get(language, "Matthew")
 
-    response = polly_client.synthesize_speech(
+    def synthesize():
+        response = polly_client.synthesize_speech(
+
+            Text=text,
+            OutputFormat=POLLY_OUTPUT_FORMAT,
+            VoiceId=voice_id
+        )
+        return response['AudioStream'].read()
+
+    if audio_cache is None:
+        return synthesize()
+    return audio_cache.get_or_compute(text, voice_id, POLLY_OUTPUT_FORMAT, synthesize)
+
+def split_sentences(text, max_chars=POLLY_MAX_CHARS):
+
+    # Sentences of text, each at most max_chars; a longer sentence is cut at a space
+    sentences = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        sentences.append(text[start:match.end()])
+        start = match.end()
+    sentences.append(text[start:])
+
+    pieces = []
+    for sentence in sentences:
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(' ', 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:]
+        pieces.append(sentence)
+
+    return [piece.strip() for piece in pieces if piece.strip()]
+
+def split_text(text, max_chars=POLLY_MAX_CHARS):
+
+    # Packs whole sentences into chunks of at most max_chars
+    chunks = []
+    current = ''
+    for sentence in split_sentences(text, max_chars):
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = ''
+        current = f'{current} {sentence}' if current else sentence
+    if current:
+        chunks.append(current)
+
+    return chunks
+
+def iter_speech_chunks(text, language, executor=None):
+
+    # Synthesizes the chunks of text in parallel and yields their mp3 bytes in order;
+    # mp3 frames can be concatenated as they are into one playable stream. With the
+    # audio cache on, every sentence is its own chunk so repeated sentences are reused.
+    executor = executor or polly_executor
+    chunks = split_sentences(text) if audio_cache is not None else split_text(text)
+    futures = [executor.submit(synthesize_speech, chunk, language) for chunk in chunks]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+def synthesize_long_speech(text, language):
+
+    return b''.join(iter_speech_chunks(text, language))
 
-        Text=text,
-        OutputFormat='mp3',
-        VoiceId=voice_id
-    )
+def text_to_speech(text, output_filename, language):
 
     with open(output_filename, 'wb') as file:
-        file.write(response['AudioStream'].read())
+        for audio in iter_speech_chunks(text, language):
+            file.write(audio)
 
     # mixer.init()
     # mixer.music.load(output_filename)
@@ -0,0 +1,153 @@
+# File: ./aws_textract_project/prompt_retrieval.py
+
+import argparse
+import json
+import math
+import os
+import re
+import time
+from collections import Counter
+
+# Rough size of a model token in characters, good enough for budgeting English/OCR text
+CHARS_PER_TOKEN = 4
+
+# Upper bound for the document part of a Bedrock prompt, and how many fragments may fill it
+PROMPT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', '1500'))
+PROMPT_TOP_K = int(os.environ.get('PROMPT_TOP_K', '20'))
+
+# Fragments longer than this are split into overlapping word windows
+FRAGMENT_WORDS = 40
+FRAGMENT_OVERLAP = 10
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+(?:[.,\-][a-z0-9]+)*')
+
+# Frequent question words that say nothing about which part of a form is relevant
+STOPWORDS = frozenset((
+    'a an and are as at be by can do does for from how i in is it its me my of on or the this to '
+    'was what when where which who why will with you your'
+).split())
+
+
+def estimate_tokens(text):
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN)) if text else 0
+
+
+def tokenize(text):
+    return [term for term in TOKEN_PATTERN.findall(text.lower()) if term not in STOPWORDS]
+
+
+def split_fragments(text, window=FRAGMENT_WORDS, overlap=FRAGMENT_OVERLAP):
+    """
+    Splits document data into retrievable fragments: one per line (a KV pair for
+    W-2s, a LINE block for other forms), with long lines cut into overlapping
+    windows of words.
+    """
+    fragments = []
+    for line in text.splitlines():
+        words = line.split()
+        if not words:
+            continue
+        if len(words) <= window:
+            fragments.append(line.strip())
+            continue
+        for start in range(0, len(words), window - overlap):
+            fragments.append(' '.join(words[start:start + window]))
+            if start + window >= len(words):
+                break
+    return fragments
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a document's fragments.
+    """
+
+    def __init__(self, fragments, k1=1.5, b=0.75):
+        self.fragments = fragments
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(tokenize(fragment)) for fragment in fragments]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        document_frequency = Counter(term for counts in self.term_counts for term in counts)
+        n = len(fragments)
+        self.idf = {
+            term: math.log(1 + (n - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequency.items()
+        }
+
+    def scores(self, query):
+        terms = [term for term in set(tokenize(query)) if term in self.idf]
+        scores = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self.average_length) if self.average_length else self.k1
+            score = 0.0
+            for term in terms:
+                frequency = counts.get(term)
+                if frequency:
+                    score += self.idf[term] * frequency * (self.k1 + 1) / (frequency + norm)
+            scores.append(score)
+        return scores
+
+
+def compact_context(text, question, token_budget=PROMPT_TOKEN_BUDGET, top_k=PROMPT_TOP_K):
+    """
+    Picks the fragments of text most relevant to question that fit in token_budget.
+
+    Text that already fits is returned unchanged. Otherwise up to top_k fragments are
+    taken by BM25 score (falling back to document order when nothing matches) and
+    returned in their original order, one per line.
+
+    :param text: Document data, e.g. the KV string or the line OCR text
+    :param question: User question
+    :return: Tuple of (context, report dictionary)
+    """
+    start = time.perf_counter()
+    original_tokens = estimate_tokens(text)
+    report = {'original_tokens': original_tokens, 'token_budget': token_budget}
+
+    if original_tokens <= token_budget:
+        context = text
+        report.update(fragments=None, selected=None)
+    else:
+        fragments = split_fragments(text)
+        scores = BM25Index(fragments).scores(question)
+        ranked = sorted(range(len(fragments)), key=lambda i: (-scores[i], i))
+        if not any(scores):
+            ranked = list(range(len(fragments)))
+
+        selected, used = [], 0
+        for i in ranked:
+            if len(selected) >= top_k:
+                break
+            cost = estimate_tokens(fragments[i]) + 1
+            if used + cost > token_budget:
+                continue
+            selected.append(i)
+            used += cost
+        context = '\n'.join(fragments[i] for i in sorted(selected))
+        report.update(fragments=len(fragments), selected=len(selected))
+
+    report['prompt_tokens'] = estimate_tokens(context)
+    report['tokens_saved'] = original_tokens - report['prompt_tokens']
+    report['retrieval_ms'] = (time.perf_counter() - start) * 1000
+    return context, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the context a question would get from a document's OCR data.")
+    parser.add_argument('data_file', help="File with the KV string or line OCR text of a document")
+    parser.add_argument('question', help="User question")
+    parser.add_argument('--token-budget', type=int, default=PROMPT_TOKEN_BUDGET)
+    parser.add_argument('--top-k', type=int, default=PROMPT_TOP_K)
+    args = parser.parse_args()
+
+    with open(args.data_file, encoding='utf-8') as f:
+        text = f.read()
+    context, report = compact_context(text, args.question, args.token_budget, args.top_k)
+    print(context)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
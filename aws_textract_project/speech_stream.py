@@ -0,0 +1,118 @@
+# File: ./aws_textract_project/speech_stream.py
+
+import os
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from polly import SENTENCE_END, synthesize_long_speech
+from translate import translate_from_english
+
+# Sentences translated and synthesized at the same time; Polly allows a handful of concurrent requests
+NARRATION_WORKERS = int(os.environ.get('NARRATION_WORKERS', '4'))
+
+# Shorter sentences ("Sure.") are joined with the next one rather than voiced on their own
+MIN_SENTENCE_CHARS = 12
+
+narration_executor = ThreadPoolExecutor(max_workers=NARRATION_WORKERS)
+
+
+def stream_sentences(pieces, min_chars=MIN_SENTENCE_CHARS):
+    """
+    Regroups a stream of text pieces (e.g. model tokens) into sentences, yielding
+    each one as soon as its end has arrived.
+
+    :param pieces: Iterable of strings
+    :param min_chars: Sentences shorter than this are held back and joined with the next
+    """
+    buffer = ''
+    for piece in pieces:
+        buffer += piece
+        position = 0
+        while True:
+            match = SENTENCE_END.search(buffer, position)
+            if match is None:
+                break
+            position = match.end()
+            sentence = buffer[:position].strip()
+            if len(sentence) < min_chars:
+                continue
+            yield sentence
+            buffer = buffer[position:]
+            position = 0
+    if buffer.strip():
+        yield buffer.strip()
+
+
+def sentence_spans(text, min_chars=MIN_SENTENCE_CHARS):
+    """
+    Splits text into the sentences stream_sentences yields for it, keeping the text around them.
+
+    :param text: Complete text
+    :param min_chars: Sentences shorter than this are joined with the next, as in stream_sentences
+    :return: List of (leading whitespace, sentence, separator) tuples whose concatenation is text;
+        the sentence is empty for a text that is only whitespace
+    """
+    spans = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        if len(text[start:match.end()].strip()) < min_chars:
+            continue
+        spans.append(text[start:match.end()])
+        start = match.end()
+    if text[start:] or not spans:
+        spans.append(text[start:])
+
+    triples = []
+    for span in spans:
+        sentence = span.strip()
+        lead = span[:len(span) - len(span.lstrip())]
+        triples.append((lead, sentence, span[len(lead) + len(sentence):]))
+    return triples
+
+
+def _narrate(sentence, language, translate, synthesize):
+    text = translate(sentence, language)
+    return text, synthesize(text, language)
+
+
+def narrate_sentences(sentences, language, translate=translate_from_english, synthesize=synthesize_long_speech,
+                      executor=None):
+    """
+    Translates and voices sentences concurrently while they are still being produced,
+    yielding (translated text, mp3 bytes) in the original order as each becomes ready.
+
+    Sentence n is yielded as soon as it and every sentence before it are done, so the
+    first audio is available after one sentence rather than after the whole answer.
+    MP3 segments can be concatenated as they are into a single playable file.
+
+    :param sentences: Iterable of English sentences, e.g. from stream_sentences
+    :param language: Two-letter language code of the user
+    :param translate: Callable (text, language) -> translated text
+    :param synthesize: Callable (text, language) -> mp3 bytes
+    :param executor: Executor to run the sentences on, narration_executor by default
+    """
+    executor = executor or narration_executor
+    futures = queue.Queue()
+
+    def submit_all():
+        # Consumes the (blocking) sentence stream on its own thread so submission never
+        # waits for the caller to take segments
+        try:
+            for sentence in sentences:
+                futures.put(executor.submit(_narrate, sentence, language, translate, synthesize))
+        except Exception as e:
+            failed = Future()
+            failed.set_exception(e)
+            futures.put(failed)
+        finally:
+            futures.put(None)
+
+    producer = threading.Thread(target=submit_all, daemon=True)
+    producer.start()
+    while True:
+        future = futures.get()
+        if future is None:
+            break
+        yield future.result()
+    producer.join()
@@ -0,0 +1,175 @@
+# File: ./aws_textract_project/textract_async.py
+
+import argparse
+import io
+import json
+import logging
+import time
+import uuid
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# GetDocumentAnalysis returns at most 1000 blocks per call
+MAX_RESULTS = 1000
+POLL_INTERVAL = 1.0
+POLL_TIMEOUT = 15 * 60
+
+
+class TextractJobError(Exception):
+    """Raised when an asynchronous Textract analysis fails or times out."""
+
+
+def start_analysis(textract_client, bucket, key, feature_types=('FORMS', 'TABLES')):
+    """
+    Starts an asynchronous (multi-page) Textract analysis of an S3 object.
+
+    :return: Textract JobId of the analysis
+    """
+    response = textract_client.start_document_analysis(
+        DocumentLocation={'S3Object': {'Bucket': bucket, 'Name': key}},
+        FeatureTypes=list(feature_types)
+    )
+    logger.info(f"Started Textract analysis {response['JobId']} for s3://{bucket}/{key}")
+    return response['JobId']
+
+
+def iter_result_pages(textract_client, analysis_id, poll_interval=POLL_INTERVAL,
+                      timeout=POLL_TIMEOUT, max_results=MAX_RESULTS):
+    """
+    Waits for an asynchronous analysis to finish, then yields its result pages
+    one at a time by following NextToken.
+
+    Each yielded page is a GetDocumentAnalysis response holding up to max_results
+    blocks, so callers can process blocks while the next page is being fetched.
+
+    :param textract_client: boto3 Textract client (or LocalTextractClient)
+    :param analysis_id: JobId returned by start_analysis
+    :param poll_interval: Seconds between status checks
+    :param timeout: Seconds to wait for the analysis before giving up
+    :param max_results: Blocks requested per page
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        page = textract_client.get_document_analysis(JobId=analysis_id, MaxResults=max_results)
+        status = page['JobStatus']
+        if status != 'IN_PROGRESS':
+            break
+        if time.monotonic() > deadline:
+            raise TextractJobError(f"Textract analysis {analysis_id} did not finish within {timeout}s")
+        time.sleep(poll_interval)
+
+    if status == 'FAILED':
+        raise TextractJobError(f"Textract analysis {analysis_id} failed: {page.get('StatusMessage')}")
+    if status == 'PARTIAL_SUCCESS':
+        logger.warning(f"Textract analysis {analysis_id} partially succeeded: {page.get('Warnings')}")
+
+    # The call that reported completion already carries the first page
+    count = 1
+    yield page
+    while page.get('NextToken'):
+        page = textract_client.get_document_analysis(
+            JobId=analysis_id, MaxResults=max_results, NextToken=page['NextToken']
+        )
+        count += 1
+        yield page
+    logger.info(f"Read {count} result pages of Textract analysis {analysis_id}")
+
+
+def analyze_document_pages(textract_client, bucket, key, feature_types=('FORMS', 'TABLES'), **kwargs):
+    """
+    Runs an asynchronous analysis and yields its result pages as they are fetched.
+    """
+    analysis_id = start_analysis(textract_client, bucket, key, feature_types)
+    yield from iter_result_pages(textract_client, analysis_id, **kwargs)
+
+
+class LocalTextractClient:
+    """
+    Offline stand-in for the Textract client, serving a saved response.
+
+    Supports analyze_document and the start_document_analysis / get_document_analysis
+    pair, including IN_PROGRESS polls and NextToken paging, so the asynchronous mode
+    can be exercised without AWS.
+    """
+
+    def __init__(self, response, in_progress_polls=1):
+        """
+        :param response: Textract response (dictionary with 'Blocks') served for every document
+        :param in_progress_polls: Number of status checks answered with IN_PROGRESS per analysis
+        """
+        self.response = response
+        self.in_progress_polls = in_progress_polls
+        self._polls = {}
+        self.calls = []
+
+    def analyze_document(self, **kwargs):
+        self.calls.append('analyze_document')
+        return dict(self.response)
+
+    def start_document_analysis(self, **kwargs):
+        self.calls.append('start_document_analysis')
+        analysis_id = uuid.uuid4().hex
+        self._polls[analysis_id] = 0
+        return {'JobId': analysis_id}
+
+    def get_document_analysis(self, JobId, MaxResults=MAX_RESULTS, NextToken=None):
+        self.calls.append('get_document_analysis')
+        if JobId not in self._polls:
+            raise ValueError(f"Unknown JobId: {JobId}")
+        if self._polls[JobId] < self.in_progress_polls:
+            self._polls[JobId] += 1
+            return {'JobStatus': 'IN_PROGRESS'}
+
+        blocks = self.response['Blocks']
+        start = int(NextToken or 0)
+        end = start + MaxResults
+        page = {
+            'JobStatus': 'SUCCEEDED',
+            'DocumentMetadata': self.response.get('DocumentMetadata', {'Pages': 1}),
+            'Blocks': blocks[start:end]
+        }
+        if end < len(blocks):
+            page['NextToken'] = str(end)
+        return page
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Runs the asynchronous Textract mode offline against a saved response "
+                    "and checks it produces the same words as the synchronous mode."
+    )
+    parser.add_argument('response', help="Path to a saved Textract response JSON")
+    parser.add_argument('--max-results', type=int, default=MAX_RESULTS, help="Blocks per result page")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from aws_textract_project import textract_for_sagemaker
+
+    with open(args.response) as f:
+        response = json.load(f)
+    client = LocalTextractClient(response)
+
+    sync_words = textract_for_sagemaker.generate_ml_json(response, args.response)['Words']
+    written = io.BytesIO()
+    start = time.perf_counter()
+    analysis = textract_for_sagemaker.analyze_document_async(
+        'local', args.response, written, textract=client, poll_interval=0, max_results=args.max_results
+    )
+    seconds = time.perf_counter() - start
+
+    pages = sum(1 for call in client.calls if call == 'get_document_analysis') - client.in_progress_polls
+    same = analysis['words'] == sync_words and json.loads(written.getvalue())['Blocks'] == response['Blocks']
+    print(json.dumps({
+        'blocks': len(response['Blocks']),
+        'words': len(sync_words),
+        'result_pages': pages,
+        'seconds': round(seconds, 4),
+        'matches_sync': same
+    }, indent=2))
+    if not same:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+# File: ./aws_textract_project/textract_cache.py
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class TextractCache:
+    """
+    Content-addressed cache of Textract results, keyed by the SHA-256 of the document bytes.
+
+    Lookups go through an in-memory LRU tier, then an S3 tier under s3_prefix. The S3
+    tier is capped at max_s3_bytes; once over the cap the oldest written entries are
+    deleted until usage is back under the low watermark. Concurrent lookups of the same
+    hash are merged so only one of them calls compute.
+    """
+
+    def __init__(self, s3_client, bucket, s3_prefix='cache/textract', max_entries=128,
+                 max_s3_bytes=5 * 1024 ** 3, low_watermark=0.9):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.s3_prefix = s3_prefix.rstrip('/')
+        self.max_entries = max_entries
+        self.max_s3_bytes = max_s3_bytes
+        self.low_watermark = low_watermark
+        self._local = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._s3_lock = threading.Lock()
+        self._s3_bytes = None  # Lazily initialised from a listing of s3_prefix
+
+    def get_or_compute(self, doc_hash, compute):
+        """
+        Returns the cached entry for doc_hash, calling compute() on a miss in both tiers.
+
+        :param doc_hash: SHA-256 hex digest of the document
+        :param compute: Callable returning a JSON-serialisable entry
+        :return: The cached or freshly computed entry
+        """
+        with self._lock:
+            entry = self._local_get(doc_hash)
+            if entry is not None:
+                logger.info(f"Textract cache hit (memory): {doc_hash}")
+                return entry
+            call = self._inflight.get(doc_hash)
+            leader = call is None
+            if leader:
+                call = self._inflight[doc_hash] = Future()
+
+        if not leader:
+            # Another request is already fetching this document, wait for its result
+            return call.result()
+
+        try:
+            entry = self._s3_get(doc_hash)
+            if entry is not None:
+                logger.info(f"Textract cache hit (S3): {doc_hash}")
+            else:
+                logger.info(f"Textract cache miss: {doc_hash}")
+                entry = compute()
+                self._s3_put(doc_hash, entry)
+            with self._lock:
+                self._local_put(doc_hash, entry)
+            call.set_result(entry)
+            return entry
+        except Exception as e:
+            call.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(doc_hash, None)
+
+    def invalidate(self, doc_hash):
+        """
+        Drops the entry of doc_hash from both tiers, e.g. once something it refers to is gone.
+        """
+        with self._lock:
+            self._local.pop(doc_hash, None)
+        # The size is not known without another request; the next eviction re-lists anyway
+        self._s3_delete(doc_hash, 0)
+
+    def _local_get(self, doc_hash):
+        entry = self._local.get(doc_hash)
+        if entry is not None:
+            self._local.move_to_end(doc_hash)
+        return entry
+
+    def _local_put(self, doc_hash, entry):
+        self._local[doc_hash] = entry
+        self._local.move_to_end(doc_hash)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    def _s3_key(self, doc_hash):
+        return f'{self.s3_prefix}/{doc_hash}.json'
+
+    def _s3_get(self, doc_hash):
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self._s3_key(doc_hash))
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        except Exception as e:
+            # A broken cache tier should never fail the request
+            logger.warning(f"Error reading Textract cache from S3: {e}")
+            return None
+        try:
+            return json.loads(response['Body'].read())
+        except Exception as e:
+            # A truncated or corrupt entry is a miss; drop it so it is rebuilt by the next put
+            logger.warning(f"Discarding unreadable Textract cache entry {doc_hash}: {e}")
+            self._s3_delete(doc_hash, response.get('ContentLength', 0))
+            return None
+
+    def _s3_delete(self, doc_hash, size):
+        try:
+            self.s3_client.delete_object(Bucket=self.bucket, Key=self._s3_key(doc_hash))
+            with self._s3_lock:
+                if self._s3_bytes is not None:
+                    self._s3_bytes = max(0, self._s3_bytes - size)
+        except Exception as e:
+            logger.warning(f"Error deleting Textract cache entry from S3: {e}")
+
+    def _s3_put(self, doc_hash, entry):
+        body = json.dumps(entry).encode('utf-8')
+        try:
+            self.s3_client.put_object(
+                Bucket=self.bucket,
+                Key=self._s3_key(doc_hash),
+                Body=body,
+                ContentType='application/json'
+            )
+            with self._s3_lock:
+                if self._s3_bytes is None:
+                    self._s3_bytes = sum(obj['Size'] for obj in self._list_s3_entries())
+                else:
+                    self._s3_bytes += len(body)
+                if self._s3_bytes > self.max_s3_bytes:
+                    self._evict_s3()
+        except Exception as e:
+            logger.warning(f"Error writing Textract cache to S3: {e}")
+
+    def _list_s3_entries(self):
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f'{self.s3_prefix}/'):
+            yield from page.get('Contents', [])
+
+    def _evict_s3(self):
+        # Called with _s3_lock held; re-list so the running total is corrected too
+        entries = sorted(self._list_s3_entries(), key=lambda obj: obj['LastModified'])
+        total = sum(obj['Size'] for obj in entries)
+        target = self.max_s3_bytes * self.low_watermark
+        doomed = []
+        for obj in entries:
+            if total <= target:
+                break
+            doomed.append({'Key': obj['Key']})
+            total -= obj['Size']
+
+        # delete_objects accepts at most 1000 keys per call
+        for start in range(0, len(doomed), 1000):
+            self.s3_client.delete_objects(
+                Bucket=self.bucket,
+                Delete={'Objects': doomed[start:start + 1000], 'Quiet': True}
+            )
+        self._s3_bytes = total
+        logger.info(f"Evicted {len(doomed)} Textract cache entries from S3.")
@@ -1,11 +1,15 @@
 # File: ./aws_textract_project/textract_for_sagemaker.py
 
-import boto3
 import json
 import os
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from werkzeug.utils import secure_filename
 import logging
+from aws_textract_project.textract_cache import TextractCache
+from aws_textract_project.textract_async import analyze_document_pages, POLL_INTERVAL, MAX_RESULTS
+from aws_clients import get_client
+from streaming_upload import S3StreamingUpload
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -16,8 +20,19 @@ S3_BUCKET = 'w2-datasets'
 S3_REGION = 'us-east-1'  # Replace with your AWS region
 
 # Initialize AWS clients
-s3_client = boto3.client('s3', region_name=S3_REGION)
-textract_client = boto3.client('textract', region_name=S3_REGION)
+s3_client = get_client('s3', S3_REGION)
+textract_client = get_client('textract', S3_REGION)
+
+# Textract results keyed by document hash, shared by all requests in this process
+textract_cache = TextractCache(s3_client, S3_BUCKET)
+
+# 'sync' (analyze_document, single page), 'async' (StartDocumentAnalysis, multi-page)
+# or 'auto' (async for PDFs, which may have several pages)
+TEXTRACT_MODE = os.environ.get('TEXTRACT_MODE', 'auto')
+
+# Post-processing of asynchronous result pages overlaps with fetching the next ones
+TEXTRACT_PAGE_WORKERS = int(os.environ.get('TEXTRACT_PAGE_WORKERS', '4'))
+page_executor = ThreadPoolExecutor(max_workers=TEXTRACT_PAGE_WORKERS, thread_name_prefix='textract-page')
 
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf'}
@@ -35,38 +50,57 @@ def generate_ml_json(textract_response, document_name):
     :return: Dictionary containing extracted words and their bounding boxes
     """
     output_data = []
+    append = output_data.append
     for block in textract_response['Blocks']:
         if block['BlockType'] == 'WORD':
-            word_data = {
+            box = block['Geometry']['BoundingBox']
+            append({
                 'Text': block['Text'],
                 'BoundingBox': {
-                    'Left': block['Geometry']['BoundingBox']['Left'],
-                    'Top': block['Geometry']['BoundingBox']['Top'],
-                    'Width': block['Geometry']['BoundingBox']['Width'],
-                    'Height': block['Geometry']['BoundingBox']['Height']
+                    'Left': box['Left'],
+                    'Top': box['Top'],
+                    'Width': box['Width'],
+                    'Height': box['Height']
                 }
-            }
-            output_data.append(word_data)
+            })
     final_output = {
         'DocumentName': document_name,
         'Words': output_data
     }
     return final_output
 
-def process_textract(document_name):
+def job_key(prefix, filename, job_id=None):
     """
-    Processes a document using Textract and uploads the OCR output to S3.
+    Builds an S3 key, scoped under the job's own folder when a job ID is given.
 
-    :param document_name: Name of the document to process
-    :return: Dictionary containing extracted words and their bounding boxes
+    :param prefix: Folder prefix, e.g. 'input/raw_file'
+    :param filename: Name of the file
+    :param job_id: Optional job ID
+    :return: S3 key
     """
-    logger.info(f"Starting Textract processing for document: {document_name}")
+    if job_id:
+        return f'{prefix}/{job_id}/{filename}'
+    return f'{prefix}/{filename}'
 
-    # Define S3 keys
-    s3_input_key = f'input/raw_file/{document_name}'
-    s3_output_key = f'output/json/ML_{os.path.splitext(document_name)[0]}.json'
+def textract_response_key(document_name, job_id=None):
+    """
+    Builds the S3 key the raw Textract response of a document is saved under,
+    so later stages (pipeline.py) can reuse it instead of calling Textract again.
+
+    :param document_name: Name of the document
+    :param job_id: Optional job ID
+    :return: S3 key
+    """
+    return job_key('output/textract', f'{os.path.splitext(document_name)[0]}.json', job_id)
 
-    # Call Textract to analyze the document
+def analyze_document(s3_input_key, document_name):
+    """
+    Runs Textract FORMS+TABLES analysis on an S3 object.
+
+    :param s3_input_key: S3 key of the document
+    :param document_name: Name of the processed document
+    :return: Dictionary with the raw Textract response and the generated OCR words
+    """
     try:
         response = textract_client.analyze_document(
             Document={'S3Object': {'Bucket': S3_BUCKET, 'Name': s3_input_key}},
@@ -77,16 +111,133 @@ def process_textract(document_name):
         logger.error(f"Error during Textract analysis: {e}")
         raise e
 
-    # Generate simplified OCR JSON
-    ocr_json = generate_ml_json(response, document_name)
+    # Request metadata is per call and not worth caching
+    response.pop('ResponseMetadata', None)
+
+    return {
+        'response': response,
+        'words': generate_ml_json(response, document_name)['Words']
+    }
+
+def use_async_analysis(document_name):
+    if TEXTRACT_MODE == 'auto':
+        return document_name.lower().endswith('.pdf')
+    return TEXTRACT_MODE == 'async'
+
+def analyze_document_async(s3_input_key, document_name, response_writer, textract=None,
+                           poll_interval=POLL_INTERVAL, max_results=MAX_RESULTS):
+    """
+    Runs an asynchronous, multi-page Textract FORMS+TABLES analysis on an S3 object.
 
-    # Save OCR JSON to a temporary file
-    temp_dir = tempfile.gettempdir()
+    Result pages are handled one at a time as they are fetched: their blocks are written
+    out to response_writer and the page is handed to generate_ml_json on page_executor,
+    so word extraction overlaps with reading the next pages and the whole response is
+    never held in memory.
+
+    :param s3_input_key: S3 key of the document
+    :param document_name: Name of the processed document
+    :param response_writer: Binary writer (e.g. an S3StreamingUpload) receiving the combined
+        Textract response as JSON
+    :param textract: Optional Textract client, defaults to textract_client
+    :return: Dictionary with the generated OCR words
+    """
+    textract = textract or textract_client
+    futures = []
+    metadata = {}
+    try:
+        response_writer.write(b'{"Blocks": [')
+        for page in analyze_document_pages(textract, S3_BUCKET, s3_input_key,
+                                           poll_interval=poll_interval, max_results=max_results):
+            metadata = page.get('DocumentMetadata', metadata)
+            if page['Blocks']:
+                separator = b', ' if futures else b''
+                response_writer.write(separator + json.dumps(page['Blocks'])[1:-1].encode('utf-8'))
+                futures.append(page_executor.submit(generate_ml_json, page, document_name))
+        response_writer.write(b'], "DocumentMetadata": ' + json.dumps(metadata).encode('utf-8') + b'}')
+        words = [word for future in futures for word in future.result()['Words']]
+        logger.info(f"Textract analysis completed ({metadata.get('Pages', '?')} pages, {len(futures)} result pages).")
+    except Exception as e:
+        logger.error(f"Error during Textract analysis: {e}")
+        raise e
+
+    return {'words': words}
+
+def save_textract_response(analysis, s3_response_key):
+    # Synchronous analyses carry their response; asynchronous ones were streamed to
+    # analysis['response_key'] and are copied when that is another job's key
+    if 'response' in analysis:
+        s3_client.put_object(
+            Bucket=S3_BUCKET,
+            Key=s3_response_key,
+            Body=json.dumps(analysis['response']).encode('utf-8'),
+            ContentType='application/json'
+        )
+    elif analysis['response_key'] != s3_response_key:
+        s3_client.copy_object(
+            Bucket=S3_BUCKET,
+            Key=s3_response_key,
+            CopySource={'Bucket': S3_BUCKET, 'Key': analysis['response_key']}
+        )
+
+def process_textract(document_name, job_id=None, doc_hash=None):
+    """
+    Processes a document using Textract and uploads the OCR output to S3.
+
+    :param document_name: Name of the document to process
+    :param job_id: Optional job ID; input and output keys are scoped under it
+    :param doc_hash: Optional SHA-256 of the document bytes; enables the Textract cache
+    :return: Dictionary containing extracted words and their bounding boxes
+    """
+    logger.info(f"Starting Textract processing for document: {document_name}")
+
+    # Define S3 keys
     ocr_filename = f'ML_{os.path.splitext(document_name)[0]}.json'
-    ocr_filepath = os.path.join(temp_dir, ocr_filename)
+    s3_input_key = job_key('input/raw_file', document_name, job_id)
+    s3_output_key = job_key('output/json', ocr_filename, job_id)
+    s3_response_key = textract_response_key(document_name, job_id)
+
+    def analyze():
+        if not use_async_analysis(document_name):
+            return analyze_document(s3_input_key, document_name)
+        # The multi-page response goes to the job's key page by page as it is read
+        upload = S3StreamingUpload(s3_client, S3_BUCKET, s3_response_key, content_type='application/json')
+        try:
+            words = analyze_document_async(s3_input_key, document_name, upload)['words']
+            upload.complete()
+        except Exception:
+            upload.abort()
+            raise
+        return {'response_key': s3_response_key, 'words': words}
+
+    # Call Textract to analyze the document, reusing the result for identical uploads
+    analysis = textract_cache.get_or_compute(doc_hash, analyze) if doc_hash else analyze()
+
+    # Save the raw response with the job so the Q&A pipeline doesn't analyze the document again
+    try:
+        try:
+            save_textract_response(analysis, s3_response_key)
+        except s3_client.exceptions.NoSuchKey:
+            # The job whose streamed response a cached analysis points to has been deleted
+            logger.warning(f"Cached Textract response {analysis['response_key']} is gone, analyzing again")
+            textract_cache.invalidate(doc_hash)
+            analysis = textract_cache.get_or_compute(doc_hash, analyze)
+            save_textract_response(analysis, s3_response_key)
+        logger.info(f"Textract response saved to S3 at: {s3_response_key}")
+    except Exception as e:
+        logger.error(f"Error saving Textract response to S3: {e}")
+        raise e
+
+    # Generate simplified OCR JSON
+    ocr_json = {
+        'DocumentName': document_name,
+        'Words': analysis['words']
+    }
+
+    # Save OCR JSON to a temporary file (unique per call so concurrent jobs don't collide)
     try:
-        with open(ocr_filepath, 'w') as f:
+        with tempfile.NamedTemporaryFile(mode='w', suffix=f'_{ocr_filename}', delete=False) as f:
             json.dump(ocr_json, f, indent=4)
+            ocr_filepath = f.name
         logger.info(f"OCR JSON saved to temporary file: {ocr_filepath}")
     except Exception as e:
         logger.error(f"Error saving OCR JSON: {e}")
@@ -1,6 +1,8 @@
-import boto3
 import json
 import os
+import sys
+from textract_async import analyze_document_pages
+from bulk_ocr import BulkRunner, Checkpoint, iter_object_keys
 
 # Prints number of each block type that occurs in each test_response
 def numTypes(test_response):
@@ -37,14 +39,12 @@ def genMap(test_response):
 def genBlockMap(blocks):
     key_map = {}
     value_map = {}
-    block_map = {}
 
     # Create a map of blocks using block IDs
-    for block in blocks:
-        block_id = block['Id']
-        block_map[block_id] = block
-        
-        # Store KEY and VALUE blocks in separate dictionaries
+    block_map = {block['Id']: block for block in blocks}
+
+    # Store KEY and VALUE blocks in separate dictionaries
+    for block_id, block in block_map.items():
         if block['BlockType'] == 'KEY_VALUE_SET':
             if 'KEY' in block['EntityTypes']:
                 key_map[block_id] = block
@@ -54,50 +54,47 @@ def genBlockMap(blocks):
     
 
 def get_text_for_block(block, block_map):
-    text = ""
+    words = []
     if 'Relationships' in block:
         for relationship in block['Relationships']:
             if relationship['Type'] == 'CHILD':
                 for child_id in relationship['Ids']:
                     child_block = block_map[child_id]
                     if child_block['BlockType'] == 'WORD':
-                        text += child_block['Text'] + " "
-    return text.strip()
+                        words.append(child_block['Text'])
+    return ' '.join(words).strip()
 
 def extract_key_value_pairs(test_response):
-    blocks = test_response['Blocks']
-    
-    key_map, value_map, block_map = genBlockMap(blocks)
-
     key_value_pairs = {}
-    
+    key_map, value_map, block_map = genBlockMap(test_response['Blocks'])
+
     # Extract key-value pairs
     for key_block in key_map.values():
-        key_text = get_text_for_block(key_block, block_map)
-        
         # Find the VALUE block related to the KEY block
-        if 'Relationships' in key_block:
-            for relationship in key_block['Relationships']:
-                if relationship['Type'] == 'VALUE':
-                    for value_id in relationship['Ids']:
-                        value_block = value_map[value_id]
-                        value_text = get_text_for_block(value_block, block_map)
-                        key_value_pairs[key_text] = value_text
+        value_ids = [
+            value_id
+            for relationship in key_block.get('Relationships', ()) if relationship['Type'] == 'VALUE'
+            for value_id in relationship['Ids']
+        ]
+        if value_ids:
+            key_text = get_text_for_block(key_block, block_map)
+            key_value_pairs[key_text] = get_text_for_block(value_map[value_ids[-1]], block_map)
     return key_value_pairs
 
 def generateMLJSON(test_response, document_name):
-    # Loop through the blocks in the test_response
+    # Create a dictionary with word text and its bounding box details for every word
     output_data = []
+    # Loop through the blocks in the test_response
     for block in test_response['Blocks']:
         if block['BlockType'] == 'WORD':
-            # Create a dictionary with word text and its bounding box details
+            box = block['Geometry']['BoundingBox']
             word_data = {
                 'Text': block['Text'],
                 'BoundingBox': {
-                    'Left': block['Geometry']['BoundingBox']['Left'],
-                    'Top': block['Geometry']['BoundingBox']['Top'],
-                    'Width': block['Geometry']['BoundingBox']['Width'],
-                    'Height': block['Geometry']['BoundingBox']['Height']
+                    'Left': box['Left'],
+                    'Top': box['Top'],
+                    'Width': box['Width'],
+                    'Height': box['Height']
                 }
             }
             # Add this dictionary to the list
@@ -134,10 +131,18 @@ def process_file(document_name, s3_bucket_name, textract_client, s3_client):
     output_filepath = f'aws-textract-project/out/ML{base_name}.json'
 
     # Call Textract to analyze the document
-    textract_response = textract_client.analyze_document(
-        Document={'S3Object': {'Bucket': s3_bucket_name, 'Name': document_name}},
-        FeatureTypes=['FORMS', 'TABLES'],
-    )
+    if document_name.lower().endswith('.pdf'):
+        # PDFs can have several pages, which only the asynchronous API handles;
+        # their result pages are combined into one response
+        blocks = []
+        for page in analyze_document_pages(textract_client, s3_bucket_name, document_name):
+            blocks.extend(page['Blocks'])
+        textract_response = {'Blocks': blocks}
+    else:
+        textract_response = textract_client.analyze_document(
+            Document={'S3Object': {'Bucket': s3_bucket_name, 'Name': document_name}},
+            FeatureTypes=['FORMS', 'TABLES'],
+        )
     # Make lines for entities
     lines = ''
     print(extract_key_value_pairs(textract_response))
@@ -211,9 +216,11 @@ def process_file(document_name, s3_bucket_name, textract_client, s3_client):
     #     print(f"Error deleting file {output_filepath}: {e}")
 
 def main():
+    from aws_clients import get_client
+
     # Initialize the Textract and S3 clients
-    textract = boto3.client('textract', region_name='us-east-1')
-    s3 = boto3.client('s3')
+    textract = get_client('textract', 'us-east-1')
+    s3 = get_client('s3')
 
     # S3 Bucket
     s3_bucket_name = 'w2-datasets'
@@ -227,15 +234,17 @@ def main():
         # Process a single file
         process_file(document_name, s3_bucket_name, textract, s3)
     else:
-        # List all objects in the bucket
-        all_objects = list_all_objects(s3, s3_bucket_name)
-
-        # Process each object
-        for obj in all_objects:
-            document_name = obj['Key']
-            process_file(document_name, s3_bucket_name, textract, s3)
+        # Stream keys from the listing into a concurrent, resumable run (see bulk_ocr.py)
+        checkpoint = Checkpoint('bulk_ocr_manifest.jsonl')
+        runner = BulkRunner(lambda key: process_file(key, s3_bucket_name, textract, s3), checkpoint)
+        try:
+            print(runner.run(iter_object_keys(s3, s3_bucket_name)))
+        finally:
+            checkpoint.close()
 
 if __name__ == "__main__":
+    # aws_clients.py lives at the repository root, next to app.py
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     main()
   
 
@@ -1,25 +1,36 @@
-import boto3
 import sys
 import re
 import json
 from collections import defaultdict
 
+from aws_clients import get_client
+
 # Uses AWS Textract to generate key-value pairs out of the form data.
 
-def get_kv_map(file_name):
-    with open(file_name, 'rb') as file:
-        img_test = file.read()
-        bytes_test = bytearray(img_test)
-        print('Image loaded', file_name)
+def get_kv_map(file_name, textract_response=None, document_bytes=None):
+    # Reuse an analysis made earlier (e.g. at upload time) when one is given
+    if textract_response is not None:
+        return get_block_maps(textract_response['Blocks'])
+
+    # Document bytes already in memory (e.g. straight from S3) skip the disk round trip
+    if document_bytes is not None:
+        bytes_test = document_bytes
+    else:
+        with open(file_name, 'rb') as file:
+            img_test = file.read()
+            bytes_test = bytearray(img_test)
+            print('Image loaded', file_name)
 
     # process using image bytes
-    textract = boto3.client('textract', region_name='us-east-1')
+    textract = get_client('textract', 'us-east-1')
     
     response = textract.analyze_document(Document={'Bytes': bytes_test}, FeatureTypes=['FORMS'])
 
     # Get the text blocks
-    blocks = response['Blocks']
+    return get_block_maps(response['Blocks'])
+
 
+def get_block_maps(blocks):
     # get key and value maps
     key_map = {}
     value_map = {}
@@ -1,13 +1,20 @@
-import boto3
+from aws_clients import get_client
 
-def get_line_ocr_data(input_file_name):
-    with open(input_file_name, 'rb') as file:
-        img_test = file.read()
-        bytes_test = bytearray(img_test)
-    textract = boto3.client('textract', region_name='us-east-1')
+def get_line_ocr_data(input_file_name, textract_response=None, document_bytes=None):
+    # Any analysis of the document (FORMS/TABLES included) carries its LINE blocks
+    if textract_response is not None:
+        return line_text(textract_response)
+
+    if document_bytes is not None:
+        bytes_test = document_bytes
+    else:
+        with open(input_file_name, 'rb') as file:
+            img_test = file.read()
+            bytes_test = bytearray(img_test)
+    textract = get_client('textract', 'us-east-1')
     response = textract.detect_document_text(Document={'Bytes': bytes_test})
-    text = ''
-    for block in response['Blocks']:
-        if block['BlockType'] == 'LINE':
-            text += block['Text']
-    return text
\ No newline at end of file
+    return line_text(response)
+
+def line_text(response):
+    # One LINE per line, so words of consecutive lines stay apart and prompt retrieval can split on them
+    return '\n'.join(block['Text'] for block in response['Blocks'] if block['BlockType'] == 'LINE')
@@ -1,26 +1,158 @@
-import boto3
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from aws_clients import get_client
 
-translate = boto3.client('translate')
+translate = get_client('translate')
+
+# TranslateText accepts at most 10,000 bytes of UTF-8 text per request; keep some headroom
+TRANSLATE_MAX_REQUEST_BYTES = 9000
+TRANSLATE_WORKERS = int(os.environ.get('TRANSLATE_WORKERS', '4'))
+TRANSLATE_CACHE_ENTRIES = int(os.environ.get('TRANSLATE_CACHE_ENTRIES', '4096'))
+
+# Segments are merged one per line; Translate keeps line breaks, so the result splits back
+SEGMENT_SEPARATOR = '\n'
+
+
+class TranslationService:
+    """
+    Translates text through an LRU cache keyed by (text, source, target).
+
+    translate_many merges the uncached segments into a few requests of at most
+    max_request_bytes, one segment per line, runs them concurrently on a bounded pool
+    and maps the results back to the original segments. A request whose result does
+    not split back into the same number of lines is retried segment by segment.
+    """
+
+    def __init__(self, client, max_entries=TRANSLATE_CACHE_ENTRIES,
+                 max_request_bytes=TRANSLATE_MAX_REQUEST_BYTES, max_workers=TRANSLATE_WORKERS):
+        self.client = client
+        self.max_entries = max_entries
+        self.max_request_bytes = max_request_bytes
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._requests = 0
+
+    def translate(self, text, source_language, target_language):
+        return self.translate_many([text], source_language, target_language)[0]
+
+    def translate_many(self, segments, source_language, target_language):
+        """
+        :param segments: List of strings
+        :return: List of translations, in the order of segments
+        """
+        if source_language == target_language:
+            return list(segments)
+
+        results = [None] * len(segments)
+        pending = {}  # text -> indices of segments waiting for it
+        with self._lock:
+            for i, text in enumerate(segments):
+                if not text.strip():
+                    results[i] = text
+                    continue
+                key = (text, source_language, target_language)
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self._hits += 1
+                    results[i] = cached
+                else:
+                    self._misses += 1
+                    pending.setdefault(text, []).append(i)
+
+        if pending:
+            batches = self._batches(list(pending))
+            if len(batches) == 1:
+                translated = [self._translate_batch(batches[0], source_language, target_language)]
+            else:
+                futures = [self.executor.submit(self._translate_batch, batch, source_language, target_language)
+                           for batch in batches]
+                translated = [future.result() for future in futures]
+            with self._lock:
+                for batch, batch_results in zip(batches, translated):
+                    for text, result in zip(batch, batch_results):
+                        self._cache_put((text, source_language, target_language), result)
+                        for i in pending[text]:
+                            results[i] = result
+        return results
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'requests': self._requests,
+                'hit_ratio': self._hits / lookups if lookups else 0.0,
+            }
+
+    def _batches(self, texts):
+        # Greedily packs texts into batches whose joined size fits one request; a text
+        # with its own line breaks, or too large to share a request, goes alone
+        batches, current, size = [], [], 0
+        for text in texts:
+            text_bytes = len(text.encode('utf-8'))
+            if SEGMENT_SEPARATOR in text or text_bytes >= self.max_request_bytes:
+                batches.append([text])
+                continue
+            if current and size + 1 + text_bytes > self.max_request_bytes:
+                batches.append(current)
+                current, size = [], 0
+            size += text_bytes + (1 if current else 0)
+            current.append(text)
+        if current:
+            batches.append(current)
+        return batches
+
+    def _request(self, text, source_language, target_language):
+        with self._lock:
+            self._requests += 1
+        response = self.client.translate_text(
+            Text=text,
+            SourceLanguageCode=source_language,
+            TargetLanguageCode=target_language
+        )
+        return response['TranslatedText']
+
+    def _translate_batch(self, batch, source_language, target_language):
+        # Results are stripped however a segment was sent, so a text translates the same alone or batched
+        if len(batch) == 1:
+            return [self._request(batch[0], source_language, target_language).strip()]
+        lines = self._request(SEGMENT_SEPARATOR.join(batch), source_language, target_language).split(SEGMENT_SEPARATOR)
+        if len(lines) == len(batch):
+            return [line.strip() for line in lines]
+        print(f"Translated batch of {len(batch)} segments came back as {len(lines)} lines, translating one by one")
+        return [self._request(text, source_language, target_language).strip() for text in batch]
+
+    def _cache_put(self, key, result):
+        # Called with _lock held
+        self._cache[key] = result
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+
+translation_service = TranslationService(translate)
 
 
 def translate_to_english(text, source_language):
-   
+
     if source_language == "en":
-        return text 
-    response = translate.translate_text(
-        Text=text,
-        SourceLanguageCode=source_language,
-        TargetLanguageCode="en"
-    )
-    return response['TranslatedText']
+        return text
+    return translation_service.translate(text, source_language, "en")
 
 def translate_from_english(text, target_language):
-    
+
     if target_language == "en":
-        return text 
-    response = translate.translate_text(
-        Text=text,
-        SourceLanguageCode="en",
-        TargetLanguageCode=target_language
-    )
-    return response['TranslatedText']
\ No newline at end of file
+        return text
+    return translation_service.translate(text, "en", target_language)
+
+def translate_segments(segments, source_language, target_language):
+
+    # Many strings at once (KV labels, answer sentences, UI phrases) in a few merged requests
+    return translation_service.translate_many(segments, source_language, target_language)
@@ -8,6 +8,31 @@ import axios from 'axios';
 import './i18n';
 import './styles/HomePage.css';
 
+const API_URL = 'http://localhost:8080';
+const POLL_INTERVAL_MS = 1000;
+
+// Uploads a file and polls its job until the prediction result is ready
+const uploadAndProcess = async (file) => {
+  const formData = new FormData();
+  formData.append('file', file);
+
+  const submitted = await axios.post(`${API_URL}/upload-and-process`, formData, {
+    headers: {
+      'Content-Type': 'multipart/form-data',
+    },
+  });
+  const jobId = submitted.data.job_id;
+
+  // The result endpoint answers 202 while the job is queued or running
+  for (;;) {
+    const res = await axios.get(`${API_URL}/get-prediction-result`, { params: { job_id: jobId } });
+    if (res.status === 200) {
+      return res.data;
+    }
+    await new Promise((resolve) => setTimeout(resolve, POLL_INTERVAL_MS));
+  }
+};
+
 const HomePage = () => {
   const { t, i18n } = useTranslation();
   
@@ -48,26 +73,19 @@ const HomePage = () => {
   const handleUploadFile = async (event) => {
     const file = event.target.files[0];
 
-    const formData = new FormData();
-    formData.append('file', file);
-
     try {
-      // Update the URL to use port 8080
-      const response = await axios.post('http://localhost:8080/upload-and-process', formData, {
-        headers: {
-          'Content-Type': 'multipart/form-data',
-        },
-      });
+      const result = await uploadAndProcess(file);
 
       // Handle success response
-      console.log('File uploaded and processed successfully:', response.data);
+      console.log('File uploaded and processed successfully:', result);
 
       // Navigate to the results page, passing any necessary data
       navigate('/results', {
         state: {
-          fileUrl: response.data.file_url, // URL of the uploaded file in S3
-          predicted_label: response.data.predicted_label, // Predicted document type
-          confidence: response.data.confidence, // Confidence score
+          fileUrl: result.file_url, // URL of the uploaded file in S3
+          predicted_label: result.predicted_label, // Predicted document type
+          confidence: result.confidence, // Confidence score
+          jobId: result.job_id, // Job the document was processed under
           lang: i18n.language,
         },
       });
@@ -98,26 +116,19 @@ const HomePage = () => {
     const blob = await response.blob();
     const file = new File([blob], 'photo.png', { type: 'image/png' });
 
-    const formData = new FormData();
-    formData.append('file', file);
-
     try {
-      // Update the URL to use port 8080
-      const res = await axios.post('http://localhost:8080/upload-and-process', formData, {
-        headers: {
-          'Content-Type': 'multipart/form-data',
-        },
-      });
+      const result = await uploadAndProcess(file);
 
       // Handle success response
-      console.log('Photo uploaded and processed successfully:', res.data);
+      console.log('Photo uploaded and processed successfully:', result);
 
       // Navigate to the results page, passing any necessary data
       navigate('/results', {
         state: {
-          fileUrl: res.data.file_url, // URL of the uploaded file in S3
-          predicted_label: res.data.predicted_label, // Predicted document type
-          confidence: res.data.confidence, // Confidence score
+          fileUrl: result.file_url, // URL of the uploaded file in S3
+          predicted_label: result.predicted_label, // Predicted document type
+          confidence: result.confidence, // Confidence score
+          jobId: result.job_id, // Job the document was processed under
           lang: i18n.language,
         },
       });
@@ -0,0 +1,122 @@
+# File: ./benchmarks/bench_aws_clients.py
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+LIST_BUCKETS_RESPONSE = (
+    b'<?xml version="1.0" encoding="UTF-8"?>'
+    b'<ListAllMyBucketsResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+    b'<Owner><ID>bench</ID></Owner><Buckets></Buckets></ListAllMyBucketsResult>'
+)
+
+
+def start_endpoint(connect_delay):
+    """
+    Starts a local S3-like endpoint answering ListBuckets over keep-alive HTTP/1.1.
+
+    :param connect_delay: Seconds added to every new connection, standing in for the
+        TCP and TLS handshakes to a real regional endpoint
+    :return: (server, endpoint URL, counters dictionary)
+    """
+    counters = {'connections': 0, 'requests': 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            # Headers and body go out in two writes; without this, Nagle's algorithm and delayed
+            # ACKs stall every response on a kept-alive connection by ~40 ms
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with lock:
+                counters['connections'] += 1
+            time.sleep(connect_delay)
+
+        def do_GET(self):
+            with lock:
+                counters['requests'] += 1
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/xml')
+            self.send_header('Content-Length', str(len(LIST_BUCKETS_RESPONSE)))
+            self.end_headers()
+            self.wfile.write(LIST_BUCKETS_RESPONSE)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}', counters
+
+
+def time_calls(func, calls):
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {'median_ms': statistics.median(timings), 'mean_ms': statistics.mean(timings)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Per-call overhead of building a boto3 client for every call "
+                                                 "versus the shared, pooled clients of aws_clients.")
+    parser.add_argument('--calls', type=int, default=50, help='Calls per case')
+    parser.add_argument('--connect-delay-ms', type=float, default=30.0,
+                        help='Delay added to each new connection, standing in for the TLS handshake')
+    parser.add_argument('--output', type=str, help='Optional path to write the results as JSON')
+    args = parser.parse_args()
+
+    server, endpoint_url, counters = start_endpoint(args.connect_delay_ms / 1000)
+    # Every client built below, by boto3 or by the factory, talks to the local endpoint
+    os.environ.update(AWS_ENDPOINT_URL=endpoint_url, AWS_ACCESS_KEY_ID='bench', AWS_SECRET_ACCESS_KEY='bench',
+                      AWS_DEFAULT_REGION='us-east-1')
+    import boto3
+    from aws_clients import get_client, warm_up
+
+    def new_client_per_call():
+        # What get_kv_map, get_line_ocr_data and generate_bedrock_response_text used to do
+        boto3.client('s3').list_buckets()
+
+    def shared_client():
+        get_client('s3').list_buckets()
+
+    cases = {
+        'client_construction_boto3': lambda: boto3.client('s3'),
+        'client_construction_factory': lambda: get_client('s3'),
+        'request_new_client_per_call': new_client_per_call,
+    }
+    results = {'settings': vars(args), 'cases': {}}
+    for name, func in cases.items():
+        before = dict(counters)
+        results['cases'][name] = time_calls(func, args.calls)
+        results['cases'][name]['connections'] = counters['connections'] - before['connections']
+
+    # Warm-up opens the pooled connection, so even the first shared call skips the handshake
+    before = dict(counters)
+    results['warm_up_ms'] = warm_up(('s3',))['s3']
+    results['cases']['request_shared_client'] = time_calls(shared_client, args.calls)
+    results['cases']['request_shared_client']['connections'] = counters['connections'] - before['connections']
+
+    for name, timing in results['cases'].items():
+        print(f"{name}: median {timing['median_ms']:.3f} ms, {timing['connections']} new connections")
+    saved = (results['cases']['request_new_client_per_call']['median_ms']
+             - results['cases']['request_shared_client']['median_ms'])
+    print(f"Overhead removed per call: {saved:.1f} ms")
+
+    server.shutdown()
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
@@ -0,0 +1,77 @@
+# File: ./benchmarks/bench_corpus_build.py
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import boto3
+
+# corpus.py lives next to the training scripts, which import it as a top-level module
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'aws_sagemaker'))
+from corpus import build_corpus, list_datasets, list_ocr_keys
+
+
+def legacy_corpus(bucket_name, prefix, dataset_names, local_data_dir):
+    """
+    The loop train_model.py used before build_corpus: one object at a time,
+    download, then json.load, then join.
+    """
+    bucket = boto3.resource('s3').Bucket(bucket_name)
+    records = []
+    for dataset_name in dataset_names:
+        for obj in bucket.objects.filter(Prefix=f'{prefix}/{dataset_name}/ocr_output/'):
+            if obj.key.endswith('.json'):
+                local_file_path = os.path.join(local_data_dir, os.path.basename(obj.key))
+                bucket.download_file(obj.key, local_file_path)
+                with open(local_file_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                records.append((' '.join([word['Text'] for word in data.get('Words', [])]), dataset_name))
+    return records
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the legacy training corpus loop with build_corpus.")
+    parser.add_argument('--bucket-name', type=str, required=True, help='S3 bucket name containing the datasets')
+    parser.add_argument('--prefix', type=str, default='datasets', help='Prefix for the datasets in S3')
+    parser.add_argument('--limit-datasets', type=int, help='Only use the first N datasets')
+    parser.add_argument('--skip-legacy', action='store_true', help='Only time build_corpus')
+    parser.add_argument('--output', type=str, help='Optional path to write the results as JSON')
+    args = parser.parse_args()
+
+    s3_client = boto3.client('s3')
+    dataset_names = list_datasets(s3_client, args.bucket_name, args.prefix)[:args.limit_datasets]
+    documents = sum(len(list_ocr_keys(s3_client, args.bucket_name, args.prefix, name)) for name in dataset_names)
+    results = {'datasets': len(dataset_names), 'documents': documents}
+    print(f"{documents} documents in {len(dataset_names)} datasets")
+
+    # Both runs start from an empty local directory so every file is downloaded
+    work_dir = tempfile.mkdtemp(prefix='bench_corpus_')
+    try:
+        if not args.skip_legacy:
+            legacy_dir = os.path.join(work_dir, 'legacy')
+            os.makedirs(legacy_dir)
+            start = time.perf_counter()
+            legacy = legacy_corpus(args.bucket_name, args.prefix, dataset_names, legacy_dir)
+            results['legacy_s'] = time.perf_counter() - start
+            print(f"legacy loop: {results['legacy_s']:.2f} s")
+
+        start = time.perf_counter()
+        records = build_corpus(s3_client, args.bucket_name, args.prefix, dataset_names,
+                               os.path.join(work_dir, 'parallel'))
+        results['build_corpus_s'] = time.perf_counter() - start
+        print(f"build_corpus: {results['build_corpus_s']:.2f} s")
+
+        if not args.skip_legacy:
+            results['speedup'] = results['legacy_s'] / results['build_corpus_s']
+            results['same_records'] = records == legacy
+            print(f"speedup: {results['speedup']:.1f}x, same records: {results['same_records']}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
@@ -0,0 +1,73 @@
+# File: ./benchmarks/bench_import_time.py
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Run from the repository root so the app's packages resolve like they do for Flask workers
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What each Flask worker imports for prediction now, versus what predict.py used to import
+CASES = {
+    'predict_module': 'import aws_sagemaker.predict',
+    'predict_module_first_client': 'import aws_sagemaker.predict as p; p.get_predictor()',
+    'legacy_sagemaker_sdk': 'import boto3, sagemaker.predictor, sagemaker.serializers, sagemaker.deserializers',
+}
+
+
+def time_import(statement, runs):
+    """
+    Times a fresh interpreter executing statement.
+
+    :param statement: Python statement to run
+    :param runs: Number of interpreter launches
+    :return: List of wall-clock seconds, or None if the statement fails
+    """
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-c', statement],
+            cwd=REPO_ROOT,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0:
+            return None
+        timings.append(elapsed)
+    return timings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure interpreter startup plus prediction module import time.")
+    parser.add_argument('--runs', type=int, default=10, help='Interpreter launches per case')
+    parser.add_argument('--output', type=str, help='Optional path to write the results as JSON')
+    args = parser.parse_args()
+
+    baseline = time_import('pass', args.runs)
+    results = {'interpreter_only': {'median_s': statistics.median(baseline)}}
+    for name, statement in CASES.items():
+        timings = time_import(statement, args.runs)
+        if timings is None:
+            print(f"{name}: skipped (statement failed, is the package installed?)")
+            continue
+        median = statistics.median(timings)
+        results[name] = {
+            'median_s': median,
+            'import_cost_s': median - results['interpreter_only']['median_s'],
+        }
+        print(f"{name}: {median * 1000:.1f} ms ({results[name]['import_cost_s'] * 1000:.1f} ms over bare interpreter)")
+
+    if 'predict_module' in results and 'legacy_sagemaker_sdk' in results:
+        saved = results['legacy_sagemaker_sdk']['import_cost_s'] - results['predict_module']['import_cost_s']
+        results['startup_saved_s'] = saved
+        print(f"Startup saved per worker: {saved * 1000:.1f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
@@ -0,0 +1,136 @@
+# File: ./benchmarks/bench_streaming_narration.py
+
+import argparse
+import functools
+import json
+import os
+import statistics
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The chatbot modules import their siblings as top-level modules, like pipeline.py does
+sys.path[:0] = [REPO_ROOT, os.path.join(REPO_ROOT, 'aws_textract_project')]
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+import pipeline
+from bedrock_chatbot import user_prompting_bedrock_stream
+from speech_stream import narrate_sentences
+
+ANSWER = (
+    "Your wages, tips and other compensation are $48,250.00, shown in box 1 of the W-2. "
+    "Federal income tax withheld is $5,312.40 in box 2. "
+    "Social security wages in box 3 match box 1, and the social security tax withheld is $2,991.50. "
+    "Medicare wages are in box 5 and the Medicare tax withheld is $699.63 in box 6. "
+    "The employer identification number is 12-3456789, listed in box b. "
+    "Let me know if you want the state or local amounts as well."
+)
+
+
+class StubBedrock:
+    """
+    bedrock-runtime stand-in whose converse_stream emits ANSWER word by word at a fixed rate.
+    """
+
+    def __init__(self, text, token_seconds):
+        self.text = text
+        self.token_seconds = token_seconds
+
+    def converse_stream(self, **kwargs):
+        def events():
+            yield {'messageStart': {'role': 'assistant'}}
+            words = self.text.split(' ')
+            for i, word in enumerate(words):
+                time.sleep(self.token_seconds)
+                yield {'contentBlockDelta': {'delta': {'text': word if i == 0 else ' ' + word}, 'contentBlockIndex': 0}}
+            yield {'messageStop': {'stopReason': 'end_turn'}}
+            yield {'metadata': {'usage': {'inputTokens': 0, 'outputTokens': len(words)}}}
+        return {'stream': events()}
+
+
+class TimedS3:
+    """
+    S3 stand-in recording when each object became available, relative to start.
+    """
+
+    def __init__(self, start):
+        self.start = start
+        self.available_at = {}
+        self.sizes = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.available_at[Key] = time.perf_counter() - self.start
+        self.sizes[Key] = len(Body)
+
+
+def make_services(translate_seconds, polly_seconds, polly_seconds_per_char):
+    def translate(text, language):
+        time.sleep(translate_seconds)
+        return text
+
+    def synthesize(text, language):
+        time.sleep(polly_seconds + polly_seconds_per_char * len(text))
+        return b'\xff\xfb' + text.encode('utf-8')
+
+    return translate, synthesize
+
+
+def run_batch(bedrock, translate, synthesize):
+    """
+    The non-streaming pipeline: whole answer, then one translation, then one synthesis.
+    Nothing can be played before the whole narration is written.
+    """
+    start = time.perf_counter()
+    answer = ''.join(user_prompting_bedrock_stream('question', 'data', 'w2', 0.9, bedrock=bedrock))
+    audio = synthesize(translate(answer, 'es'), 'es')
+    first_audio = total = time.perf_counter() - start
+    return first_audio, total, 1, len(audio)
+
+
+def run_streaming(bedrock, translate, synthesize):
+    """
+    pipeline.stream_narration: first audio is when the manifest first lists a segment,
+    i.e. when a player polling it can start.
+    """
+    pipeline.user_prompting_bedrock_stream = functools.partial(user_prompting_bedrock_stream, bedrock=bedrock)
+    pipeline.narrate_sentences = functools.partial(narrate_sentences, translate=translate, synthesize=synthesize)
+    key = 'output/mp3/bench/session.mp3'
+    start = time.perf_counter()
+    s3 = TimedS3(start)
+    pipeline.stream_narration('question', 'data', 'w2', 0.9, 'es', s3, 'bench', key)
+    first_segment = f'{os.path.splitext(key)[0]}/0000.mp3'
+    segments = sum(1 for name in s3.sizes if name.endswith('.mp3') and name != key)
+    return s3.available_at[first_segment], time.perf_counter() - start, segments, s3.sizes[key]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time to first audio of the batch and streaming answer pipelines, "
+                                                 "with stubbed Bedrock, Translate and Polly.")
+    parser.add_argument('--token-ms', type=float, default=20.0, help='Delay between streamed words')
+    parser.add_argument('--translate-ms', type=float, default=80.0, help='Latency of one translate call')
+    parser.add_argument('--polly-ms', type=float, default=150.0, help='Base latency of one Polly call')
+    parser.add_argument('--polly-ms-per-char', type=float, default=0.5, help='Polly latency per character')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per mode')
+    parser.add_argument('--output', type=str, help='Optional path to write the results as JSON')
+    args = parser.parse_args()
+
+    bedrock = StubBedrock(ANSWER, args.token_ms / 1000)
+    translate, synthesize = make_services(args.translate_ms / 1000, args.polly_ms / 1000,
+                                          args.polly_ms_per_char / 1000)
+
+    results = {'settings': vars(args), 'modes': {}}
+    for name, run in (('batch', run_batch), ('streaming', run_streaming)):
+        runs = [run(bedrock, translate, synthesize) for _ in range(args.repeat)]
+        results['modes'][name] = {
+            'first_audio_ms': statistics.median(r[0] for r in runs) * 1000,
+            'total_ms': statistics.median(r[1] for r in runs) * 1000,
+            'segments': runs[0][2],
+            'audio_bytes': runs[0][3],
+        }
+        mode = results['modes'][name]
+        print(f"{name}: first audio {mode['first_audio_ms']:.0f} ms, "
+              f"total {mode['total_ms']:.0f} ms, {mode['segments']} segments")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
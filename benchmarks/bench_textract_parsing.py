@@ -0,0 +1,133 @@
+# File: ./benchmarks/bench_textract_parsing.py
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import timeit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The textract_ocr* modules import their siblings as top-level modules, like pipeline.py does
+sys.path[:0] = [REPO_ROOT, os.path.join(REPO_ROOT, 'aws_textract_project')]
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+from synthetic_textract import make_response
+from textract_ocr import genBlockMap, extract_key_value_pairs
+from textract_ocr_better import get_block_maps, get_kv_relationship, get_text, text_kvs
+from aws_textract_project.textract_for_sagemaker import generate_ml_json
+from aws_sagemaker.predict import extract_text
+
+
+def build_cases(response):
+    """
+    Returns {name: zero-argument callable} for one response. Inputs each case
+    depends on (key/value map, OCR JSON) are prepared here, outside the timing.
+    """
+    blocks = response['Blocks']
+    key_map, value_map, block_map = get_block_maps(blocks)
+    kvs = get_kv_relationship(key_map, value_map, block_map)
+    ocr_json = generate_ml_json(response, 'bench.pdf')
+
+    return {
+        'generate_ml_json': lambda: generate_ml_json(response, 'bench.pdf'),
+        'genBlockMap': lambda: genBlockMap(blocks),
+        'extract_key_value_pairs': lambda: extract_key_value_pairs(response),
+        'get_block_maps': lambda: get_block_maps(blocks),
+        'get_kv_relationship': lambda: get_kv_relationship(key_map, value_map, block_map),
+        'get_text': lambda: [get_text(key_block, block_map) for key_block in key_map.values()],
+        'text_kvs': lambda: text_kvs(kvs),
+        'predict_word_join': lambda: extract_text(ocr_json),
+    }
+
+
+def time_case(func, repeat):
+    """
+    Times func, calling it enough times per run for timer resolution to not matter.
+
+    :return: Dictionary of per-call timings in milliseconds
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    # autorange aims for 0.2 s per run; scale down for the slow cases
+    number = max(1, number // 4)
+    runs = [seconds / number * 1000 for seconds in timer.repeat(repeat=repeat, number=number)]
+    return {
+        'min_ms': min(runs),
+        'median_ms': statistics.median(runs),
+        'stdev_ms': statistics.stdev(runs) if len(runs) > 1 else 0.0,
+        'calls_per_run': number,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """
+    Lists cases whose median got slower than the baseline by more than tolerance.
+    """
+    regressions = []
+    for size, cases in results['sizes'].items():
+        for name, timing in cases['cases'].items():
+            before = baseline.get('sizes', {}).get(size, {}).get('cases', {}).get(name)
+            if before is None:
+                continue
+            ratio = timing['median_ms'] / before['median_ms'] if before['median_ms'] else 1.0
+            if ratio > 1 + tolerance:
+                regressions.append({'pages': size, 'case': name, 'baseline_ms': before['median_ms'],
+                                    'median_ms': timing['median_ms'], 'ratio': ratio})
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Microbenchmarks for Textract parsing and feature extraction.")
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 10, 50], help='Response sizes, in pages')
+    parser.add_argument('--repeat', type=int, default=7, help='Timed runs per case')
+    parser.add_argument('--cases', type=str, nargs='+', help='Only run these cases')
+    parser.add_argument('--output', type=str, help='Optional path to write the results as JSON')
+    parser.add_argument('--baseline', type=str, help='Results JSON of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Allowed slowdown against the baseline median before failing (0.10 = 10%%)')
+    args = parser.parse_args()
+
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'git_revision': git_revision(),
+        'repeat': args.repeat,
+        'sizes': {},
+    }
+    for pages in args.pages:
+        response = make_response(pages=pages)
+        cases = build_cases(response)
+        if args.cases:
+            cases = {name: func for name, func in cases.items() if name in args.cases}
+        size = {'blocks': len(response['Blocks']), 'cases': {}}
+        print(f"{pages} pages, {size['blocks']} blocks")
+        for name, func in cases.items():
+            size['cases'][name] = time_case(func, args.repeat)
+            print(f"  {name}: {size['cases'][name]['median_ms']:.3f} ms")
+        results['sizes'][str(pages)] = size
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        results['regressions'] = regressions
+        for regression in regressions:
+            print(f"REGRESSION {regression['case']} ({regression['pages']} pages): "
+                  f"{regression['baseline_ms']:.3f} -> {regression['median_ms']:.3f} ms ({regression['ratio']:.2f}x)")
+        exit_code = 1 if regressions else 0
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+    sys.exit(exit_code)
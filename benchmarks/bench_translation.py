@@ -0,0 +1,125 @@
+# File: ./benchmarks/bench_translation.py
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# translate.py and pipeline.py are imported as top-level modules, like pipeline.py runs them
+sys.path[:0] = [REPO_ROOT, os.path.join(REPO_ROOT, 'aws_textract_project')]
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+import translate
+from translate import TranslationService
+from pipeline import translate_answer
+
+SENTENCES = [
+    "Your wages, tips and other compensation are $48,250.00.",
+    "Federal income tax withheld is $5,312.40.",
+    "Social security wages match box 1.",
+    "The social security tax withheld is $2,991.50.",
+    "Medicare wages and tips are $48,250.00.",
+    "The Medicare tax withheld is $699.63.",
+    "The employer identification number is 12-3456789.",
+    "The employer is Example Manufacturing Inc.",
+    "The employer's address is 100 Main Street, Springfield.",
+    "The control number is A1234.",
+    "Your social security number ends in 6789.",
+    "Box 12a shows code D with $3,000.00.",
+    "Box 13 has the retirement plan checkbox selected.",
+    "State wages are $48,250.00 for IL.",
+    "State income tax withheld is $2,388.38.",
+    "There are no local wages listed.",
+    "No local income tax was withheld.",
+    "The form is for tax year 2024.",
+    "This answer is based on the key value pairs of the form.",
+    "Let me know if you need anything else.",
+]
+
+
+class StubTranslate:
+    """
+    Translate client stand-in with a fixed per-request latency plus a per-byte cost.
+    """
+
+    def __init__(self, request_seconds, byte_seconds):
+        self.request_seconds = request_seconds
+        self.byte_seconds = byte_seconds
+        self.calls = 0
+        self.characters = 0
+
+    def translate_text(self, Text, SourceLanguageCode, TargetLanguageCode):
+        self.calls += 1
+        self.characters += len(Text)
+        time.sleep(self.request_seconds + self.byte_seconds * len(Text.encode('utf-8')))
+        return {'TranslatedText': '\n'.join(f'[{TargetLanguageCode}] {line}' for line in Text.split('\n'))}
+
+
+def make_answers(count, sentences_per_answer, seed=0):
+    """
+    Answers to different questions about the same kind of form: each one a few
+    sentences of the pool, always closed by the same sign-off sentence.
+    """
+    rnd = random.Random(seed)
+    return [' '.join(rnd.sample(SENTENCES[:-1], sentences_per_answer - 1) + [SENTENCES[-1]]) for _ in range(count)]
+
+
+def run_previous(client, answers):
+    """
+    The previous pipeline path: translate_from_english sent the whole answer in one
+    uncached translate_text call.
+    """
+    timings = []
+    for answer in answers:
+        start = time.perf_counter()
+        client.translate_text(Text=answer, SourceLanguageCode='en', TargetLanguageCode='es')
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def run_sentence_batches(client, answers):
+    """
+    The pipeline path now: translate_answer, through a fresh TranslationService.
+    """
+    translate.translation_service = TranslationService(client)
+    timings = []
+    for answer in answers:
+        start = time.perf_counter()
+        translate_answer(answer, 'es')
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Translation cost of a stream of chatbot answers: the previous "
+                                                 "whole-answer call versus translate_answer's cached sentence batches.")
+    parser.add_argument('--answers', type=int, default=50, help='Answers translated in one worker process')
+    parser.add_argument('--sentences', type=int, default=6, help='Sentences per answer')
+    parser.add_argument('--request-ms', type=float, default=60.0, help='Latency of one translate_text call')
+    parser.add_argument('--byte-ms', type=float, default=0.01, help='Added latency per request byte')
+    parser.add_argument('--output', type=str, help='Optional path to write the results as JSON')
+    args = parser.parse_args()
+
+    answers = make_answers(args.answers, args.sentences)
+    results = {'settings': vars(args), 'modes': {}}
+    for name, run in (('previous', run_previous), ('sentence_batches', run_sentence_batches)):
+        client = StubTranslate(args.request_ms / 1000, args.byte_ms / 1000)
+        timings = run(client, answers)
+        results['modes'][name] = {
+            'first_answer_ms': timings[0],
+            'median_answer_ms': statistics.median(timings),
+            'total_ms': sum(timings),
+            'requests': client.calls,
+            'characters': client.characters,
+        }
+        mode = results['modes'][name]
+        print(f"{name}: first answer {mode['first_answer_ms']:.1f} ms, median {mode['median_answer_ms']:.1f} ms, "
+              f"total {mode['total_ms']:.0f} ms, {mode['requests']} requests, {mode['characters']} characters billed")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
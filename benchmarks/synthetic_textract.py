@@ -0,0 +1,103 @@
+# File: ./benchmarks/synthetic_textract.py
+
+import argparse
+import json
+import random
+import uuid
+
+VOCABULARY = [
+    'Wages', 'tips', 'other', 'compensation', 'Federal', 'income', 'tax', 'withheld',
+    'Social', 'security', 'Medicare', 'Employer', 'identification', 'number', 'EIN',
+    'Box', 'Control', 'State', 'Local', '12345.00', '2024', 'W-2', 'Name', 'Address',
+]
+
+
+def make_response(pages=1, lines_per_page=60, words_per_line=6, key_values_per_page=30,
+                  tables_per_page=1, table_rows=5, table_columns=4, seed=0):
+    """
+    Builds a deterministic, AnalyzeDocument-shaped (FORMS+TABLES) Textract response.
+
+    Every page gets a PAGE block, LINE blocks with their WORD children, KEY/VALUE
+    KEY_VALUE_SET pairs (each VALUE also holds a SELECTION_ELEMENT) and TABLEs of
+    CELLs pointing at words on the page.
+
+    :return: Dictionary with 'DocumentMetadata' and 'Blocks'
+    """
+    rnd = random.Random(seed)
+
+    def block_id():
+        return str(uuid.UUID(int=rnd.getrandbits(128)))
+
+    def geometry():
+        left, top = rnd.random(), rnd.random()
+        width, height = rnd.random() * (1 - left), rnd.random() * 0.05
+        return {
+            'BoundingBox': {'Left': left, 'Top': top, 'Width': width, 'Height': height},
+            'Polygon': [
+                {'X': left, 'Y': top}, {'X': left + width, 'Y': top},
+                {'X': left + width, 'Y': top + height}, {'X': left, 'Y': top + height},
+            ]
+        }
+
+    blocks = []
+    for page_number in range(1, pages + 1):
+        page = {'BlockType': 'PAGE', 'Id': block_id(), 'Geometry': geometry(),
+                'Relationships': [{'Type': 'CHILD', 'Ids': []}], 'Page': page_number}
+        blocks.append(page)
+
+        words = []
+        for _ in range(lines_per_page):
+            line_words = [
+                {'BlockType': 'WORD', 'Id': block_id(), 'Text': rnd.choice(VOCABULARY),
+                 'Confidence': 99.0, 'TextType': 'PRINTED', 'Geometry': geometry(), 'Page': page_number}
+                for _ in range(words_per_line)
+            ]
+            line = {'BlockType': 'LINE', 'Id': block_id(), 'Confidence': 99.0,
+                    'Text': ' '.join(word['Text'] for word in line_words), 'Geometry': geometry(),
+                    'Relationships': [{'Type': 'CHILD', 'Ids': [word['Id'] for word in line_words]}],
+                    'Page': page_number}
+            blocks.append(line)
+            page['Relationships'][0]['Ids'].append(line['Id'])
+            words.extend(line_words)
+        blocks.extend(words)
+
+        for _ in range(key_values_per_page):
+            selection = {'BlockType': 'SELECTION_ELEMENT', 'Id': block_id(), 'Geometry': geometry(),
+                         'SelectionStatus': rnd.choice(['SELECTED', 'NOT_SELECTED']), 'Page': page_number}
+            value_id = block_id()
+            key = {'BlockType': 'KEY_VALUE_SET', 'Id': block_id(), 'EntityTypes': ['KEY'], 'Geometry': geometry(),
+                   'Relationships': [{'Type': 'VALUE', 'Ids': [value_id]},
+                                     {'Type': 'CHILD', 'Ids': [w['Id'] for w in rnd.sample(words, 2)]}],
+                   'Page': page_number}
+            value = {'BlockType': 'KEY_VALUE_SET', 'Id': value_id, 'EntityTypes': ['VALUE'], 'Geometry': geometry(),
+                     'Relationships': [{'Type': 'CHILD',
+                                        'Ids': [w['Id'] for w in rnd.sample(words, 2)] + [selection['Id']]}],
+                     'Page': page_number}
+            blocks.extend([selection, key, value])
+
+        for _ in range(tables_per_page):
+            cells = [
+                {'BlockType': 'CELL', 'Id': block_id(), 'RowIndex': row, 'ColumnIndex': column,
+                 'Geometry': geometry(), 'Page': page_number,
+                 'Relationships': [{'Type': 'CHILD', 'Ids': [w['Id'] for w in rnd.sample(words, 2)]}]}
+                for row in range(1, table_rows + 1)
+                for column in range(1, table_columns + 1)
+            ]
+            blocks.append({'BlockType': 'TABLE', 'Id': block_id(), 'Geometry': geometry(), 'Page': page_number,
+                           'Relationships': [{'Type': 'CHILD', 'Ids': [cell['Id'] for cell in cells]}]})
+            blocks.extend(cells)
+
+    return {'DocumentMetadata': {'Pages': pages}, 'Blocks': blocks}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a synthetic Textract response to a JSON file.")
+    parser.add_argument('output', type=str, help='Path of the JSON file to write')
+    parser.add_argument('--pages', type=int, default=1, help='Number of pages')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    args = parser.parse_args()
+
+    response = make_response(pages=args.pages, seed=args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(response, f)
+    print(f"Wrote {len(response['Blocks'])} blocks to {args.output}")
@@ -0,0 +1,116 @@
+# File: ./jobs.py
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Job states
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+
+
+def new_job_id():
+    """
+    Generates a unique job ID, used as the per-job folder name in S3.
+
+    :return: Hex string job ID
+    """
+    return uuid.uuid4().hex
+
+
+def document_job_id(job_id, position):
+    """
+    Builds the ID of one document of a batch job. Each document gets the S3 folders of a
+    job of its own, so the Q&A pipeline can address it like a single-document job.
+
+    :param job_id: ID of the batch job
+    :param position: Position of the document in the batch
+    :return: Document job ID
+    """
+    return f'{job_id}-{position:03d}'
+
+
+class JobManager:
+    """
+    Runs document processing jobs on a bounded worker pool and tracks their status.
+
+    Finished jobs are kept in memory (oldest dropped first once max_retained is
+    reached) so results can be polled without going back to S3.
+    """
+
+    def __init__(self, max_workers=8, max_retained=1000):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job-worker')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_retained = max_retained
+
+    def submit(self, func, *args, job_id=None, **kwargs):
+        """
+        Queues func(job_id, *args, **kwargs) on the worker pool.
+
+        :param func: Callable running the job stages; its return value is stored as the result
+        :param job_id: Optional pre-allocated job ID
+        :return: The job ID
+        """
+        job_id = job_id or new_job_id()
+        with self._lock:
+            self._jobs[job_id] = {
+                'job_id': job_id,
+                'status': JOB_QUEUED,
+                'submitted_at': time.time(),
+                'result': None,
+                'error': None,
+            }
+            self._evict_finished()
+        self._executor.submit(self._run, job_id, func, args, kwargs)
+        logger.info(f"Job {job_id} queued.")
+        return job_id
+
+    def get(self, job_id):
+        """
+        Returns a snapshot of the job record, or None if the job is unknown.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job_id, func, args, kwargs):
+        self._update(job_id, status=JOB_RUNNING, started_at=time.time())
+        try:
+            result = func(job_id, *args, **kwargs)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            self._update(job_id, status=JOB_FAILED, error=str(e), finished_at=time.time())
+            return
+        self._update(job_id, status=JOB_SUCCEEDED, result=result, finished_at=time.time())
+        logger.info(f"Job {job_id} finished.")
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def _evict_finished(self):
+        # Drop the oldest finished jobs once over the retention limit; queued and
+        # running jobs are never evicted
+        excess = len(self._jobs) - self._max_retained
+        if excess <= 0:
+            return
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id]['status'] in (JOB_SUCCEEDED, JOB_FAILED):
+                del self._jobs[job_id]
+                excess -= 1
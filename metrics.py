@@ -0,0 +1,189 @@
+# File: ./metrics.py
+
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Content type of the Prometheus text exposition format
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; spans from S3 writes (tens of ms) to multi-page Textract analyses (minutes)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+OUTCOME_SUCCESS = 'success'
+OUTCOME_ERROR = 'error'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Histogram:
+    """
+    Prometheus-style cumulative histogram with labels.
+
+    Observations are bucketed as they arrive, so memory stays constant per label set.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        label_values = tuple(str(labels[name]) for name in self.labelnames)
+        # Index of the first bucket whose upper bound is >= value (the last one is +Inf)
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+                series[-1] = 0.0
+            series[position] += 1
+            series[-1] += value
+
+    def snapshot(self):
+        """
+        Returns {label values: (cumulative bucket counts, count, sum)}.
+        """
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        snapshot = {}
+        for labels, values in series.items():
+            cumulative, running = [], 0
+            for count in values[:-1]:
+                running += count
+                cumulative.append(running)
+            snapshot[labels] = (cumulative, running, values[-1])
+        return snapshot
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} histogram',
+        ]
+        for label_values, (cumulative, count, total) in sorted(self.snapshot().items()):
+            pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, label_values)]
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), cumulative):
+                labels = ','.join(pairs + [f'le="{_format_value(bound)}"'])
+                lines.append(f'{self.name}_bucket{{{labels}}} {bucket_count}')
+            suffix = '{' + ','.join(pairs) + '}' if pairs else ''
+            lines.append(f'{self.name}_sum{suffix} {_format_value(total)}')
+            lines.append(f'{self.name}_count{suffix} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+class Counter:
+    """
+    Prometheus-style monotonically increasing counter with labels.
+    """
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        label_values = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} counter',
+        ]
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            pairs = [f'{name}="{_escape(label)}"' for name, label in zip(self.labelnames, label_values)]
+            suffix = '{' + ','.join(pairs) + '}' if pairs else ''
+            lines.append(f'{self.name}{suffix} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+class Registry:
+    """
+    Collection of metrics rendered together for a /metrics scrape.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        return ''.join(metric.render() for metric in metrics)
+
+
+registry = Registry()
+
+# One histogram for every timed stage, labelled by stage name and outcome
+stage_duration = registry.register(Histogram(
+    'stage_duration_seconds',
+    'Time spent in each processing stage.',
+    ('stage', 'outcome')
+))
+
+
+@contextmanager
+def timed_stage(stage, histogram=stage_duration):
+    """
+    Records how long the enclosed block takes under stage, with outcome 'error'
+    if it raises and 'success' otherwise.
+
+        with timed_stage('textract'):
+            process_textract(...)
+    """
+    start = time.perf_counter()
+    outcome = OUTCOME_ERROR
+    try:
+        yield
+        outcome = OUTCOME_SUCCESS
+    finally:
+        histogram.observe(time.perf_counter() - start, stage=stage, outcome=outcome)
+
+
+def timed(stage, histogram=stage_duration, outcome_of=None):
+    """
+    Decorator form of timed_stage.
+
+    :param outcome_of: Optional callable mapping the return value to the recorded outcome,
+        for functions that report failures in what they return (e.g. Flask views)
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = OUTCOME_ERROR
+            try:
+                result = func(*args, **kwargs)
+                outcome = outcome_of(result) if outcome_of is not None else OUTCOME_SUCCESS
+                return result
+            finally:
+                histogram.observe(time.perf_counter() - start, stage=stage, outcome=outcome)
+        return wrapper
+    return decorator
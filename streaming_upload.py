@@ -0,0 +1,221 @@
+# File: ./streaming_upload.py
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import MultipartDecoder, File, Data, Epilogue, NeedData
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# S3 requires every part except the last to be at least 5 MiB
+MIN_PART_SIZE = 5 * 1024 * 1024
+UPLOAD_PART_SIZE = max(int(os.environ.get('UPLOAD_PART_SIZE_MB', '8')) * 1024 * 1024, MIN_PART_SIZE)
+UPLOAD_MAX_CONCURRENCY = int(os.environ.get('UPLOAD_MAX_CONCURRENCY', '4'))
+READ_SIZE = 64 * 1024
+
+# Part uploads from all requests share one pool; each upload bounds its own in-flight parts
+part_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='s3-part')
+
+
+class UploadError(Exception):
+    """Raised when the request body is not a usable multipart file upload."""
+
+
+class MultipartFileStream:
+    """
+    Reads one file field out of a multipart/form-data body incrementally,
+    without letting Flask spool the whole request first.
+    """
+
+    def __init__(self, stream, content_type, field_name='file', read_size=READ_SIZE):
+        mimetype, options = parse_options_header(content_type or '')
+        if mimetype != 'multipart/form-data' or 'boundary' not in options:
+            raise UploadError("Request must be multipart/form-data")
+        self.stream = stream
+        self.field_name = field_name
+        self.read_size = read_size
+        self.decoder = MultipartDecoder(options['boundary'].encode('latin-1'))
+        self.filename = None
+        self._exhausted = False
+
+    def _next_event(self):
+        event = self.decoder.next_event()
+        while isinstance(event, NeedData):
+            if self._exhausted:
+                raise UploadError("Unexpected end of multipart body")
+            chunk = self.stream.read(self.read_size)
+            if not chunk:
+                self._exhausted = True
+                chunk = None
+            self.decoder.receive_data(chunk)
+            event = self.decoder.next_event()
+        return event
+
+    def open_file(self):
+        """
+        Advances to the file part named field_name.
+
+        :return: The client supplied filename, or None if the body has no such part
+        """
+        while True:
+            event = self._next_event()
+            if isinstance(event, Epilogue):
+                return None
+            if isinstance(event, File) and event.name == self.field_name:
+                self.filename = event.filename
+                return self.filename
+
+    def iter_data(self):
+        """
+        Yields the bytes of the opened file part as they arrive.
+        """
+        while True:
+            event = self._next_event()
+            if not isinstance(event, Data):
+                raise UploadError("Malformed multipart body")
+            if event.data:
+                yield event.data
+            if not event.more_data:
+                return
+
+
+class S3StreamingUpload:
+    """
+    Writes a byte stream to S3 as a multipart upload, uploading parts in parallel
+    while the next part is still being read.
+
+    At most max_concurrency parts are buffered or in flight at once, so memory use
+    stays around part_size * max_concurrency regardless of the file size. Bodies
+    smaller than one part are sent with a single put_object instead.
+    """
+
+    def __init__(self, s3_client, bucket, key, part_size=UPLOAD_PART_SIZE,
+                 max_concurrency=UPLOAD_MAX_CONCURRENCY, content_type=None):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.content_type = content_type
+        self._slots = threading.Semaphore(max_concurrency)
+        self._buffer = bytearray()
+        self._futures = []
+        self._upload_id = None
+        self._sha256 = hashlib.sha256()
+        self._bytes = 0
+        self._started = time.monotonic()
+
+    def write(self, data):
+        self._sha256.update(data)
+        self._bytes += len(data)
+        self._buffer += data
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._submit_part(part)
+
+    def _submit_part(self, data):
+        if self._upload_id is None:
+            extra = {'ContentType': self.content_type} if self.content_type else {}
+            self._upload_id = self.s3_client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, **extra
+            )['UploadId']
+        part_number = len(self._futures) + 1
+        # Blocks the reader once max_concurrency parts are pending
+        self._slots.acquire()
+        future = part_executor.submit(self._upload_part, part_number, data)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def _upload_part(self, part_number, data):
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=data
+        )
+        return {'PartNumber': part_number, 'ETag': response['ETag']}
+
+    def complete(self):
+        """
+        Flushes the last part and finishes the upload.
+
+        :return: Dictionary with the upload metrics
+        """
+        if self._upload_id is None:
+            extra = {'ContentType': self.content_type} if self.content_type else {}
+            self.s3_client.put_object(
+                Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer), **extra
+            )
+        else:
+            if self._buffer:
+                self._submit_part(bytes(self._buffer))
+            parts = [future.result() for future in self._futures]
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self._upload_id,
+                MultipartUpload={'Parts': parts}
+            )
+        self._buffer = bytearray()
+
+        metrics = self.metrics()
+        logger.info(
+            f"Uploaded {metrics['bytes']} bytes to s3://{self.bucket}/{self.key} in "
+            f"{metrics['seconds']:.3f}s ({metrics['throughput_mb_s']:.2f} MB/s, {metrics['parts']} parts)"
+        )
+        return metrics
+
+    def abort(self):
+        if self._upload_id is None:
+            return
+        for future in self._futures:
+            future.cancel()
+        # A part still uploading when the upload is aborted can be stored afterwards and keep
+        # the upload's storage billed, so wait for the parts that could not be cancelled
+        wait(self._futures)
+        try:
+            self.s3_client.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self._upload_id
+            )
+        except Exception as e:
+            logger.warning(f"Failed to abort multipart upload for {self.key}: {e}")
+
+    @property
+    def sha256(self):
+        return self._sha256.hexdigest()
+
+    def metrics(self):
+        seconds = time.monotonic() - self._started
+        return {
+            'bytes': self._bytes,
+            'parts': max(len(self._futures), 1),
+            'seconds': seconds,
+            'throughput_mb_s': (self._bytes / (1024 * 1024)) / seconds if seconds > 0 else 0.0
+        }
+
+
+def stream_to_s3(chunks, s3_client, bucket, key, **kwargs):
+    """
+    Uploads an iterable of byte chunks to S3 without holding the whole body.
+
+    :param chunks: Iterable of bytes
+    :param s3_client: boto3 S3 client
+    :param bucket: Destination bucket
+    :param key: Destination key
+    :return: Tuple of (sha256 hex digest, metrics dictionary)
+    """
+    upload = S3StreamingUpload(s3_client, bucket, key, **kwargs)
+    try:
+        for chunk in chunks:
+            upload.write(chunk)
+        metrics = upload.complete()
+    except Exception:
+        upload.abort()
+        raise
+    return upload.sha256, metrics
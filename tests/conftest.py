@@ -0,0 +1,11 @@
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The project modules import each other as top-level modules, the way pipeline.py and app.py run them
+for path in (os.path.join(REPO_ROOT, 'aws_textract_project'), REPO_ROOT):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
@@ -0,0 +1,77 @@
+# File: ./tests/fixtures/blazingtext/make_fixtures.py
+
+"""
+Regenerates the BlazingText parity fixtures: two tiny fastText models and the
+predictions the reference fastText library (0.9.2, the format the BlazingText
+endpoint serves) makes for a few documents, stored as endpoint responses.
+
+Needs the fasttext package, which the application itself does not:
+    pip install fasttext-wheel==0.9.2
+    python tests/fixtures/blazingtext/make_fixtures.py
+"""
+
+import json
+import os
+import random
+
+import fasttext
+
+FIXTURE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+W2_WORDS = [
+    'Wage', 'and', 'Tax', 'Statement', 'W-2', 'Employer', 'identification', 'number', 'EIN', 'Wages,', 'tips,',
+    'other', 'compensation', 'Federal', 'income', 'tax', 'withheld', 'Social', 'security', 'wages', 'Medicare',
+    'Control', 'State', 'Local', 'Box', '12a', 'OMB', 'No.', '1545-0008', 'Copy', 'B',
+]
+OTHER_WORDS = [
+    'Invoice', 'Total', 'due', 'Payment', 'terms', 'Net', '30', 'Bill', 'to', 'Ship', 'Quantity', 'Description',
+    'Unit', 'price', 'Amount', 'Subtotal', 'Receipt', 'Thank', 'you', 'Account', 'Balance', 'Statement', 'Date',
+    'Lease', 'agreement', 'Tenant', 'Landlord', 'Rent', 'Deposit', 'Signature', 'Policy', 'número', 'Größe',
+]
+
+MODELS = {
+    # BlazingText's supervised mode: softmax, word bigrams, no subwords
+    'softmax_bigrams': dict(dim=8, wordNgrams=2, bucket=500, minn=0, maxn=0, loss='softmax', epoch=10, lr=0.5),
+    # Character n-grams and one-vs-all, for fastText-trained models
+    'ova_subwords': dict(dim=8, wordNgrams=2, bucket=500, minn=2, maxn=4, loss='ova', epoch=10, lr=0.5),
+}
+
+
+if __name__ == '__main__':
+    rnd = random.Random(7)
+
+    def document(words, n):
+        return ' '.join(rnd.choice(words) for _ in range(n))
+
+    lines = []
+    for _ in range(200):
+        lines.append('__label__0 ' + document(W2_WORDS, rnd.randint(8, 25)))
+        lines.append('__label__1 ' + document(OTHER_WORDS, rnd.randint(8, 25)))
+    rnd.shuffle(lines)
+    train_path = os.path.join(FIXTURE_DIR, 'train.txt')
+    with open(train_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+    # In-vocabulary, mixed and unseen words, non-ASCII text and a label-like token
+    texts = [
+        document(W2_WORDS, 15),
+        document(OTHER_WORDS, 15),
+        document(W2_WORDS + OTHER_WORDS, 20),
+        'Formulario W-2 Empleador número salario Größe',
+        'completely unseen tokens here',
+        'Wages tips __label__1 withheld',
+        document(W2_WORDS, 40) + ' ' + document(OTHER_WORDS, 5),
+    ]
+
+    try:
+        for name, config in MODELS.items():
+            model = fasttext.train_supervised(train_path, seed=1, thread=1, verbose=0, **config)
+            model.save_model(os.path.join(FIXTURE_DIR, f'{name}.bin'))
+            recorded = []
+            for text in texts:
+                labels, probs = model.predict(text, k=2)
+                recorded.append({'instance': text, 'response': {'label': list(labels), 'prob': [float(p) for p in probs]}})
+            with open(os.path.join(FIXTURE_DIR, f'{name}_responses.json'), 'w', encoding='utf-8') as f:
+                json.dump(recorded, f, indent=4, ensure_ascii=False)
+    finally:
+        os.remove(train_path)
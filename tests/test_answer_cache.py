@@ -0,0 +1,18 @@
+import boto3
+from moto import mock_aws
+
+from answer_cache import AnswerCache
+
+
+@mock_aws
+def test_corrupt_entry_is_a_miss_and_is_deleted():
+    s3 = boto3.client('s3')
+    s3.create_bucket(Bucket='cache-bucket')
+    cache = AnswerCache(s3, 'cache-bucket')
+    s3.put_object(Bucket='cache-bucket', Key=cache._s3_key('question'), Body=b'{"answer": "Your wa')
+
+    assert cache.get('question') is None
+    assert s3.list_objects_v2(Bucket='cache-bucket').get('KeyCount') == 0
+
+    cache.put('question', 'Your wages are $48,250.00.', 'cache/answers/question.mp3')
+    assert AnswerCache(s3, 'cache-bucket').get('question')['answer'] == 'Your wages are $48,250.00.'
@@ -0,0 +1,72 @@
+import io
+
+import boto3
+import pytest
+from moto import mock_aws
+
+
+@pytest.fixture
+def client(monkeypatch):
+    with mock_aws():
+        import app
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket=app.S3_BUCKET)
+        monkeypatch.setattr(app, 's3_client', s3)
+        monkeypatch.setattr(app, 'MAX_BATCH_FILES', 2)
+        yield app.app.test_client(), s3
+
+
+def test_oversized_batch_leaves_no_uploads(client):
+    test_client, s3 = client
+    files = [(io.BytesIO(b'%PDF-1.4 form'), f'w2_{i}.pdf') for i in range(3)]
+    response = test_client.post('/upload-and-process-batch', data={'files': files},
+                                content_type='multipart/form-data')
+
+    assert response.status_code == 400
+    assert s3.list_objects_v2(Bucket='w2-datasets').get('KeyCount') == 0
+
+
+def test_batch_documents_are_stored_and_classified_as_jobs_of_their_own(client, monkeypatch):
+    import app
+    import pipeline
+    test_client, s3 = client
+    submitted = []
+    monkeypatch.setattr(app.job_manager, 'submit', lambda func, *args, job_id: submitted.append((job_id, args)))
+    files = [(io.BytesIO(b'%PDF-1.4 w2'), 'scan.pdf'), (io.BytesIO(b'%PDF-1.4 1099'), 'scan.pdf')]
+    response = test_client.post('/upload-and-process-batch', data={'files': files},
+                                content_type='multipart/form-data')
+    assert response.status_code == 202
+    batch_id = response.get_json()['job_id']
+    document_ids = [doc['job_id'] for doc in response.get_json()['documents']]
+    assert document_ids == [f'{batch_id}-000', f'{batch_id}-001']
+
+    monkeypatch.setattr(app, 'run_textract', lambda filename, job_id, doc_hash: {'job': job_id})
+    monkeypatch.setattr(app, 'get_sagemaker_predictions',
+                        lambda outputs: [('w2' if output['job'].endswith('000') else '1099', 0.9) for output in outputs])
+    (documents,), = [args for _, args in submitted]
+    app.run_batch_job(batch_id, documents)
+
+    for document_id, label, body in zip(document_ids, ('w2', '1099'), (b'%PDF-1.4 w2', b'%PDF-1.4 1099')):
+        result = pipeline.read_json(s3, 'w2-datasets', f'output/result/{document_id}/result.json')
+        assert result['predicted_label'] == label
+        assert result['batch_job_id'] == batch_id
+        assert len(result['doc_hash']) == 64
+        # The pipeline finds the document's own file, not another one of the batch
+        _, _, document_bytes = pipeline.load_document(s3, 'w2-datasets', document_id)
+        assert document_bytes == body
+
+
+def test_rejected_requests_are_recorded_as_errors(client):
+    from metrics import stage_duration
+    test_client, _ = client
+
+    def count(outcome):
+        series = stage_duration.snapshot().get(('upload_and_process_request', outcome))
+        return series[1] if series else 0
+
+    before = count('error'), count('success')
+    response = test_client.post('/upload-and-process', data={'file': (io.BytesIO(b'text'), 'notes.txt')},
+                                content_type='multipart/form-data')
+
+    assert response.status_code == 400
+    assert (count('error'), count('success')) == (before[0] + 1, before[1])
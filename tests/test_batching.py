@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+from aws_sagemaker.batching import MicroBatcher, batch_queue_wait, batch_size
+
+
+class RecordingBackend:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def __call__(self, items):
+        with self.lock:
+            self.calls.append(list(items))
+        if self.fail:
+            raise RuntimeError('endpoint unavailable')
+        return [item * 10 for item in items]
+
+
+def test_window_flushes_a_partial_batch():
+    backend = RecordingBackend()
+    batcher = MicroBatcher(backend, max_batch_size=32, max_wait=0.1, name='test-window')
+    futures = [batcher.submit(i) for i in range(3)]
+
+    assert [future.result(timeout=5) for future in futures] == [0, 10, 20]
+    assert backend.calls == [[0, 1, 2]]
+
+
+def test_full_batch_is_sent_without_waiting_for_the_window():
+    backend = RecordingBackend()
+    batcher = MicroBatcher(backend, max_batch_size=2, max_wait=30, name='test-size')
+    start = time.monotonic()
+    futures = [batcher.submit(i) for i in range(4)]
+
+    assert [future.result(timeout=5) for future in futures] == [0, 10, 20, 30]
+    assert time.monotonic() - start < 5
+    assert sorted(backend.calls) == [[0, 1], [2, 3]]
+
+
+def test_backend_error_reaches_every_waiting_item():
+    batcher = MicroBatcher(RecordingBackend(fail=True), max_batch_size=32, max_wait=0.1, name='test-error')
+    futures = [batcher.submit(i) for i in range(3)]
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match='endpoint unavailable'):
+            future.result(timeout=5)
+
+
+def test_batch_size_and_queue_wait_are_recorded():
+    batcher = MicroBatcher(RecordingBackend(), max_batch_size=32, max_wait=0.1, name='test-metrics')
+    for future in [batcher.submit(i) for i in range(3)]:
+        future.result(timeout=5)
+
+    _, batches, items = batch_size.snapshot()[('test-metrics',)]
+    assert (batches, items) == (1, 3)
+    _, waits, total_wait = batch_queue_wait.snapshot()[('test-metrics',)]
+    assert waits == 3
+    assert 0 < total_wait < 3 * 5
+    assert 'micro_batch_size_count{batcher="test-metrics"} 1' in batch_size.render()
@@ -0,0 +1,94 @@
+import json
+import os
+import tempfile
+
+import pytest
+
+from aws_sagemaker.blazingtext_local import BlazingTextModel, LocalPredictor, _download_from_s3, check_parity
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'blazingtext')
+
+# Responses recorded from the reference fastText library; see fixtures/blazingtext/make_fixtures.py
+PARITY_TOLERANCE = 1e-5
+
+
+def load_fixture(name):
+    model = BlazingTextModel.load(os.path.join(FIXTURE_DIR, f'{name}.bin'))
+    with open(os.path.join(FIXTURE_DIR, f'{name}_responses.json'), encoding='utf-8') as f:
+        return model, json.load(f)
+
+
+@pytest.mark.parametrize('name', ['softmax_bigrams', 'ova_subwords'])
+def test_predictions_match_recorded_responses(name):
+    model, recorded = load_fixture(name)
+
+    for record in recorded:
+        expected = record['response']
+        actual = model.predict(record['instance'], k=len(expected['label']))
+        assert actual['label'] == expected['label'], record['instance']
+        assert actual['prob'] == pytest.approx(expected['prob'], abs=PARITY_TOLERANCE), record['instance']
+    assert check_parity(model, recorded, tolerance=PARITY_TOLERANCE) == []
+
+
+def test_subword_model_uses_character_ngrams():
+    model, recorded = load_fixture('ova_subwords')
+    assert model.args['maxn'] > 0
+
+    # An unseen word is represented by its character n-grams alone
+    assert model.features('Wagez') != model.features('completely')
+    assert len(model.features('Wagez')) > len(model.features(''))
+
+
+def test_local_predictor_answers_endpoint_payloads():
+    model, recorded = load_fixture('softmax_bigrams')
+    instances = [record['instance'] for record in recorded]
+
+    responses = LocalPredictor(model).predict({'instances': instances, 'configuration': {'k': 2}})
+
+    assert [response['label'] for response in responses] == [record['response']['label'] for record in recorded]
+
+
+class StubS3:
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.downloads = 0
+        self.fail = False
+
+    def head_object(self, Bucket, Key):
+        return {'ETag': '"%s"' % self.objects[Key][0]}
+
+    def download_file(self, Bucket, Key, Filename, ExtraArgs=None):
+        etag, body = self.objects[Key]
+        assert ExtraArgs == {'IfMatch': f'"{etag}"'}
+        self.downloads += 1
+        with open(Filename, 'wb') as f:
+            f.write(body[:len(body) // 2])
+            if self.fail:
+                raise ConnectionError('connection reset')
+            f.write(body[len(body) // 2:])
+
+
+def test_s3_download_is_keyed_on_etag_and_atomic(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    s3 = StubS3({'models/model.tar.gz': ('etag1', b'first model')})
+
+    path = _download_from_s3('s3://bucket/models/model.tar.gz', s3)
+    assert open(path, 'rb').read() == b'first model'
+    assert _download_from_s3('s3://bucket/models/model.tar.gz', s3) == path
+    assert s3.downloads == 1
+
+    # A retrained model under the same key is fetched again
+    s3.objects['models/model.tar.gz'] = ('etag2', b'second model')
+    new_path = _download_from_s3('s3://bucket/models/model.tar.gz', s3)
+    assert new_path != path
+    assert new_path.endswith('model.tar.gz')
+    assert open(new_path, 'rb').read() == b'second model'
+
+    # A failed download leaves neither the model nor a partial file behind
+    s3.objects['models/model.tar.gz'] = ('etag3', b'third model')
+    s3.fail = True
+    with pytest.raises(ConnectionError):
+        _download_from_s3('s3://bucket/models/model.tar.gz', s3)
+    failed_dir = os.path.join(str(tmp_path), 'blazingtext', 'bucket', 'models', 'etag3')
+    assert os.listdir(failed_dir) == []
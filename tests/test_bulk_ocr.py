@@ -0,0 +1,66 @@
+import threading
+
+from botocore.exceptions import ClientError
+
+from bulk_ocr import AdaptiveLimiter, BulkRunner
+
+
+class MemoryCheckpoint:
+
+    def __init__(self):
+        self.done = set()
+        self.records = []
+        self._lock = threading.Lock()
+
+    def record(self, key, status, error=None):
+        with self._lock:
+            self.records.append((key, status))
+
+
+def throttled(key):
+    raise ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}}, 'AnalyzeDocument')
+
+
+def run_in_thread(runner, keys, timeout=10.0):
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(runner.run(keys)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), f"Bulk run hung: {runner.stats()}"
+    return result
+
+
+def test_always_throttled_run_finishes():
+    # The limit drops to 1 while every pool thread has a key to retry
+    limiter = AdaptiveLimiter(initial=4, maximum=4)
+    checkpoint = MemoryCheckpoint()
+    runner = BulkRunner(throttled, checkpoint, limiter, max_retries=3, backoff=0.02)
+
+    stats = run_in_thread(runner, [f'doc-{i}.png' for i in range(20)])
+
+    assert stats['failed'] == 20
+    assert stats['processed'] == 0
+    assert stats['throttled'] == 20 * 3
+    assert limiter.limit == 1
+    assert limiter._active == 0
+
+
+def test_throttled_keys_succeed_on_retry():
+    attempts = {}
+    lock = threading.Lock()
+
+    def process(key):
+        with lock:
+            attempts[key] = attempts.get(key, 0) + 1
+            first = attempts[key] == 1
+        if first:
+            throttled(key)
+
+    checkpoint = MemoryCheckpoint()
+    runner = BulkRunner(process, checkpoint, AdaptiveLimiter(initial=4, maximum=4), backoff=0.01)
+
+    stats = run_in_thread(runner, [f'doc-{i}.png' for i in range(12)])
+
+    assert stats['processed'] == 12
+    assert stats['failed'] == 0
+    assert sorted(key for key, status in checkpoint.records if status == 'done') == sorted(attempts)
@@ -0,0 +1,101 @@
+import sys
+import threading
+
+import pytest
+
+import pipeline_worker
+from pipeline_worker import SESSION_FAILED, SESSION_SUCCEEDED, MemoryQueue, PipelineWorker, SQLiteQueue, new_session
+
+
+def run_drained(worker, timeout=10):
+    thread = threading.Thread(target=worker.run, kwargs={'poll_timeout': 0.05, 'drain': True})
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "worker did not exit after draining the queue"
+
+
+def test_sessions_overlap_up_to_max_sessions():
+    session_queue = MemoryQueue()
+    for i in range(6):
+        session_queue.put(new_session('job-1', f'session-{i}'))
+    # Each session blocks until two more are running next to it
+    all_running = threading.Barrier(3, timeout=5)
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def handler(s3, job_id, session_id, **kwargs):
+        with lock:
+            running.append(session_id)
+            peak.append(len(running))
+        all_running.wait()
+        with lock:
+            running.remove(session_id)
+        return {'session_id': session_id}
+
+    worker = PipelineWorker(session_queue, handler=handler, s3_client=object(), max_sessions=3)
+    run_drained(worker)
+
+    assert max(peak) == 3
+    assert sorted(session_queue.results) == [f'session-{i}' for i in range(6)]
+    assert worker.stats() == {'in_flight': 0, 'succeeded': 6, 'failed': 0}
+
+
+def test_failed_sessions_release_their_slot(monkeypatch, tmp_path):
+    metrics_file = tmp_path / 'pipeline.prom'
+    monkeypatch.setattr(pipeline_worker, 'PIPELINE_METRICS_FILE', str(metrics_file))
+    session_queue = MemoryQueue()
+    for i in range(4):
+        session_queue.put(new_session('job-1', f'session-{i}'))
+
+    def handler(s3, job_id, session_id, **kwargs):
+        if session_id in ('session-0', 'session-2'):
+            raise RuntimeError('Bedrock unavailable')
+        return {'session_id': session_id}
+
+    # A single slot: a failure that kept its slot would stall every later session
+    worker = PipelineWorker(session_queue, handler=handler, s3_client=object(), max_sessions=1)
+    run_drained(worker)
+
+    assert sorted(session_queue.results) == ['session-1', 'session-3']
+    assert {receipt: str(error) for receipt, error in session_queue.errors.items()} == {
+        'session-0': 'Bedrock unavailable', 'session-2': 'Bedrock unavailable'}
+    assert worker.stats() == {'in_flight': 0, 'succeeded': 2, 'failed': 2}
+    assert 'pipeline_session' in metrics_file.read_text()
+
+
+def test_running_session_is_claimed_again_after_visibility_timeout(tmp_path):
+    session_queue = SQLiteQueue(str(tmp_path / 'sessions.db'), poll_interval=0.01, visibility_timeout=0.2)
+    session_queue.put(new_session('job-1', 'session-1'))
+
+    crashed_receipt, _ = session_queue.get(timeout=0)
+    assert session_queue.get(timeout=0) is None
+
+    receipt, session = session_queue.get(timeout=2)
+    assert session['session_id'] == 'session-1'
+    session_queue.ack(receipt, {'answer': 'Your wages are $48,250.00.'})
+
+    # The timed-out claim finishing late does not overwrite the outcome
+    session_queue.fail(crashed_receipt, RuntimeError('worker was killed'))
+    status = session_queue.status('session-1')
+    assert status['status'] == SESSION_SUCCEEDED
+    assert status['result'] == {'answer': 'Your wages are $48,250.00.'}
+
+
+def test_failed_session_is_not_claimed_again(tmp_path):
+    session_queue = SQLiteQueue(str(tmp_path / 'sessions.db'), poll_interval=0.01, visibility_timeout=0)
+    session_queue.put(new_session('job-1', 'session-1'))
+    receipt, _ = session_queue.get(timeout=0)
+    session_queue.fail(receipt, RuntimeError('Bedrock unavailable'))
+
+    assert session_queue.get(timeout=0) is None
+    assert session_queue.status('session-1')['status'] == SESSION_FAILED
+
+
+def test_status_rejects_sqs_queue(monkeypatch, capsys):
+    monkeypatch.setattr(sys, 'argv', ['pipeline_worker.py', '--sqs-url', 'https://sqs.example/queue',
+                                      'status', 'session-1'])
+    with pytest.raises(SystemExit) as exit_info:
+        pipeline_worker.main()
+    assert exit_info.value.code == 2
+    assert '--sqs-url' in capsys.readouterr().err
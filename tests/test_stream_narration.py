@@ -0,0 +1,45 @@
+import functools
+import json
+import threading
+
+import pipeline
+from speech_stream import narrate_sentences
+
+
+class RecordingS3:
+    def __init__(self):
+        self.objects = {}
+        self.first_segment = threading.Event()
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[Key] = Body
+        if Key.endswith('/0000.mp3'):
+            self.first_segment.set()
+
+
+def test_segments_are_published_before_the_answer_is_voiced(monkeypatch):
+    s3 = RecordingS3()
+
+    def synthesize(text, language):
+        # The second sentence is only voiced once the first one can be fetched from S3
+        if text.startswith('Federal'):
+            assert s3.first_segment.wait(timeout=5)
+        return text.encode('utf-8')
+
+    monkeypatch.setattr(pipeline, 'user_prompting_bedrock_stream', lambda *args: iter([
+        'Your wages are $48,250.00. ', 'Federal income tax ', 'withheld is $5,312.40.'
+    ]))
+    monkeypatch.setattr(pipeline, 'narrate_sentences', functools.partial(
+        narrate_sentences, translate=lambda text, language: text, synthesize=synthesize))
+
+    answer = pipeline.stream_narration('question', 'data', 'w2', 0.9, 'en', s3, 'w2-datasets',
+                                       'output/mp3/job-1/session-1.mp3')
+
+    assert answer == 'Your wages are $48,250.00. Federal income tax withheld is $5,312.40.'
+    assert s3.objects['output/mp3/job-1/session-1.mp3'] == answer.replace(' Federal', 'Federal').encode('utf-8')
+    manifest = json.loads(s3.objects['output/mp3/job-1/session-1/manifest.json'])
+    assert manifest == {
+        'segments': ['output/mp3/job-1/session-1/0000.mp3', 'output/mp3/job-1/session-1/0001.mp3'],
+        'complete': True,
+        'audio_key': 'output/mp3/job-1/session-1.mp3',
+    }
@@ -0,0 +1,44 @@
+import threading
+import time
+
+import pytest
+
+from streaming_upload import MIN_PART_SIZE, UploadError, stream_to_s3
+
+
+class SlowS3:
+    """
+    S3 client stand-in whose part uploads take a while.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.uploading = 0
+        self.uploading_at_abort = None
+
+    def create_multipart_upload(self, Bucket, Key):
+        return {'UploadId': 'upload-1'}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        with self.lock:
+            self.uploading += 1
+        time.sleep(0.2)
+        with self.lock:
+            self.uploading -= 1
+        return {'ETag': f'"etag-{PartNumber}"'}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        with self.lock:
+            self.uploading_at_abort = self.uploading
+
+
+def test_abort_waits_for_parts_in_flight():
+    def chunks():
+        # The client goes away after three parts have been handed to the uploader
+        yield from [b'x' * MIN_PART_SIZE] * 3
+        raise UploadError('Unexpected end of multipart body')
+
+    s3 = SlowS3()
+    with pytest.raises(UploadError):
+        stream_to_s3(chunks(), s3, 'bucket', 'key', max_concurrency=4)
+    assert s3.uploading_at_abort == 0
@@ -0,0 +1,60 @@
+import io
+import json
+
+import boto3
+from moto import mock_aws
+
+from aws_textract_project import textract_for_sagemaker
+from aws_textract_project.textract_async import LocalTextractClient
+from aws_textract_project.textract_cache import TextractCache
+
+
+def make_response(words=1200):
+    blocks = [{'BlockType': 'PAGE', 'Id': 'page-1'}]
+    for i in range(words):
+        blocks.append({'BlockType': 'LINE', 'Id': f'line-{i}', 'Text': f'Box {i}'})
+        blocks.append({
+            'BlockType': 'WORD', 'Id': f'word-{i}', 'Text': f'{i}.00',
+            'Geometry': {'BoundingBox': {'Left': 0.1, 'Top': i / words, 'Width': 0.05, 'Height': 0.01}},
+        })
+    return {'DocumentMetadata': {'Pages': 3}, 'Blocks': blocks}
+
+
+def test_pages_are_followed_through_next_token():
+    response = make_response()
+    client = LocalTextractClient(response, in_progress_polls=2)
+    written = io.BytesIO()
+
+    analysis = textract_for_sagemaker.analyze_document_async(
+        'input/raw_file/scan.pdf', 'scan.pdf', written, textract=client, poll_interval=0, max_results=1000)
+
+    # Two IN_PROGRESS polls, then 2401 blocks in pages of 1000
+    assert client.calls == ['start_document_analysis'] + ['get_document_analysis'] * 5
+    assert analysis['words'] == textract_for_sagemaker.generate_ml_json(response, 'scan.pdf')['Words']
+    assert json.loads(written.getvalue()) == response
+
+
+@mock_aws
+def test_cached_analysis_reuses_the_streamed_response(monkeypatch):
+    s3 = boto3.client('s3')
+    s3.create_bucket(Bucket='w2-datasets')
+    response = make_response(words=300)
+    client = LocalTextractClient(response, in_progress_polls=0)
+    monkeypatch.setattr(textract_for_sagemaker, 's3_client', s3)
+    monkeypatch.setattr(textract_for_sagemaker, 'textract_client', client)
+    monkeypatch.setattr(textract_for_sagemaker, 'textract_cache', TextractCache(s3, 'w2-datasets'))
+
+    def saved_response(job_id):
+        return json.loads(s3.get_object(Bucket='w2-datasets', Key=f'output/textract/{job_id}/scan.json')['Body'].read())
+
+    for job_id in ('job-1', 'job-2'):
+        textract_for_sagemaker.process_textract('scan.pdf', job_id=job_id, doc_hash='hash')
+        assert saved_response(job_id) == response
+    assert client.calls.count('start_document_analysis') == 1
+
+    # Once the response the cache entry points to is gone, the document is analyzed again
+    s3.delete_object(Bucket='w2-datasets', Key='output/textract/job-1/scan.json')
+    ocr_json = textract_for_sagemaker.process_textract('scan.pdf', job_id='job-3', doc_hash='hash')
+    assert saved_response('job-3') == response
+    assert len(ocr_json['Words']) == 300
+    assert client.calls.count('start_document_analysis') == 2
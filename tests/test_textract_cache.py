@@ -0,0 +1,93 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from textract_cache import TextractCache
+
+
+@mock_aws
+def test_corrupt_entry_is_a_miss_and_is_replaced():
+    s3 = boto3.client('s3')
+    s3.create_bucket(Bucket='cache-bucket')
+    cache = TextractCache(s3, 'cache-bucket')
+    key = cache._s3_key('doc')
+    s3.put_object(Bucket='cache-bucket', Key=key, Body=b'{"Blocks": [{"Id"')
+
+    assert cache.get_or_compute('doc', lambda: {'Blocks': []}) == {'Blocks': []}
+    assert json.loads(s3.get_object(Bucket='cache-bucket', Key=key)['Body'].read()) == {'Blocks': []}
+
+
+@mock_aws
+def test_corrupt_entry_is_deleted_when_compute_fails():
+    s3 = boto3.client('s3')
+    s3.create_bucket(Bucket='cache-bucket')
+    cache = TextractCache(s3, 'cache-bucket')
+    s3.put_object(Bucket='cache-bucket', Key=cache._s3_key('doc'), Body=b'\xff\xfe')
+
+    def compute():
+        raise RuntimeError('Textract unavailable')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute('doc', compute)
+    assert s3.list_objects_v2(Bucket='cache-bucket').get('KeyCount') == 0
+
+
+@mock_aws
+def test_concurrent_misses_call_textract_once():
+    s3 = boto3.client('s3')
+    s3.create_bucket(Bucket='cache-bucket')
+    cache = TextractCache(s3, 'cache-bucket')
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(timeout=5)
+        return {'Blocks': []}
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(cache.get_or_compute, 'doc', compute) for _ in range(8)]
+        # Let every lookup reach the cache before the analysis finishes
+        time.sleep(0.2)
+        release.set()
+        results = [future.result(timeout=5) for future in futures]
+
+    assert len(calls) == 1
+    assert results == [{'Blocks': []}] * 8
+
+
+@mock_aws
+def test_memory_tier_keeps_the_most_recently_used_entries():
+    s3 = boto3.client('s3')
+    s3.create_bucket(Bucket='cache-bucket')
+    cache = TextractCache(s3, 'cache-bucket', max_entries=2)
+    for doc_hash in ('a', 'b'):
+        cache.get_or_compute(doc_hash, lambda: {'Blocks': []})
+    cache.get_or_compute('a', lambda: pytest.fail('a is cached'))
+    cache.get_or_compute('c', lambda: {'Blocks': []})
+
+    assert list(cache._local) == ['a', 'c']
+
+
+@mock_aws
+def test_s3_tier_is_evicted_oldest_first_down_to_the_low_watermark():
+    s3 = boto3.client('s3')
+    s3.create_bucket(Bucket='cache-bucket')
+    entry = {'Blocks': ['x' * 80]}
+    size = len(json.dumps(entry))
+    # Room for three entries; the fourth write evicts down to 70% of the cap, i.e. two entries
+    cache = TextractCache(s3, 'cache-bucket', max_s3_bytes=3 * size, low_watermark=0.7)
+    for doc_hash in ('a', 'b', 'c', 'd'):
+        if doc_hash != 'a':
+            # LastModified has one-second resolution
+            time.sleep(1.1)
+        cache.get_or_compute(doc_hash, lambda: entry)
+
+    keys = [obj['Key'] for obj in s3.list_objects_v2(Bucket='cache-bucket')['Contents']]
+    assert keys == ['cache/textract/c.json', 'cache/textract/d.json']
+    assert cache._s3_bytes == 2 * size
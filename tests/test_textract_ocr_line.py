@@ -0,0 +1,16 @@
+from prompt_retrieval import split_fragments
+from textract_ocr_line import line_text
+
+
+def test_lines_stay_separate_fragments():
+    response = {'Blocks': [
+        {'BlockType': 'PAGE', 'Id': 'page'},
+        {'BlockType': 'LINE', 'Text': '1 Wages, tips, other compensation 48250.00'},
+        {'BlockType': 'WORD', 'Text': 'Wages,'},
+        {'BlockType': 'LINE', 'Text': '2 Federal income tax withheld 5312.40'},
+    ]}
+
+    assert split_fragments(line_text(response)) == [
+        '1 Wages, tips, other compensation 48250.00',
+        '2 Federal income tax withheld 5312.40',
+    ]
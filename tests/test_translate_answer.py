@@ -0,0 +1,35 @@
+import pipeline
+from speech_stream import sentence_spans, stream_sentences
+
+
+def fake_translate_segments(segments, source, target):
+    return [f'<{segment}>' for segment in segments]
+
+
+def test_breaks_between_sentences_are_kept(monkeypatch):
+    monkeypatch.setattr(pipeline, 'translate_segments', fake_translate_segments)
+    answer = ("Here are the amounts from your W-2:\n\n"
+              "- Wages are $48,250.00.\n"
+              "- Federal tax withheld is $5,312.40.\n\n"
+              "Sure. Let me know if you need more.")
+
+    assert pipeline.translate_answer(answer, 'es') == (
+        "<Here are the amounts from your W-2:>\n\n<- Wages are $48,250.00.>\n"
+        "<- Federal tax withheld is $5,312.40.>\n\n"
+        "<Sure. Let me know if you need more.>"
+    )
+
+
+def test_cjk_sentences_are_not_spaced(monkeypatch):
+    monkeypatch.setattr(pipeline, 'translate_segments', fake_translate_segments)
+
+    assert pipeline.translate_answer('您的工资是四万八千美元。联邦税是五千美元。', 'zh') == \
+        '<您的工资是四万八千美元。><联邦税是五千美元。>'
+
+
+def test_spans_match_the_streamed_sentences():
+    answer = "Sure. Your wages are $48,250.00.\nFederal tax withheld is $5,312.40.  Anything else?"
+    spans = sentence_spans(answer)
+
+    assert ''.join(''.join(span) for span in spans) == answer
+    assert [sentence for _, sentence, _ in spans] == list(stream_sentences([answer]))